@@ -1,16 +1,93 @@
 from flask import Flask
 import os
 
-def create_app():
+from services.blob_store import BlobStore
+from services.jobs import JobQueue
+from services.stage_cache import StageCache
+from services.storage import BackgroundWriter, UploadStore
+from services.storage_manager import StorageManager
+
+def create_app(test_config: dict | None = None, instance_path: str | None = None):
+    """
+    test_config: override config (diterapkan setelah default, sebelum extension dibuat)
+    instance_path: folder instance lain (journal upload, index storage, working copy)
+    """
     root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     template_dir = os.path.join(root_dir, 'templates')
     static_dir = os.path.join(root_dir, 'static')
     
-    app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
+    app = Flask(__name__, template_folder=template_dir, static_folder=static_dir, instance_path=instance_path)
 
     upload_dir = os.path.join(static_dir, 'uploads')
     app.config['UPLOAD_FOLDER'] = upload_dir
     app.config['ALLOWED_EXTENSIONS'] = {'jpg', 'jpeg', 'png'}
+    # Upload dibaca ke memori lalu di-decode langsung; batas dicek sebelum decode penuh
+    app.config['UPLOAD_MAX_BYTES'] = 64 * 1024 * 1024
+    app.config['UPLOAD_MAX_PIXELS'] = 100_000_000
+    # Film >= TILE_MIN_PIXELS: gaussian/median/clahe dijalankan per tile TILE_SIZE (services/tiling.py)
+    app.config['TILE_MIN_PIXELS'] = 36_000_000
+    app.config['TILE_SIZE'] = 1024
+    # File asli disimpan ke static/uploads di background; False (atau persist_upload=0) → tidak disimpan
+    app.config['UPLOAD_PERSIST_ORIGINAL'] = True
+    # True: file asli selalu disimpan, persist_upload=0 diabaikan (mode multi-proses, lihat services/runtime.py)
+    app.config['UPLOAD_FORCE_PERSIST'] = False
+    # False: tulis file + working copy sebelum response (dipakai mode multi-proses, lihat services/runtime.py)
+    app.config['UPLOAD_ASYNC_WRITES'] = True
+    app.config['UPLOAD_WRITER_WORKERS'] = 2
+    # Working copy grayscale .npy (+ metadata) hasil ingestion upload
+    app.config['WORK_FOLDER'] = os.path.join(app.instance_path, 'work')
+    # Budget memori untuk cache hasil intermediate (noise → contrast → segmentation)
+    app.config['STAGE_CACHE_MAX_BYTES'] = 256 * 1024 * 1024
+    # Output disimpan di memori (BlobStore) kecuali PERSIST_OUTPUTS=True
+    # atau request mengirim persist=1; file di static/outputs bersifat opt-in.
+    app.config['PERSIST_OUTPUTS'] = False
+    # Profil encoding output default (png, png-fast, webp, jpeg, npy); bisa diganti per request
+    # lewat field encoding atau header Accept — lihat services/encoding.py
+    app.config['OUTPUT_ENCODING'] = 'png'
+    app.config['BLOB_TTL_SECONDS'] = 300
+    # HTTP caching output: max-age untuk /static/outputs dan /blobs; ETag memakai CODE_VERSION
+    # (mis. git sha saat deploy) atau, jika None, hash isi modul services/
+    app.config['OUTPUT_CACHE_MAX_AGE'] = 300
+    app.config['CODE_VERSION'] = None
+    app.config['BLOB_STORE_MAX_BYTES'] = 128 * 1024 * 1024
+    # Worker pool untuk /jobs (terpisah dari thread HTTP) dan batas antrian (→ 429)
+    app.config['JOB_WORKERS'] = 2
+    app.config['JOB_QUEUE_SIZE'] = 16
+    # /process/sweep: batas jumlah varian per request dan thread evaluasi
+    app.config['SWEEP_MAX_VARIANTS'] = 64
+    app.config['SWEEP_WORKERS'] = 4
+    # /batch: worker thread per request dan batas jumlah gambar
+    app.config['BATCH_WORKERS'] = 4
+    app.config['BATCH_MAX_FILES'] = 2000
+    # /process/preview: target sisi terpanjang level pyramid untuk preview
+    app.config['PREVIEW_MAX_SIDE'] = 512
+    # Storage manager: budget total + TTL untuk upload, working copy dan output di disk
+    app.config['STORAGE_MAX_BYTES'] = 2 * 1024 * 1024 * 1024
+    app.config['STORAGE_TTL_SECONDS'] = 7 * 24 * 3600
+    app.config['STORAGE_EVICT_INTERVAL'] = 60
+    if test_config:
+        app.config.from_mapping(test_config)
+    upload_dir = app.config['UPLOAD_FOLDER']
+
+    app.extensions['stage_cache'] = StageCache(app.config['STAGE_CACHE_MAX_BYTES'])
+    app.extensions['blob_store'] = BlobStore(
+        app.config['BLOB_TTL_SECONDS'], app.config['BLOB_STORE_MAX_BYTES']
+    )
+    # Upload content-addressed (<sha256>.<ext>) + alias nama asli → hash
+    app.extensions['upload_store'] = UploadStore(upload_dir, os.path.join(app.instance_path, 'uploads.json'))
+    app.extensions['upload_writer'] = BackgroundWriter(app.config['UPLOAD_WRITER_WORKERS'])
+    storage = StorageManager(
+        os.path.join(app.instance_path, 'storage.sqlite3'),
+        app.config['STORAGE_MAX_BYTES'],
+        app.config['STORAGE_TTL_SECONDS'],
+    )
+    # file yang sudah ada sebelum index dibuat ikut dikelola
+    storage.adopt(upload_dir, 'upload')
+    storage.adopt(os.path.join(static_dir, 'outputs'), 'output')
+    storage.adopt(app.config['WORK_FOLDER'], 'work')
+    storage.start(app.config['STORAGE_EVICT_INTERVAL'])
+    app.extensions['storage'] = storage
+    app.extensions['job_queue'] = JobQueue(app.config['JOB_WORKERS'], app.config['JOB_QUEUE_SIZE'])
 
     from .routes import main
     app.register_blueprint(main)
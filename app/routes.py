@@ -1,17 +1,99 @@
-from flask import Blueprint, render_template, request, current_app, url_for, jsonify
+from flask import Blueprint, Response, g, render_template, request, current_app, stream_with_context, url_for, jsonify
+import hashlib
+import json
 import os
+import threading
+import time
 import cv2
+import numpy as np
+from services.batch_stream import ZipStream, count_batch_inputs, imap_unordered, iter_batch_inputs
+from services.blob_store import BlobStore
+from services.filter_pool import clahe_pool
 from services.image_processing import (
-    noise_removal,
-    contrast_enhancement,
-    image_segmentation,
+    decode_gray,
+    histogram_counts,
+    load_gray,
     render_histogram_image,
-    apply_image_masking,
+    run_pipeline,
+    parse_stage_specs,
+    pipeline_hash,
+    BINARY_MASK_STAGES,
+    SEGMENTATION_STAGES,
 )
+from services.encoding import ENCODING_PROFILES, encode_output, encoding_report, negotiate_encoding, output_file_name
+from services.http_cache import code_version, etag_matches, make_etag
+from services.image_header import image_dimensions
+from services.ingest import find_working_copy, ingest_gray, working_copy_paths
+from services.jobs import JobQueue, QueueFull
+from services.mask_codec import describe_mask
+from services.metrics import (
+    finish_request_timings,
+    registry as metrics_registry,
+    server_timing_header,
+    start_request_timings,
+    timed,
+)
+from services.preview import choose_level, pyramid_level, scale_stages
+from services.stage_cache import StageCache
+from services.storage import UploadStore, output_name
+from services.storage_manager import StorageManager
+from services.sweep import contact_sheet, expand_grid, make_thumbnail, run_sweep, variant_label, variant_stats
+from werkzeug.datastructures import MultiDict
 from werkzeug.utils import secure_filename
 
 main = Blueprint('main', __name__)
 
+
+@main.before_app_request
+def _start_timing():
+    g.request_started = time.perf_counter()
+    g.timings_token = start_request_timings()
+
+
+@main.after_app_request
+def _finish_timing(response):
+    token = g.pop("timings_token", None)
+    if token is None:
+        return response
+
+    timings = finish_request_timings(token)
+    total = time.perf_counter() - g.pop("request_started")
+    metrics_registry.observe(
+        "xray_http_request_duration_seconds",
+        f'endpoint="{request.endpoint or "unknown"}"',
+        total,
+    )
+    metrics_registry.inc(
+        "xray_http_requests_total",
+        f'endpoint="{request.endpoint or "unknown"}",status="{response.status_code}"',
+    )
+    response.headers["Server-Timing"] = server_timing_header(timings, total)
+    return response
+
+
+@main.after_app_request
+def _vary_accept(response):
+    """Cache di depan client tidak boleh menukar hasil yang encoding-nya dipilih dari Accept."""
+    if g.pop("encoding_negotiated", False):
+        response.vary.add("Accept")
+    return response
+
+
+@main.after_app_request
+def _output_cache_headers(response):
+    """
+    File di static/outputs: nama sudah deterministik (hash input + pipeline), jadi ETag
+    diturunkan dari nama + versi kode (bukan mtime) dan boleh di-cache client.
+    """
+    filename = (request.view_args or {}).get("filename", "")
+    if request.endpoint != "static" or not filename.startswith("outputs/") or response.status_code != 200:
+        return response
+    response.set_etag(_etag("output", filename))
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["OUTPUT_CACHE_MAX_AGE"]
+    response.cache_control.no_cache = None
+    return response.make_conditional(request)
+
 @main.route("/")
 def index():
     return render_template(
@@ -27,67 +109,520 @@ def allowed_file(filename):
     allowed = current_app.config.get("ALLOWED_EXTENSIONS", set())
     return "." in filename and filename.rsplit(".", 1)[1].lower() in allowed
 
+
+def _stage_cache() -> StageCache:
+    return current_app.extensions["stage_cache"]
+
+
+def _blob_store() -> BlobStore:
+    return current_app.extensions["blob_store"]
+
+
+def _upload_store() -> UploadStore:
+    return current_app.extensions["upload_store"]
+
+
+def _storage() -> StorageManager:
+    return current_app.extensions["storage"]
+
+
+def _resolve_upload(filename: str) -> str | None:
+    """
+    Nama tersimpan (<hash>.<ext>) atau nama asli upload → path absolut (None jika tidak ada).
+    Upload yang file aslinya tidak disimpan di-resolve ke working copy .npy-nya.
+    """
+    store = _upload_store()
+    content_hash = store.content_hash_of(filename)
+    if content_hash:
+        # penulisan background dari /upload mungkin belum selesai
+        current_app.extensions["upload_writer"].wait(content_hash)
+    path = store.resolve(filename)
+    if path is None and content_hash:
+        path = find_working_copy(current_app.config["WORK_FOLDER"], content_hash)
+        if path is not None:
+            _stage_cache().remember_hash(path, content_hash)
+    if path is not None and content_hash:
+        # upload + working copy-nya dipakai lagi → tidak jadi korban LRU
+        _storage().touch_input(content_hash)
+    return path
+
+
+def _noise_stage(method: str, form) -> tuple | None:
+    """Form field noise removal (gaussian_ksize, dst.) → spesifikasi stage."""
+    params = {}
+    if method == "gaussian":
+        if form.get("gaussian_ksize"):
+            params["ksize"] = int(form["gaussian_ksize"])
+        if form.get("gaussian_sigma"):
+            params["sigma"] = float(form["gaussian_sigma"])
+    elif method == "median":
+        if form.get("median_ksize"):
+            params["ksize"] = int(form["median_ksize"])
+    else:
+        return None
+    return (method, params)
+
+
+def _contrast_stage(method: str, form) -> tuple | None:
+    """Form field contrast enhancement (clahe_clip_limit, dst.) → spesifikasi stage."""
+    params = {}
+    if method == "clahe":
+        if form.get("clahe_clip_limit"):
+            params["clip_limit"] = float(form["clahe_clip_limit"])
+        if form.get("clahe_tile_grid_size"):
+            params["tile_grid_size"] = int(form["clahe_tile_grid_size"])
+    elif method != "histogram":
+        return None
+    return (method, params)
+
+
+# field form per metode segmentation → nama parameter stage
+_SEGMENTATION_FIELDS = {
+    "adaptive": {"adaptive_block_size": "block_size", "adaptive_c": "c"},
+    "multi_otsu": {"multi_otsu_classes": "classes"},
+    "lung": {"lung_close_ksize": "close_ksize"},
+}
+
+
+def _segmentation_stage(method: str, form) -> tuple:
+    """Form field segmentation (adaptive_block_size, dst.) → spesifikasi stage (divalidasi di service)."""
+    fields = _SEGMENTATION_FIELDS.get(method, {})
+    return (method, {param: form[field] for field, param in fields.items() if form.get(field)})
+
+
+def _preprocessing_stages(form) -> list:
+    """Stage noise_method → contrast_method dari form (yang tidak dipilih dilewati)."""
+    noise_method = (form.get("noise_method", "") or "").lower().strip()
+    contrast_method = (form.get("contrast_method", "") or "").lower().strip()
+    stages = [_noise_stage(noise_method, form), _contrast_stage(contrast_method, form)]
+    return [s for s in stages if s is not None]
+
+
+def _job_queue() -> JobQueue:
+    return current_app.extensions["job_queue"]
+
+
+def _processing_source(image_abs_path: str, cache: StageCache | None = None) -> tuple[str, str]:
+    """
+    (path yang dibaca pipeline, content hash upload).
+    Working copy .npy hasil ingestion dipakai jika ada — tanpa decode ulang.
+    """
+    cache = cache or _stage_cache()
+    content_hash = cache.content_hash(image_abs_path)
+    working_copy = find_working_copy(current_app.config["WORK_FOLDER"], content_hash)
+    return working_copy or image_abs_path, content_hash
+
+
+def _run_stages(
+    image_abs_path: str,
+    stages,
+    cache: StageCache | None = None,
+    on_stage=None,
+    source: tuple[str, str] | None = None,
+    tile_options: dict | None = None,
+) -> list:
+    cache = cache or _stage_cache()
+    source_path, content_hash = source or _processing_source(image_abs_path, cache)
+    return run_pipeline(
+        image_abs_path=source_path,
+        stages=stages,
+        cache=cache,
+        content_hash=content_hash,
+        on_stage=on_stage,
+        **(tile_options or _tile_options()),
+    )
+
+
+def _tile_options() -> dict:
+    """Parameter mode tiled run_pipeline dari config (diambil di request context)."""
+    return {
+        "tile_min_pixels": current_app.config["TILE_MIN_PIXELS"],
+        "tile_size": current_app.config["TILE_SIZE"],
+    }
+
+
+def _load_cached_gray(image_abs_path: str):
+    """Decode + normalize sekali; key sama dengan stage "gray" di run_pipeline."""
+    cache = _stage_cache()
+    source_path, content_hash = _processing_source(image_abs_path, cache)
+    key = cache.make_key(content_hash, "gray")
+    return cache.get_or_compute(key, lambda: load_gray(source_path))
+
+
+def _persist_requested(payload: dict | None = None) -> bool:
+    """Simpan output ke disk? (config PERSIST_OUTPUTS atau field persist=1 di request)"""
+    if current_app.config.get("PERSIST_OUTPUTS"):
+        return True
+    raw = (payload or {}).get("persist", request.values.get("persist", ""))
+    return str(raw).lower() in ("1", "true", "yes", "on")
+
+
+def _code_version() -> str:
+    """Versi kode processing (config CODE_VERSION atau hash services/*.py)."""
+    return code_version(current_app.config.get("CODE_VERSION"))
+
+
+def _etag(*parts) -> str:
+    return make_etag(*parts, version=_code_version())
+
+
+def _not_modified(etag: str, weak: bool = False):
+    """304 tanpa body; hasil yang sama sudah ada di client."""
+    response = Response(status=304)
+    response.set_etag(etag, weak=weak)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _with_etag(rv, etag: str, weak: bool = False):
+    """
+    Tambahkan ETag ke response 200 endpoint processing. Client boleh menyimpan
+    tapi wajib revalidasi (If-None-Match → 304). JSON: ETag weak (isi sama secara
+    semantik, mis. encode_ms bisa berbeda); body gambar: strong.
+    """
+    response = current_app.make_response(rv)
+    if response.status_code == 200:
+        response.set_etag(etag, weak=weak)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
+
+
+def _output_encoding(payload: dict | None = None) -> str:
+    """Profil encoding output: field encoding (form/JSON) atau header Accept; ValueError jika tidak dikenal."""
+    requested = (payload or {}).get("encoding", request.values.get("encoding", ""))
+    if not requested:
+        # profil bergantung pada header Accept → response diberi Vary: Accept
+        g.encoding_negotiated = True
+    return negotiate_encoding(requested, request.accept_mimetypes, current_app.config["OUTPUT_ENCODING"])
+
+
+def _output_blob_id(out_name: str) -> str:
+    # PNG: id tanpa ekstensi (seperti sebelumnya); profil lain: ekstensi ikut supaya tidak bertabrakan
+    stem, ext = os.path.splitext(out_name)
+    return stem if ext == ".png" else out_name
+
+
+def _write_output(
+    out_img,
+    out_name: str,
+    persist: bool,
+    static_folder: str,
+    blob_store: BlobStore,
+    storage: StorageManager | None = None,
+    bilevel: bool = False,
+    encoding: str = "png",
+    report: dict | None = None,
+):
+    """
+    Tulis hasil tanpa butuh request context (dipakai juga oleh worker /jobs).
+    Default: encode di memori ke BlobStore; persist=True: tulis ke static/outputs
+    (dicatat di storage manager supaya ikut budget/TTL).
+    - bilevel=True: mask biner ditulis sebagai PNG 1 bit (profil PNG)
+    - encoding: profil di ENCODING_PROFILES; ekstensi out_name mengikuti profil
+    - report: dict opsional, diisi profil, ukuran dan waktu encode
+    Return (endpoint, values) untuk url_for, atau None jika gagal.
+    """
+    out_name = output_file_name(out_name, encoding)
+    try:
+        data, seconds = encode_output(out_img, encoding, bilevel)
+    except ValueError:
+        return None
+    if report is not None:
+        report.update(encoding_report(encoding, data, seconds))
+
+    if not persist:
+        blob_id = blob_store.put(
+            data,
+            ENCODING_PROFILES[encoding]["mimetype"],
+            filename=out_name,
+            image=out_img,
+            blob_id=_output_blob_id(out_name),
+        )
+        return "main.get_blob", {"blob_id": blob_id}
+
+    output_dir = os.path.join(static_folder, "outputs")
+    os.makedirs(output_dir, exist_ok=True)
+
+    out_path = os.path.join(output_dir, out_name)
+    # unik per proses + thread: request bersamaan bisa menulis output yang sama
+    tmp_path = f"{out_path}.tmp{os.getpid()}_{threading.get_ident()}"
+    try:
+        with timed("disk_write", len(data)):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, out_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+    if storage is not None:
+        storage.track(out_path, "output")
+    return "static", {"filename": f"outputs/{out_name}"}
+
+
+def _existing_output(
+    out_name: str,
+    persist: bool,
+    static_folder: str,
+    blob_store: BlobStore,
+    storage: StorageManager | None = None,
+    encoding: str = "png",
+):
+    """
+    Output dengan nama deterministik yang sudah pernah dibuat → (endpoint, values), atau None.
+    Nama output = (hash input, hash pipeline, ekstensi profil), jadi hasilnya pasti sama.
+    """
+    out_name = output_file_name(out_name, encoding)
+    if persist:
+        out_path = os.path.join(static_folder, "outputs", out_name)
+        if os.path.exists(out_path):
+            if storage is not None:
+                storage.touch(out_path)
+            return "static", {"filename": f"outputs/{out_name}"}
+        return None
+    blob_id = _output_blob_id(out_name)
+    if blob_store.get(blob_id) is not None:
+        return "main.get_blob", {"blob_id": blob_id}
+    return None
+
+
+def _save_output(
+    out_img,
+    out_name: str,
+    persist: bool = False,
+    bilevel: bool = False,
+    encoding: str = "png",
+    report: dict | None = None,
+) -> str | None:
+    """Simpan hasil dan return URL-nya (None jika gagal)."""
+    target = _write_output(
+        out_img,
+        out_name,
+        persist,
+        current_app.static_folder,
+        _blob_store(),
+        _storage(),
+        bilevel=bilevel,
+        encoding=encoding,
+        report=report,
+    )
+    if target is None:
+        return None
+    endpoint, values = target
+    return url_for(endpoint, **values)
+
+
+def _output_response(out_img, out_name: str, encoding: str, bilevel: bool = False):
+    # response=image: kirim hasil langsung sebagai body, tanpa round trip kedua
+    if (request.values.get("response", "") or "").lower() == "image":
+        try:
+            data, seconds = encode_output(out_img, encoding, bilevel)
+        except ValueError:
+            return jsonify({"error": "gagal encode output"}), 500
+        return Response(
+            data,
+            mimetype=ENCODING_PROFILES[encoding]["mimetype"],
+            headers={"X-Encoding": encoding, "X-Encode-Ms": f"{seconds * 1000.0:.2f}"},
+        )
+
+    report = {}
+    out_url = _save_output(
+        out_img, out_name, persist=_persist_requested(), bilevel=bilevel, encoding=encoding, report=report
+    )
+    if out_url is None:
+        return jsonify({"error": "gagal menyimpan output"}), 500
+
+    return jsonify({
+        "out_url": out_url,
+        "encoding": report,
+    })
+
+
+def _pipeline_output_response(image_abs_path: str, stages, prefix: str):
+    """
+    Jalankan stages dan kirim output stage terakhir (dipakai route /process/* lama).
+    Output yang sama (hash input + hash pipeline) sudah ada → langsung dikirim tanpa hitung ulang.
+    """
+    try:
+        specs = parse_stage_specs(stages)
+        encoding = _output_encoding()
+    except (ValueError, TypeError):
+        return jsonify({"error": "invalid input"}), 400
+
+    source = _processing_source(image_abs_path)
+    pipe_hash = pipeline_hash(specs)
+    out_name = output_name(prefix, source[1], pipe_hash, version=_code_version())
+    as_image = (request.values.get("response", "") or "").lower() == "image"
+    persist = _persist_requested()
+    etag = _etag(source[1], pipe_hash, prefix, encoding, "image" if as_image else f"json:{int(persist)}")
+
+    if as_image:
+        # body gambar ada di client → cukup ETag cocok
+        if etag_matches(request.if_none_match, etag):
+            return _not_modified(etag)
+    else:
+        existing = _existing_output(
+            out_name, persist, current_app.static_folder, _blob_store(), _storage(), encoding
+        )
+        if existing is not None:
+            # out_url di client masih valid hanya jika outputnya masih ada
+            if etag_matches(request.if_none_match, etag):
+                return _not_modified(etag, weak=True)
+            body = {"out_url": url_for(existing[0], **existing[1]), "encoding": {"profile": encoding}}
+            return _with_etag(jsonify(body), etag, weak=True)
+
+    out_img = _run_stages(image_abs_path, specs, source=source)[-1]
+    return _with_etag(
+        _output_response(out_img, out_name, encoding, bilevel=specs[-1][0] in BINARY_MASK_STAGES),
+        etag,
+        weak=not as_image,
+    )
+
+
+def _upload_error(message: str, status: int = 200):
+    return render_template(
+        "index.html",
+        image_path=None,
+        has_image=False,
+        error_message=message,
+        image_filename=None,
+    ), status
+
+
+def _persist_upload_requested() -> bool:
+    """
+    Simpan file asli ke static/uploads? (config UPLOAD_PERSIST_ORIGINAL, override field persist_upload;
+    UPLOAD_FORCE_PERSIST mengabaikan override)
+    """
+    if current_app.config.get("UPLOAD_FORCE_PERSIST"):
+        return True
+    raw = request.form.get("persist_upload")
+    if raw is None or raw == "":
+        return bool(current_app.config.get("UPLOAD_PERSIST_ORIGINAL", True))
+    return str(raw).lower() in ("1", "true", "yes", "on")
+
+
+def _ingest_upload(data: bytes, stored_name: str, content_hash: str, gray, persist_original: bool) -> None:
+    """
+    Tulis file asli (opsional) + working copy. Default di background (request tidak menunggu disk);
+    UPLOAD_ASYNC_WRITES=False (mis. beberapa proses worker) → langsung, karena request berikutnya
+    bisa jatuh ke proses lain yang tidak bisa menunggu writer proses ini.
+    """
+    store = _upload_store()
+    storage = _storage()
+    work_folder = current_app.config["WORK_FOLDER"]
+
+    def write():
+        if persist_original:
+            storage.track(store.write(stored_name, data), "upload")
+        ingest_gray(gray, work_folder, content_hash, stored_name, len(data))
+        for path in working_copy_paths(work_folder, content_hash):
+            storage.track(path, "work")
+
+    if current_app.config.get("UPLOAD_ASYNC_WRITES", True):
+        current_app.extensions["upload_writer"].submit(content_hash, write)
+    else:
+        write()
+
+
 @main.route("/upload", methods=["POST"])
 def upload():
+    """
+    Upload tanpa save-lalu-baca-ulang: stream multipart dibaca ke memori, dicek
+    ukuran + dimensi dari header, lalu di-decode langsung (cv2.imdecode) ke grayscale.
+    Gray masuk stage cache untuk request berikutnya; file asli dan working copy
+    ditulis di background (file asli dilewati jika persist_upload=0).
+    """
+    max_bytes = current_app.config["UPLOAD_MAX_BYTES"]
+    if request.content_length is not None and request.content_length > max_bytes + 64 * 1024:
+        # jauh lebih besar dari batas (sisa 64 KB untuk overhead multipart) → tolak tanpa membaca body
+        return _upload_error("File terlalu besar.", 413)
+
     file = request.files.get("image")
     if not file or file.filename == "":
-        return render_template(
-            "index.html",
-            image_path=None,
-            has_image=False,
-            error_message="Pilih file gambar terlebih dahulu.",
-            image_filename=None,
-        )
+        return _upload_error("Pilih file gambar terlebih dahulu.")
 
     filename = secure_filename(file.filename)
     if not allowed_file(filename):
-        return render_template(
-            "index.html",
-            image_path=None,
-            has_image=False,
-            error_message="Format harus jpg, jpeg, atau png.",
-            image_filename=None,
+        return _upload_error("Format harus jpg, jpeg, atau png.")
+
+    with timed("upload_read"):
+        data = file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        return _upload_error("File terlalu besar.", 413)
+
+    # dimensi dari header PNG/JPEG: gambar raksasa ditolak sebelum decode mengalokasikan buffer
+    dims = image_dimensions(data)
+    if dims is None:
+        return _upload_error("Gambar tidak bisa dibaca.")
+    if dims[0] * dims[1] > current_app.config["UPLOAD_MAX_PIXELS"]:
+        return _upload_error("Dimensi gambar terlalu besar.", 413)
+
+    content_hash = hashlib.sha256(data).hexdigest()
+    store = _upload_store()
+    stored_name = store.stored_name_for(content_hash, filename)
+
+    # film yang sama sudah pernah di-ingest → pakai working copy, tanpa decode ulang
+    cache = _stage_cache()
+    key = cache.make_key(content_hash, "gray")
+    gray = cache.get(key)
+    if gray is None:
+        working_copy = find_working_copy(current_app.config["WORK_FOLDER"], content_hash)
+        try:
+            gray = load_gray(working_copy) if working_copy else decode_gray(data)
+        except ValueError:
+            return _upload_error("Gambar tidak bisa dibaca.")
+        cache.put(key, gray)
+
+    store.register(filename, content_hash, stored_name)
+    _ingest_upload(data, stored_name, content_hash, gray, _persist_upload_requested())
+
+    if store.has_file(stored_name):
+        image_url = url_for("static", filename=f"uploads/{stored_name}")
+    else:
+        # file asli belum (atau tidak akan) ada di disk → tampilkan dari memori:
+        # bytes asli tanpa encode ulang + gray untuk histogram
+        mimetype = "image/png" if data.startswith(b"\x89PNG") else "image/jpeg"
+        blob_id = _blob_store().put(
+            data, mimetype, filename=stored_name, image=gray, blob_id=f"upload_{content_hash[:16]}"
         )
+        image_url = url_for("main.get_blob", blob_id=blob_id)
 
-    upload_folder = current_app.config["UPLOAD_FOLDER"]
-    os.makedirs(upload_folder, exist_ok=True)
-    save_path = os.path.join(upload_folder, filename)
-    file.save(save_path)
-
-    image_url = url_for("static", filename=f"uploads/{filename}")
     return render_template(
         "index.html",
         image_path=image_url,
         has_image=True,
         error_message=None,
-        image_filename=filename,
+        image_filename=stored_name,
+        upload_alias=filename,
     )
 
 
 @main.route("/clear", methods=["POST"])
 def clear():
     filename = secure_filename(request.form.get("filename", ""))
-    upload_folder = current_app.config["UPLOAD_FOLDER"]
-    outputs_folder = os.path.join(current_app.static_folder, "outputs")
-
-    if filename:
-        target_path = os.path.join(upload_folder, filename)
-        if (
-            os.path.commonpath([os.path.abspath(target_path), os.path.abspath(upload_folder)])
-            == os.path.abspath(upload_folder)
-            and os.path.exists(target_path)
-        ):
-            os.remove(target_path)
-
-        base_name = os.path.splitext(filename)[0]
-        if os.path.exists(outputs_folder):
-            for fname in os.listdir(outputs_folder):
-                if not fname.endswith(".png"):
-                    continue
-                if fname.endswith(f"_{base_name}.png") or fname == f"hist_{base_name}.png":
-                    out_path = os.path.join(outputs_folder, fname)
-                    if os.path.commonpath([os.path.abspath(out_path), os.path.abspath(outputs_folder)]) == os.path.abspath(outputs_folder):
-                        os.remove(out_path)
+    alias = secure_filename(request.form.get("alias", ""))
+
+    store = _upload_store()
+    content_hash = store.content_hash_of(filename) if filename else None
+    if content_hash:
+        # UI mengirim nama tersimpan <hash>.<ext> + alias yang didaftarkan upload-nya;
+        # nama tersimpan bukan alias, jadi yang dilepas adalah alias tersebut
+        if alias and store.content_hash_of(alias) == content_hash:
+            filename = alias
+        current_app.extensions["upload_writer"].wait(content_hash)
+        # upload dideduplikasi: hanya alias pemanggil yang dilepas, konten dihapus
+        # setelah referensi terakhirnya hilang
+        if store.release(filename):
+            # upload, working copy dan semua output turunannya: satu lookup index (tanpa listdir)
+            _storage().remove_input(content_hash)
+            # BlobStore / StageCache milik proses ini; proses worker lain kedaluwarsa lewat TTL/LRU
+            _blob_store().remove_input(content_hash)
+            _stage_cache().remove_input(content_hash)
 
     return render_template(
         "index.html",
@@ -97,6 +632,7 @@ def clear():
         image_filename=None,
     )
 
+
 @main.route("/process/noise-removal", methods=["POST"])
 def process_noise_removal():
     filename = secure_filename(request.form.get("filename", ""))
@@ -105,46 +641,16 @@ def process_noise_removal():
     if not filename or method not in ("gaussian", "median"):
         return jsonify({"error": "invalid input"}), 400
 
-    # Ambil absolute path dari folder upload (SUDAH ADA DI CONFIG)
-    upload_folder = current_app.config["UPLOAD_FOLDER"]
-    image_abs_path = os.path.join(upload_folder, filename)
+    # Nama tersimpan / alias → absolute path di folder upload
+    image_abs_path = _resolve_upload(filename)
+    if image_abs_path is None:
+        return jsonify({"error": "file not found"}), 404
 
     # Parameter optional: hanya teruskan jika ada input; default di service.
-    gaussian_ksize_raw = request.form.get("gaussian_ksize")
-    gaussian_sigma_raw = request.form.get("gaussian_sigma")
-    median_ksize_raw = request.form.get("median_ksize")
-
-    kwargs = {}
-    if gaussian_ksize_raw:
-        kwargs["gaussian_ksize"] = int(gaussian_ksize_raw)
-    if gaussian_sigma_raw:
-        kwargs["gaussian_sigma"] = float(gaussian_sigma_raw)
-    if median_ksize_raw:
-        kwargs["median_ksize"] = int(median_ksize_raw)
-
-    # PROSES NOISE REMOVAL
-    out_img = noise_removal(
-        image_abs_path=image_abs_path,
-        method=method,
-        **kwargs,
-    )
-
-    # Simpan hasil ke static/outputs
-    output_dir = os.path.join(current_app.static_folder, "outputs")
-    os.makedirs(output_dir, exist_ok=True)
+    stages = [_noise_stage(method, request.form)]
 
-    # bikin nama output aman + konsisten png
-    base_name = os.path.splitext(filename)[0]  # nama file tanpa ekstensi
-    out_name = f"nr_{method}_{base_name}.png"
-    out_path = os.path.join(output_dir, out_name)
-
-    ok = cv2.imwrite(out_path, out_img)
-    if not ok:
-        return jsonify({"error": "gagal menyimpan output"}), 500
-
-    return jsonify({
-        "out_url": url_for("static", filename=f"outputs/{out_name}")
-    })
+    # PROSES NOISE REMOVAL (nama output dari hash input + hash pipeline)
+    return _pipeline_output_response(image_abs_path, stages, "nr")
 
 
 @main.route("/process/contrast-enhancement", methods=["POST"])
@@ -155,59 +661,18 @@ def process_contrast_enhancement():
     if not filename or method not in ("histogram", "clahe"):
         return jsonify({"error": "invalid input"}), 400
 
-    upload_folder = current_app.config["UPLOAD_FOLDER"]
-    image_abs_path = os.path.join(upload_folder, filename)
+    image_abs_path = _resolve_upload(filename)
+    if image_abs_path is None:
+        return jsonify({"error": "file not found"}), 404
 
-    clip_limit_raw = request.form.get("clahe_clip_limit")
-    tile_grid_raw = request.form.get("clahe_tile_grid_size")
     noise_method = (request.form.get("noise_method", "") or "").lower().strip()
-    gaussian_ksize_raw = request.form.get("gaussian_ksize")
-    gaussian_sigma_raw = request.form.get("gaussian_sigma")
-    median_ksize_raw = request.form.get("median_ksize")
-
-    kwargs = {}
-    if clip_limit_raw:
-        kwargs["clahe_clip_limit"] = float(clip_limit_raw)
-    if tile_grid_raw:
-        kwargs["clahe_tile_grid_size"] = int(tile_grid_raw)
-
-    pre_gray = None
-    if noise_method in ("gaussian", "median"):
-        noise_kwargs = {}
-        if gaussian_ksize_raw:
-            noise_kwargs["gaussian_ksize"] = int(gaussian_ksize_raw)
-        if gaussian_sigma_raw:
-            noise_kwargs["gaussian_sigma"] = float(gaussian_sigma_raw)
-        if median_ksize_raw:
-            noise_kwargs["median_ksize"] = int(median_ksize_raw)
-
-        pre_gray = noise_removal(
-            image_abs_path=image_abs_path,
-            method=noise_method,
-            **noise_kwargs,
-        )
+    stages = [
+        _noise_stage(noise_method, request.form),
+        _contrast_stage(method, request.form),
+    ]
+    stages = [s for s in stages if s is not None]
 
-    out_img = contrast_enhancement(
-        image_abs_path=image_abs_path,
-        method=method,
-        pre_gray=pre_gray,
-        **kwargs,
-    )
-
-    output_dir = os.path.join(current_app.static_folder, "outputs")
-    os.makedirs(output_dir, exist_ok=True)
-
-    base_name = os.path.splitext(filename)[0]
-    out_name = f"ce_{method}_{base_name}.png"
-    out_path = os.path.join(output_dir, out_name)
-
-    ok = cv2.imwrite(out_path, out_img)
-    if not ok:
-        return jsonify({"error": "gagal menyimpan output"}), 500
-
-    return jsonify({
-        "out_url": url_for("static", filename=f"outputs/{out_name}")
-    })
+    return _pipeline_output_response(image_abs_path, stages, "ce")
 
 
 @main.route("/process/segmentation", methods=["POST"])
@@ -215,70 +680,52 @@ def process_segmentation():
     filename = secure_filename(request.form.get("filename", ""))
     method = (request.form.get("method", "") or "").lower().strip()
 
-    if not filename or method not in ("otsu",):
+    if not filename or method not in SEGMENTATION_STAGES:
         return jsonify({"error": "invalid input"}), 400
 
-    upload_folder = current_app.config["UPLOAD_FOLDER"]
-    image_abs_path = os.path.join(upload_folder, filename)
+    image_abs_path = _resolve_upload(filename)
+    if image_abs_path is None:
+        return jsonify({"error": "file not found"}), 404
 
-    noise_method = (request.form.get("noise_method", "") or "").lower().strip()
-    contrast_method = (request.form.get("contrast_method", "") or "").lower().strip()
-    clip_limit_raw = request.form.get("clahe_clip_limit")
-    tile_grid_raw = request.form.get("clahe_tile_grid_size")
-    gaussian_ksize_raw = request.form.get("gaussian_ksize")
-    gaussian_sigma_raw = request.form.get("gaussian_sigma")
-    median_ksize_raw = request.form.get("median_ksize")
-
-    pre_gray = None
-    if noise_method in ("gaussian", "median"):
-        noise_kwargs = {}
-        if gaussian_ksize_raw:
-            noise_kwargs["gaussian_ksize"] = int(gaussian_ksize_raw)
-        if gaussian_sigma_raw:
-            noise_kwargs["gaussian_sigma"] = float(gaussian_sigma_raw)
-        if median_ksize_raw:
-            noise_kwargs["median_ksize"] = int(median_ksize_raw)
-
-        pre_gray = noise_removal(
-            image_abs_path=image_abs_path,
-            method=noise_method,
-            **noise_kwargs,
-        )
+    # otsu | adaptive | multi_otsu | lung (latency per metode tercatat di /metrics dan Server-Timing)
+    stages = _preprocessing_stages(request.form) + [_segmentation_stage(method, request.form)]
+    return _pipeline_output_response(image_abs_path, stages, "seg")
 
-    if contrast_method in ("histogram", "clahe"):
-        kwargs = {}
-        if clip_limit_raw:
-            kwargs["clahe_clip_limit"] = float(clip_limit_raw)
-        if tile_grid_raw:
-            kwargs["clahe_tile_grid_size"] = int(tile_grid_raw)
 
-        pre_gray = contrast_enhancement(
-            image_abs_path=image_abs_path,
-            method=contrast_method,
-            pre_gray=pre_gray,
-            **kwargs,
-        )
+@main.route("/process/segmentation/mask", methods=["POST"])
+def process_segmentation_mask():
+    """
+    Mask segmentation sebagai JSON (tanpa gambar): RLE gaya COCO + bounding box + area.
+    Form sama dengan /process/segmentation, ditambah:
+      - rle: "compressed" (default, string COCO) atau "list" (counts sebagai list int)
+    Foreground = piksel > 127 (multi_otsu: kelas di atas level tengah, sama seperti masking).
+    """
+    filename = secure_filename(request.form.get("filename", ""))
+    method = (request.form.get("method", "") or "").lower().strip()
+    rle_format = (request.form.get("rle", "") or "compressed").lower().strip()
 
-    out_img = image_segmentation(
-        image_abs_path=image_abs_path,
-        method=method,
-        pre_gray=pre_gray,
-    )
+    if not filename or method not in SEGMENTATION_STAGES or rle_format not in ("compressed", "list"):
+        return jsonify({"error": "invalid input"}), 400
 
-    output_dir = os.path.join(current_app.static_folder, "outputs")
-    os.makedirs(output_dir, exist_ok=True)
+    image_abs_path = _resolve_upload(filename)
+    if image_abs_path is None:
+        return jsonify({"error": "file not found"}), 404
 
-    base_name = os.path.splitext(filename)[0]
-    out_name = f"seg_{method}_{base_name}.png"
-    out_path = os.path.join(output_dir, out_name)
+    stages = _preprocessing_stages(request.form) + [_segmentation_stage(method, request.form)]
+    try:
+        specs = parse_stage_specs(stages)
+    except (ValueError, TypeError):
+        return jsonify({"error": "invalid input"}), 400
 
-    ok = cv2.imwrite(out_path, out_img)
-    if not ok:
-        return jsonify({"error": "gagal menyimpan output"}), 500
+    source = _processing_source(image_abs_path)
+    etag = _etag(source[1], pipeline_hash(specs), "mask", rle_format)
+    if etag_matches(request.if_none_match, etag):
+        return _not_modified(etag)
 
-    return jsonify({
-        "out_url": url_for("static", filename=f"outputs/{out_name}")
-    })
+    mask = _run_stages(image_abs_path, specs, source=source)[-1]
+    with timed("mask_encode", mask.nbytes):
+        body = describe_mask(mask, compressed=rle_format == "compressed")
+    return _with_etag(jsonify({"method": method, **body}), etag)
 
 
 @main.route("/process/image-masking", methods=["POST"])
@@ -288,123 +735,698 @@ def process_image_masking():
     if not filename:
         return jsonify({"error": "invalid input"}), 400
 
-    upload_folder = current_app.config["UPLOAD_FOLDER"]
-    image_abs_path = os.path.join(upload_folder, filename)
+    image_abs_path = _resolve_upload(filename)
+    if image_abs_path is None:
+        return jsonify({"error": "file not found"}), 404
 
-    # Ambil parameter untuk preprocessing (noise removal, contrast enhancement)
-    noise_method = (request.form.get("noise_method", "") or "").lower().strip()
-    contrast_method = (request.form.get("contrast_method", "") or "").lower().strip()
-    clip_limit_raw = request.form.get("clahe_clip_limit")
-    tile_grid_raw = request.form.get("clahe_tile_grid_size")
-    gaussian_ksize_raw = request.form.get("gaussian_ksize")
-    gaussian_sigma_raw = request.form.get("gaussian_sigma")
-    median_ksize_raw = request.form.get("median_ksize")
-    
-    # Parameter untuk segmentation (untuk membuat mask)
+    # Parameter untuk segmentation (untuk membuat mask): salah satu SEGMENTATION_STAGES
     segmentation_method = (request.form.get("segmentation_method", "") or "").lower().strip()
     if not segmentation_method:
         segmentation_method = "otsu"  # default ke otsu
 
-    # Preprocessing: noise removal
-    pre_gray = None
-    if noise_method in ("gaussian", "median"):
-        noise_kwargs = {}
-        if gaussian_ksize_raw:
-            noise_kwargs["gaussian_ksize"] = int(gaussian_ksize_raw)
-        if gaussian_sigma_raw:
-            noise_kwargs["gaussian_sigma"] = float(gaussian_sigma_raw)
-        if median_ksize_raw:
-            noise_kwargs["median_ksize"] = int(median_ksize_raw)
-
-        pre_gray = noise_removal(
-            image_abs_path=image_abs_path,
-            method=noise_method,
-            **noise_kwargs,
-        )
+    # Preprocessing (noise removal, contrast enhancement) → segmentation → masking
+    stages = _preprocessing_stages(request.form) + [
+        ("masking", {"segmentation_method": segmentation_method}),
+    ]
+    # segmentation_method tidak dikenal → 400 dari validasi stage
+    return _pipeline_output_response(image_abs_path, stages, "masked")
 
-    # Preprocessing: contrast enhancement
-    if contrast_method in ("histogram", "clahe"):
-        kwargs = {}
-        if clip_limit_raw:
-            kwargs["clahe_clip_limit"] = float(clip_limit_raw)
-        if tile_grid_raw:
-            kwargs["clahe_tile_grid_size"] = int(tile_grid_raw)
 
-        pre_gray = contrast_enhancement(
-            image_abs_path=image_abs_path,
-            method=contrast_method,
-            pre_gray=pre_gray,
-            **kwargs,
-        )
+def _pipeline_output_name(prefix: str, content_hash: str, specs, index: int, version: str) -> str:
+    """Nama output stage ke-index: ditentukan oleh input, prefix pipeline sampai stage itu dan versi kode."""
+    return output_name(prefix, content_hash, pipeline_hash(specs[: index + 1]), version=version)
+
+
+def _json_payload() -> dict | None:
+    """Body JSON sebagai dict ({} jika tidak ada body); None jika JSON valid tapi bukan object."""
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return {}
+    return payload if isinstance(payload, dict) else None
+
+
+def _parse_pipeline_payload(payload: dict):
+    """
+    Validasi body JSON pipeline (dipakai /process/pipeline dan /jobs).
+    Return ((image_abs_path, specs, wanted, filename), None) atau (None, error_response).
+    """
+    filename = secure_filename(payload.get("filename", "") or "")
+    stages = payload.get("stages") or []
+
+    if not filename or not isinstance(stages, list) or not stages:
+        return None, (jsonify({"error": "invalid input"}), 400)
+
+    try:
+        specs = parse_stage_specs(stages)
+    except (ValueError, TypeError):
+        return None, (jsonify({"error": "invalid input"}), 400)
+
+    wanted = payload.get("outputs")
+    if wanted is None:
+        wanted = [len(specs) - 1]
+    if not isinstance(wanted, list) or not all(
+        isinstance(i, int) and -len(specs) <= i < len(specs) for i in wanted
+    ):
+        return None, (jsonify({"error": "invalid outputs"}), 400)
+
+    image_abs_path = _resolve_upload(filename)
+    if image_abs_path is None:
+        return None, (jsonify({"error": "file not found"}), 404)
+
+    return (image_abs_path, specs, wanted, filename), None
 
-    # Buat mask dari segmentation
-    mask = image_segmentation(
-        image_abs_path=image_abs_path,
-        method=segmentation_method,
-        pre_gray=pre_gray,
+
+@main.route("/process/pipeline", methods=["POST"])
+def process_pipeline():
+    """
+    Jalankan beberapa stage sekaligus dalam satu request.
+    Body JSON:
+      - filename: nama file upload
+      - stages: list stage, mis. [["median", {"ksize": 5}], ["clahe", {}], ["otsu", {}]]
+      - outputs: index stage yang ingin dikembalikan (default: stage terakhir saja)
+      - histogram: jika true, sertakan juga histogram setiap output
+      - histogram_data: jika true, sertakan 256 bin histogram mentah setiap output
+      - persist: jika true, output ditulis ke static/outputs (default: di memori)
+      - encoding: profil output (png, png-fast, webp, jpeg, npy); default dari header Accept
+        atau OUTPUT_ENCODING. Histogram selalu PNG.
+    """
+    payload = _json_payload()
+    if payload is None:
+        return jsonify({"error": "invalid input"}), 400
+    parsed, error = _parse_pipeline_payload(payload)
+    if error is not None:
+        return error
+    image_abs_path, specs, wanted, filename = parsed
+    try:
+        encoding = _output_encoding(payload)
+    except ValueError:
+        return jsonify({"error": "invalid encoding"}), 400
+
+    source = _processing_source(image_abs_path)
+    persist = _persist_requested(payload)
+    indices = [i % len(specs) for i in wanted]
+    version = _code_version()
+    names = {index: _pipeline_output_name("pl", source[1], specs, index, version) for index in indices}
+    etag = _etag(
+        source[1],
+        pipeline_hash(specs),
+        indices,
+        bool(payload.get("histogram")),
+        bool(payload.get("histogram_data")),
+        encoding,
+        int(persist),
     )
 
-    # Terapkan masking
-    out_img = apply_image_masking(
-        image_abs_path=image_abs_path,
-        mask=mask,
-        pre_gray=pre_gray,
+    # Semua output sudah pernah dihitung (input + pipeline sama) → tidak perlu menjalankan pipeline
+    outputs = []
+    for index in indices:
+        target = _existing_output(
+            names[index], persist, current_app.static_folder, _blob_store(), _storage(), encoding
+        )
+        hist_target = None
+        if payload.get("histogram"):
+            hist_target = _existing_output(
+                f"hist_{names[index]}", persist, current_app.static_folder, _blob_store(), _storage()
+            )
+        if target is None or (payload.get("histogram") and hist_target is None):
+            break
+        item = {"index": index, "stage": specs[index][0], "out_url": url_for(target[0], **target[1])}
+        if hist_target is not None:
+            item["hist_url"] = url_for(hist_target[0], **hist_target[1])
+        outputs.append(item)
+    else:
+        # semua URL di response client masih valid
+        if etag_matches(request.if_none_match, etag):
+            return _not_modified(etag, weak=True)
+        if not payload.get("histogram_data"):
+            return _with_etag(jsonify({"outputs": outputs, "encoding": {"profile": encoding}}), etag, weak=True)
+
+    results = _run_stages(image_abs_path, specs, source=source)
+
+    outputs = []
+    for index in indices:
+        stage_name = specs[index][0]
+        report = {}
+        out_url = _save_output(
+            results[index],
+            names[index],
+            persist,
+            bilevel=stage_name in BINARY_MASK_STAGES,
+            encoding=encoding,
+            report=report,
+        )
+        if out_url is None:
+            return jsonify({"error": "gagal menyimpan output"}), 500
+
+        item = {"index": index, "stage": stage_name, "out_url": out_url, "encoding": report}
+        if payload.get("histogram") or payload.get("histogram_data"):
+            # histogram langsung dari output stage di memori (satu calcHist)
+            counts = histogram_counts(results[index])
+        if payload.get("histogram_data"):
+            item["histogram"] = counts.tolist()
+        if payload.get("histogram"):
+            hist_url = _save_output(
+                render_histogram_image(results[index], counts=counts),
+                f"hist_{names[index]}",
+                persist,
+            )
+            if hist_url is None:
+                return jsonify({"error": "gagal menyimpan histogram"}), 500
+            item["hist_url"] = hist_url
+        outputs.append(item)
+
+    return _with_etag(jsonify({"outputs": outputs, "encoding": {"profile": encoding}}), etag, weak=True)
+
+
+@main.route("/process/preview", methods=["POST"])
+def process_preview():
+    """
+    Preview cepat pipeline di level pyramid yang diperkecil.
+    Body JSON sama dengan /process/pipeline, ditambah:
+      - max_side: sisi terpanjang minimal untuk preview (default PREVIEW_MAX_SIDE)
+      - full: jika true, hasil full resolution dijadwalkan di /jobs (background)
+    """
+    payload = _json_payload()
+    if payload is None:
+        return jsonify({"error": "invalid input"}), 400
+    parsed, error = _parse_pipeline_payload(payload)
+    if error is not None:
+        return error
+    image_abs_path, specs, wanted, filename = parsed
+
+    try:
+        max_side = int(payload.get("max_side") or current_app.config["PREVIEW_MAX_SIDE"])
+        encoding = _output_encoding(payload)
+    except (ValueError, TypeError):
+        return jsonify({"error": "invalid input"}), 400
+
+    start = time.perf_counter()
+    cache = _stage_cache()
+    content_hash = cache.content_hash(image_abs_path)
+    gray = _load_cached_gray(image_abs_path)
+
+    level = choose_level(gray.shape, max(max_side, 1))
+    small = pyramid_level(gray, level, cache, content_hash)
+    scaled = scale_stages(specs, level)
+    with timed("preview"):
+        # namespace cache per level supaya tidak tercampur dengan hasil full resolution
+        result = run_pipeline(
+            image_abs_path=image_abs_path,
+            stages=scaled,
+            pre_gray=small,
+            cache=cache,
+            content_hash=f"{content_hash}@L{level}",
+        )[-1]
+
+    report = {}
+    out_url = _save_output(
+        result,
+        output_name(f"preview{level}", content_hash, pipeline_hash(scaled), version=_code_version()),
+        bilevel=scaled[-1][0] in BINARY_MASK_STAGES,
+        encoding=encoding,
+        report=report,
     )
+    if out_url is None:
+        return jsonify({"error": "gagal menyimpan output"}), 500
 
-    output_dir = os.path.join(current_app.static_folder, "outputs")
-    os.makedirs(output_dir, exist_ok=True)
+    body = {
+        "out_url": out_url,
+        "encoding": report,
+        "level": level,
+        "scale": 1.0 / (2 ** level),
+        "shape": list(result.shape),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000.0, 2),
+    }
+    if payload.get("full"):
+        try:
+            job_id = _enqueue_pipeline(
+                image_abs_path, specs, wanted, filename, _persist_requested(payload), encoding
+            )
+            body["full_status_url"] = url_for("main.get_job", job_id=job_id)
+        except QueueFull:
+            body["full_status_url"] = None
+    return jsonify(body)
+
+
+@main.route("/process/sweep", methods=["POST"])
+def process_sweep():
+    """
+    Evaluasi banyak kombinasi parameter dalam satu request.
+    Body JSON:
+      - filename: nama file upload
+      - stages: spesifikasi stage dengan list pada parameter yang di-sweep, mis.
+        [["gaussian", {"ksize": [3, 5, 7]}], ["clahe", {"clip_limit": [1.0, 2.0], "tile_grid_size": [4, 8]}]]
+      - thumbnail_size: sisi terpanjang thumbnail (default 256)
+      - thumbnails: sertakan URL thumbnail per varian (default true)
+      - contact_sheet: sertakan satu gambar grid semua varian (default true)
+    """
+    payload = _json_payload()
+    if payload is None:
+        return jsonify({"error": "invalid input"}), 400
+    filename = secure_filename(payload.get("filename", "") or "")
+    stages = payload.get("stages") or []
+    if not filename or not isinstance(stages, list) or not stages:
+        return jsonify({"error": "invalid input"}), 400
 
-    base_name = os.path.splitext(filename)[0]
-    out_name = f"masked_{base_name}.png"
-    out_path = os.path.join(output_dir, out_name)
+    try:
+        variants = expand_grid(stages)
+        thumb_size = int(payload.get("thumbnail_size", 256))
+    except (ValueError, TypeError, KeyError):
+        return jsonify({"error": "invalid input"}), 400
+    if thumb_size < 16:
+        return jsonify({"error": "invalid input"}), 400
+    if len(variants) > current_app.config["SWEEP_MAX_VARIANTS"]:
+        return jsonify({"error": "too many variants", "max": current_app.config["SWEEP_MAX_VARIANTS"]}), 400
 
-    ok = cv2.imwrite(out_path, out_img)
-    if not ok:
-        return jsonify({"error": "gagal menyimpan output"}), 500
+    image_abs_path = _resolve_upload(filename)
+    if image_abs_path is None:
+        return jsonify({"error": "file not found"}), 404
+
+    # Prefix bersama (decode + normalize) sekali, lalu pohon varian paralel
+    gray = _load_cached_gray(image_abs_path)
+
+    def summarize(img):
+        # dipanggil begitu varian selesai → hasil full resolution tidak ditahan sampai akhir sweep
+        return variant_stats(img), make_thumbnail(img, thumb_size)
+
+    with timed("sweep"):
+        results = run_sweep(gray, variants, max_workers=current_app.config["SWEEP_WORKERS"], on_leaf=summarize)
+
+    content_hash = _stage_cache().content_hash(image_abs_path)
+    variant_hashes = [pipeline_hash(v) for v in variants]
+    version = _code_version()
+    thumbs = [thumb for _, thumb in results]
+    labels = [variant_label(v) for v in variants]
+
+    items = []
+    for i, (variant, (stats, thumb)) in enumerate(zip(variants, results)):
+        item = {
+            "index": i,
+            "stages": [[name, params] for name, params in variant],
+            "label": labels[i],
+            "stats": stats,
+        }
+        if payload.get("thumbnails", True):
+            thumb_url = _save_output(thumb, output_name(f"sweep{thumb_size}", content_hash, variant_hashes[i], version=version))
+            if thumb_url is None:
+                return jsonify({"error": "gagal menyimpan output"}), 500
+            item["thumb_url"] = thumb_url
+        items.append(item)
+
+    body = {"variants": items}
+    if payload.get("contact_sheet", True):
+        grid_hash = hashlib.sha256(":".join(variant_hashes).encode("ascii")).hexdigest()
+        sheet_url = _save_output(contact_sheet(thumbs, labels), output_name(f"sweepsheet{thumb_size}", content_hash, grid_hash, version=version))
+        if sheet_url is None:
+            return jsonify({"error": "gagal menyimpan output"}), 500
+        body["contact_sheet_url"] = sheet_url
+
+    return jsonify(body)
+
+
+def _enqueue_pipeline(
+    image_abs_path: str, specs, wanted, filename: str, persist: bool, encoding: str = "png"
+) -> str:
+    """Masukkan pipeline ke JobQueue; return job id (QueueFull jika antrian penuh)."""
+    # Objek yang dipakai di thread worker diambil sekarang (tanpa request context)
+    cache = _stage_cache()
+    blob_store = _blob_store()
+    storage = _storage()
+    static_folder = current_app.static_folder
+    source = _processing_source(image_abs_path, cache)
+    tile_options = _tile_options()
+    version = _code_version()
+
+    def work(progress):
+        return _run_stages(
+            image_abs_path, specs, cache=cache, on_stage=progress, source=source, tile_options=tile_options
+        )
+
+    def store(results):
+        outputs = []
+        for i in wanted:
+            index = i % len(specs)
+            stage_name = specs[index][0]
+            target = _write_output(
+                results[index],
+                # nama sama dengan /process/pipeline → hasil job dan request sinkron saling dipakai ulang
+                _pipeline_output_name("pl", source[1], specs, index, version),
+                persist,
+                static_folder,
+                blob_store,
+                storage,
+                bilevel=stage_name in BINARY_MASK_STAGES,
+                encoding=encoding,
+            )
+            if target is None:
+                raise ValueError("gagal menyimpan output")
+            outputs.append({"index": index, "stage": stage_name, "target": target})
+        return outputs
+
+    return _job_queue().submit(work, total_stages=len(specs), on_done=store)
+
+
+@main.route("/jobs", methods=["POST"])
+def submit_job():
+    """
+    Jalankan pipeline secara asynchronous di worker pool lokal.
+    Body JSON sama dengan /process/pipeline (filename, stages, outputs, persist, encoding).
+    Response 202 berisi job_id; status dipoll lewat GET /jobs/<id>.
+    Antrian penuh → 429.
+    """
+    payload = _json_payload()
+    if payload is None:
+        return jsonify({"error": "invalid input"}), 400
+    parsed, error = _parse_pipeline_payload(payload)
+    if error is not None:
+        return error
+    image_abs_path, specs, wanted, filename = parsed
+    try:
+        encoding = _output_encoding(payload)
+    except ValueError:
+        return jsonify({"error": "invalid encoding"}), 400
+
+    try:
+        job_id = _enqueue_pipeline(image_abs_path, specs, wanted, filename, _persist_requested(payload), encoding)
+    except QueueFull:
+        response = jsonify({"error": "queue full"})
+        response.headers["Retry-After"] = "1"
+        return response, 429
 
     return jsonify({
-        "out_url": url_for("static", filename=f"outputs/{out_name}")
-    })
+        "job_id": job_id,
+        "status_url": url_for("main.get_job", job_id=job_id),
+    }), 202
+
+
+@main.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = _job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "not found"}), 404
+
+    body = {
+        "job_id": job["id"],
+        "state": job["state"],
+        "progress": job["progress"],
+    }
+    if job["started_at"] is not None:
+        end = job["finished_at"] or time.time()
+        body["elapsed_ms"] = round((end - job["started_at"]) * 1000.0, 2)
+    if job["state"] == "failed":
+        body["error"] = job["error"]
+    if job["state"] == "done":
+        outputs = [
+            {"index": o["index"], "stage": o["stage"], "out_url": url_for(o["target"][0], **o["target"][1])}
+            for o in job["result"]
+        ]
+        body["outputs"] = outputs
+        body["result_url"] = outputs[-1]["out_url"] if outputs else None
+    return jsonify(body)
+
+
+@main.route("/batch", methods=["POST"])
+def process_batch():
+    """
+    Banyak gambar + satu pipeline dalam satu request (multipart), hasil di-stream.
+      - images: satu atau lebih file gambar, dan/atau
+      - archive: file zip berisi gambar
+      - stages: JSON spesifikasi stage (format sama dengan /process/pipeline)
+      - format: "ndjson" (default): satu baris JSON per gambar dengan out_url
+                "zip": zip berisi hasil + summary.json
+      - persist: (ndjson) tulis output ke static/outputs, default di BlobStore
+      - encoding: profil output (lihat services/encoding.py), default PNG
+    Hasil dikirim sesuai urutan selesai; baris terakhir NDJSON berisi ringkasan.
+    """
+    try:
+        specs = parse_stage_specs(json.loads(request.form.get("stages", "") or "[]"))
+    except (ValueError, TypeError):
+        return jsonify({"error": "invalid input"}), 400
+    fmt = (request.form.get("format", "") or "ndjson").lower().strip()
+    if not specs or fmt not in ("ndjson", "zip"):
+        return jsonify({"error": "invalid input"}), 400
+    try:
+        encoding = _output_encoding()
+    except ValueError:
+        return jsonify({"error": "invalid encoding"}), 400
+
+    files = request.files.getlist("images")
+    archive = request.files.get("archive")
+    allowed = current_app.config.get("ALLOWED_EXTENSIONS", set())
+    try:
+        total = count_batch_inputs(files, archive, allowed)
+    except ValueError:
+        return jsonify({"error": "invalid archive"}), 400
+    if total == 0:
+        return jsonify({"error": "no images"}), 400
+    if total > current_app.config["BATCH_MAX_FILES"]:
+        return jsonify({"error": "too many images", "max": current_app.config["BATCH_MAX_FILES"]}), 400
+
+    # Objek yang dipakai di thread worker diambil sekarang (tanpa request context)
+    pipe_hash = pipeline_hash(specs)
+    version = _code_version()
+    bilevel = specs[-1][0] in BINARY_MASK_STAGES
+    persist = _persist_requested()
+    static_folder = current_app.static_folder
+    blob_store = _blob_store()
+    storage = _storage()
+    workers = current_app.config["BATCH_WORKERS"]
+    tile_options = _tile_options()
+    max_bytes = current_app.config["UPLOAD_MAX_BYTES"]
+    max_pixels = current_app.config["UPLOAD_MAX_PIXELS"]
+
+    def process(name, data):
+        start = time.perf_counter()
+        # batas sama dengan /upload, per gambar; error jadi baris/entry error, batch tetap jalan
+        if data is None or len(data) > max_bytes:
+            raise ValueError("File terlalu besar.")
+        dims = image_dimensions(data)
+        if dims is None:
+            raise ValueError("Gambar tidak bisa dibaca.")
+        if dims[0] * dims[1] > max_pixels:
+            raise ValueError("Dimensi gambar terlalu besar.")
+        content_hash = hashlib.sha256(data).hexdigest()
+        item = {"content_hash": content_hash}
+        if fmt == "zip":
+            out_img = run_pipeline("", specs, pre_gray=decode_gray(data), **tile_options)[-1]
+            item["data"], _ = encode_output(out_img, encoding, bilevel)
+        else:
+            # nama sama dengan output akhir /process/pipeline → film yang sudah pernah diproses tidak dihitung ulang
+            out_name = output_name("pl", content_hash, pipe_hash, version=version)
+            target = _existing_output(out_name, persist, static_folder, blob_store, storage, encoding)
+            if target is None:
+                out_img = run_pipeline("", specs, pre_gray=decode_gray(data), **tile_options)[-1]
+                target = _write_output(
+                    out_img, out_name, persist, static_folder, blob_store, storage, bilevel=bilevel, encoding=encoding
+                )
+                if target is None:
+                    raise ValueError("gagal menyimpan output")
+            item["target"] = target
+        item["elapsed_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+        return item
+
+    # Context request di-pop (Request.close() → semua file di request.__dict__["files"]
+    # ditutup) segera setelah view return, sebelum generator response berjalan;
+    # stream_with_context hanya mem-push ulang context yang file-nya sudah tertutup.
+    # Tanpa ini, gambar setelah jendela in-flight pertama gagal "I/O operation on
+    # closed file" (tests/test_batch_stream.py) → lepaskan dari request, tutup sendiri.
+    uploads = request.files
+    request.__dict__["files"] = MultiDict()
+
+    def results():
+        try:
+            yield from imap_unordered(process, iter_batch_inputs(files, archive, allowed, max_bytes), workers)
+        finally:
+            for upload in uploads.values():
+                upload.close()
+
+    def error_message(error) -> str:
+        return str(error) if isinstance(error, ValueError) else "gagal memproses gambar"
+
+    def generate_ndjson():
+        start = time.perf_counter()
+        failed = 0
+        for index, name, item, error in results():
+            line = {"index": index, "name": name}
+            if error is not None:
+                failed += 1
+                line["error"] = error_message(error)
+            else:
+                line["content_hash"] = item["content_hash"]
+                line["out_url"] = url_for(item["target"][0], **item["target"][1])
+                line["elapsed_ms"] = item["elapsed_ms"]
+            yield json.dumps(line) + "\n"
+        yield json.dumps({
+            "done": True,
+            "total": total,
+            "failed": failed,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000.0, 2),
+        }) + "\n"
+
+    def generate_zip():
+        archive_out = ZipStream()
+        summary = []
+        for index, name, item, error in results():
+            entry = {"index": index, "name": name}
+            if error is not None:
+                entry["error"] = error_message(error)
+            else:
+                stem = os.path.splitext(os.path.basename(name))[0]
+                entry["content_hash"] = item["content_hash"]
+                entry["elapsed_ms"] = item["elapsed_ms"]
+                entry["file"], chunk = archive_out.add(f"{stem}.{ENCODING_PROFILES[encoding]['ext']}", item["data"])
+                yield chunk
+            summary.append(entry)
+        yield archive_out.add("summary.json", json.dumps(summary, indent=2).encode("utf-8"))[1]
+        yield archive_out.close()
+
+    if fmt == "zip":
+        return Response(
+            stream_with_context(generate_zip()),
+            mimetype="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="batch.zip"'},
+        )
+    return Response(stream_with_context(generate_ndjson()), mimetype="application/x-ndjson")
+
+
+@main.route("/metrics", methods=["GET"])
+def metrics():
+    """Metrics format teks Prometheus: latency per stage/endpoint, byte, cache."""
+    cache_stats = _stage_cache().stats()
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    blob_stats = _blob_store().stats()
+    job_stats = _job_queue().stats()
+    storage_stats = _storage().stats()
+    clahe_stats = clahe_pool.stats()
+    upload_writer = current_app.extensions["upload_writer"]
+    counters = {
+        "xray_clahe_pool_hits_total": clahe_stats["hits"],
+        "xray_clahe_pool_misses_total": clahe_stats["misses"],
+        "xray_stage_cache_hits_total": cache_stats["hits"],
+        "xray_stage_cache_misses_total": cache_stats["misses"],
+        "xray_storage_evictions_total": storage_stats["evictions"],
+        "xray_upload_write_failures_total": upload_writer.failures,
+    }
+    gauges = {
+        "xray_stage_cache_hit_ratio": (cache_stats["hits"] / lookups) if lookups else 0.0,
+        "xray_stage_cache_bytes": cache_stats["bytes"],
+        "xray_stage_cache_entries": cache_stats["entries"],
+        "xray_blob_store_bytes": blob_stats["bytes"],
+        "xray_blob_store_entries": blob_stats["entries"],
+        "xray_jobs_active": job_stats["active"],
+        "xray_storage_bytes": storage_stats["bytes"],
+        "xray_storage_files": storage_stats["files"],
+        "xray_upload_writes_pending": upload_writer.pending(),
+    }
+    return Response(
+        metrics_registry.render_prometheus(gauges, counters),
+        mimetype="text/plain; version=0.0.4",
+    )
 
 
-@main.route("/process/histogram", methods=["POST"])
-def process_histogram():
+@main.route("/blobs/<blob_id>", methods=["GET"])
+def get_blob(blob_id):
+    entry = _blob_store().get(blob_id)
+    if entry is None:
+        return jsonify({"error": "not found"}), 404
+
+    # id blob output deterministik (hash input + pipeline); id acak tidak pernah dipakai ulang
+    etag = _etag("blob", blob_id)
+    if etag_matches(request.if_none_match, etag):
+        response = _not_modified(etag)
+    else:
+        response = Response(
+            entry["data"],
+            mimetype=entry["mimetype"],
+            headers={"Content-Disposition": f'inline; filename="{entry["filename"]}"'},
+        )
+        response.set_etag(etag)
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config["OUTPUT_CACHE_MAX_AGE"]
+    return response
+
+
+def _histogram_source():
     """
-    Generate histogram image for a given image under the static folder.
-    Accepts:
-      - image_path: path relative to /static (e.g., 'uploads/foo.png' atau 'outputs/bar.png')
+    Ambil image untuk histogram dari form (image_path di /static atau blob in-memory).
+    Return (img, base_name, None) atau (None, None, error_response).
     """
     rel_path = request.form.get("image_path", "").lstrip("/")
+    blob_id = request.form.get("blob_id", "")
+    if not blob_id and rel_path.startswith("blobs/"):
+        blob_id = rel_path.split("/", 1)[1]
+
+    if blob_id:
+        # Hasil in-memory: pakai array yang tersimpan, tidak perlu decode ulang
+        entry = _blob_store().get(blob_id)
+        if entry is None or entry["image"] is None:
+            return None, None, (jsonify({"error": "file not found"}), 404)
+        return entry["image"], os.path.splitext(entry["filename"])[0], None
+
     if not rel_path:
-        return jsonify({"error": "invalid input"}), 400
+        return None, None, (jsonify({"error": "invalid input"}), 400)
 
     static_root = current_app.static_folder
     abs_target = os.path.normpath(os.path.join(static_root, rel_path))
 
     # Pastikan path berada di dalam static
     if os.path.commonpath([abs_target, static_root]) != os.path.abspath(static_root):
-        return jsonify({"error": "invalid path"}), 400
+        return None, None, (jsonify({"error": "invalid path"}), 400)
 
     if not os.path.exists(abs_target):
-        return jsonify({"error": "file not found"}), 404
-
-    img = cv2.imread(abs_target, cv2.IMREAD_GRAYSCALE)
+        return None, None, (jsonify({"error": "file not found"}), 404)
+
+    if abs_target.lower().endswith(".npy"):
+        # output profil npy
+        try:
+            img = np.load(abs_target)
+        except (OSError, ValueError):
+            img = None
+    else:
+        img = cv2.imread(abs_target, cv2.IMREAD_GRAYSCALE)
     if img is None:
-        return jsonify({"error": "cannot read image"}), 500
+        return None, None, (jsonify({"error": "cannot read image"}), 500)
+    return img, os.path.splitext(os.path.basename(rel_path))[0], None
 
-    hist_img = render_histogram_image(img)
 
-    output_dir = os.path.join(static_root, "outputs")
-    os.makedirs(output_dir, exist_ok=True)
+@main.route("/process/histogram", methods=["POST"])
+def process_histogram():
+    """
+    Generate histogram image for a given image under the static folder.
+    Accepts:
+      - image_path: path relative to /static (e.g., 'uploads/foo.png' atau 'outputs/bar.png')
+                    atau URL blob in-memory ('blobs/<id>')
+      - blob_id: id hasil in-memory (alternatif image_path)
+    """
+    img, base_name, error = _histogram_source()
+    if error is not None:
+        return error
 
-    base_name = os.path.splitext(os.path.basename(rel_path))[0]
-    out_name = f"hist_{base_name}.png"
-    out_path = os.path.join(output_dir, out_name)
+    hist_img = render_histogram_image(img)
 
-    ok = cv2.imwrite(out_path, hist_img)
-    if not ok:
+    out_url = _save_output(hist_img, f"hist_{base_name}.png", persist=_persist_requested())
+    if out_url is None:
         return jsonify({"error": "gagal menyimpan histogram"}), 500
 
     return jsonify({
-        "out_url": url_for("static", filename=f"outputs/{out_name}")
+        "out_url": out_url
+    })
+
+
+@main.route("/process/histogram-data", methods=["POST"])
+def process_histogram_data():
+    """
+    Histogram mentah (256 bin) sebagai JSON agar client bisa plot sendiri.
+    Accepts: image_path / blob_id (sama seperti /process/histogram)
+    """
+    img, _, error = _histogram_source()
+    if error is not None:
+        return error
+
+    counts = histogram_counts(img)
+    return jsonify({
+        "bins": 256,
+        "counts": counts.tolist(),
+        "total": int(counts.sum()),
     })
@@ -0,0 +1,255 @@
+"""
+Batch processing untuk folder / glob X-ray tanpa lewat HTTP.
+
+Contoh:
+    python batch.py data/xray "median:ksize=5,clahe:clip_limit=2.0,otsu" out/
+    python batch.py "data/**/*.png" '[["gaussian", {"ksize": 7}], ["clahe", {}]]' out/ --workers 4
+
+Output tiap file: <out>/<subfolder>/<nama>.png + <nama>.json (manifest), dengan
+subfolder mengikuti path input relatif terhadap folder input (atau bagian pola
+glob sebelum wildcard). Input non-PNG diberi akhiran ekstensi (x.jpg → x_jpg.png)
+supaya tidak bertabrakan dengan x.png. File yang manifest-nya sudah cocok
+(hash isi input + hash pipeline) dilewati, sehingga batch yang terputus bisa
+dijalankan ulang.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from services.http_cache import code_version
+from services.image_processing import parse_stage_specs, pipeline_hash, run_pipeline
+from services.stage_cache import file_content_hash
+
+ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png"}
+# sama dengan TILE_MIN_PIXELS di app/__init__.py
+DEFAULT_TILE_MIN_PIXELS = 36_000_000
+
+
+def parse_pipeline_arg(text: str) -> list[tuple[str, dict]]:
+    """
+    Format pipeline:
+      - JSON: '[["median", {"ksize": 5}], ["otsu", {}]]'
+      - ringkas: 'median:ksize=5,clahe:clip_limit=2.0;tile_grid_size=8,otsu'
+    """
+    text = text.strip()
+    if text.startswith("["):
+        return parse_stage_specs(json.loads(text))
+
+    stages = []
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, raw_params = part.partition(":")
+        params = {}
+        for item in filter(None, raw_params.split(";")):
+            key, _, value = item.partition("=")
+            params[key.strip()] = value.strip()
+        stages.append((name, params))
+    return parse_stage_specs(stages)
+
+
+def collect_inputs(source: str, recursive: bool = False) -> list[str]:
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "**", "*") if recursive else os.path.join(source, "*")
+        candidates = glob.glob(pattern, recursive=recursive)
+    else:
+        candidates = glob.glob(source, recursive=True)
+
+    return sorted(
+        path for path in candidates
+        if os.path.isfile(path) and path.rsplit(".", 1)[-1].lower() in ALLOWED_EXTENSIONS
+    )
+
+
+def input_root(source: str) -> str:
+    """Folder acuan path output: folder input, atau bagian pola glob sebelum komponen wildcard pertama."""
+    if os.path.isdir(source):
+        return source
+    root = []
+    for part in os.path.normpath(source).split(os.sep):
+        if glob.has_magic(part):
+            break
+        root.append(part)
+    else:
+        # bukan pola: satu file
+        root = root[:-1]
+    return os.sep.join(root) or (os.sep if os.path.isabs(source) else ".")
+
+
+def _output_base(image_abs_path: str, output_dir: str, root: str) -> str:
+    """<output_dir>/<path relatif input tanpa ekstensi>; ekstensi selain png ikut di nama (x.jpg → x_jpg)."""
+    rel = os.path.relpath(os.path.abspath(image_abs_path), os.path.abspath(root))
+    stem, ext = os.path.splitext(rel)
+    if ext != ".png":
+        stem = f"{stem}_{ext[1:]}"
+    return os.path.join(output_dir, stem)
+
+
+def _output_paths(image_abs_path: str, output_dir: str, root: str) -> tuple[str, str]:
+    base = _output_base(image_abs_path, output_dir, root)
+    return f"{base}.png", f"{base}.json"
+
+
+def is_done(image_abs_path: str, output_dir: str, pipe_hash: str, root: str) -> bool:
+    """True jika output + manifest sudah ada dan cocok dengan input, pipeline & versi kode."""
+    out_path, manifest_path = _output_paths(image_abs_path, output_dir, root)
+    if not (os.path.exists(out_path) and os.path.exists(manifest_path)):
+        return False
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (
+        manifest.get("pipeline_hash") == pipe_hash
+        and manifest.get("code_version") == code_version()
+        and manifest.get("source_hash") == file_content_hash(image_abs_path)
+    )
+
+
+def _init_worker() -> None:
+    # Paralelisme sudah dari process pool; cegah oversubscription thread OpenCV
+    cv2.setNumThreads(1)
+
+
+def process_file(
+    image_abs_path: str,
+    stages: list,
+    output_dir: str,
+    root: str,
+    save_intermediates: bool = False,
+    tile_min_pixels: int | None = None,
+) -> dict:
+    """Jalankan pipeline untuk satu file lalu simpan output + manifest."""
+    start = time.perf_counter()
+    results = run_pipeline(image_abs_path=image_abs_path, stages=stages, tile_min_pixels=tile_min_pixels)
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+    out_path, manifest_path = _output_paths(image_abs_path, output_dir, root)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    if not cv2.imwrite(out_path, results[-1]):
+        raise ValueError(f"gagal menyimpan output: {out_path}")
+
+    if save_intermediates:
+        base = os.path.splitext(out_path)[0]
+        for i, ((name, _), img) in enumerate(zip(stages, results[:-1])):
+            cv2.imwrite(f"{base}_{i}_{name}.png", img)
+
+    manifest = {
+        "source": os.path.abspath(image_abs_path),
+        "source_hash": file_content_hash(image_abs_path),
+        "pipeline": stages,
+        "pipeline_hash": pipeline_hash(stages),
+        "code_version": code_version(),
+        "elapsed_ms": round(elapsed_ms, 2),
+    }
+    # manifest ditulis terakhir: jika proses terhenti, file akan diproses ulang
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    return {"path": image_abs_path, "elapsed_ms": elapsed_ms}
+
+
+def run_batch(
+    inputs: list[str],
+    stages: list,
+    output_dir: str,
+    workers: int | None = None,
+    force: bool = False,
+    save_intermediates: bool = False,
+    root: str | None = None,
+    tile_min_pixels: int | None = DEFAULT_TILE_MIN_PIXELS,
+    log=print,
+) -> dict:
+    """
+    root: folder acuan path output (default: folder bersama semua input).
+    tile_min_pixels: film sebesar ini atau lebih difilter per tile (None = selalu full image).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pipe_hash = pipeline_hash(stages)
+    if root is None:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in inputs]) if inputs else "."
+
+    pending = [p for p in inputs if force or not is_done(p, output_dir, pipe_hash, root)]
+    skipped = len(inputs) - len(pending)
+    if skipped:
+        log(f"skip {skipped} file (output sudah ada untuk pipeline {pipe_hash[:12]})")
+
+    summary = {"total": len(inputs), "skipped": skipped, "done": 0, "failed": 0, "elapsed_ms": []}
+    if not pending:
+        return summary
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {
+            pool.submit(process_file, path, stages, output_dir, root, save_intermediates, tile_min_pixels): path
+            for path in pending
+        }
+        for n, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:  # satu file gagal tidak menghentikan batch
+                summary["failed"] += 1
+                log(f"[{n}/{len(pending)}] GAGAL {path}: {exc}")
+                continue
+            summary["done"] += 1
+            summary["elapsed_ms"].append(result["elapsed_ms"])
+            log(f"[{n}/{len(pending)}] {path} {result['elapsed_ms']:.1f} ms")
+
+    wall = time.perf_counter() - start
+    log(
+        f"selesai: {summary['done']} ok, {summary['failed']} gagal, "
+        f"{skipped} dilewati dalam {wall:.2f} s ({workers} worker)"
+    )
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batch noise removal / contrast / segmentation X-ray.")
+    parser.add_argument("input", help="folder input atau pola glob (mis. 'data/**/*.png')")
+    parser.add_argument("pipeline", help="spesifikasi pipeline (JSON atau 'median:ksize=5,clahe,otsu')")
+    parser.add_argument("output", help="folder output")
+    parser.add_argument("--workers", type=int, default=None, help="jumlah proses (default: jumlah core)")
+    parser.add_argument("--recursive", action="store_true", help="cari file di subfolder (jika input folder)")
+    parser.add_argument("--force", action="store_true", help="proses ulang walaupun output sudah ada")
+    parser.add_argument("--save-intermediates", action="store_true", help="simpan juga hasil setiap stage")
+    parser.add_argument(
+        "--tile-min-pixels",
+        type=int,
+        default=DEFAULT_TILE_MIN_PIXELS,
+        help="film dengan piksel sebanyak ini atau lebih difilter per tile (0 = nonaktif)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        stages = parse_pipeline_arg(args.pipeline)
+    except (ValueError, TypeError) as exc:
+        parser.error(str(exc))
+
+    inputs = collect_inputs(args.input, recursive=args.recursive)
+    if not inputs:
+        print("tidak ada file jpg/jpeg/png yang cocok", file=sys.stderr)
+        return 1
+
+    summary = run_batch(
+        inputs,
+        stages,
+        args.output,
+        workers=args.workers,
+        force=args.force,
+        save_intermediates=args.save_intermediates,
+        root=input_root(args.input),
+        tile_min_pixels=args.tile_min_pixels or None,
+        log=lambda msg: print(msg, flush=True),
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
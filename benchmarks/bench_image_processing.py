@@ -0,0 +1,249 @@
+"""
+Benchmark services.image_processing dan endpoint Flask.
+
+Contoh:
+    python -m benchmarks.bench_image_processing --output bench.json
+    python -m benchmarks.bench_image_processing --sizes 512 1024 --baseline bench.json
+
+Setiap hasil berisi waktu (min/median/mean ms), throughput (megapiksel/detik)
+dan peak memori (tracemalloc: alokasi NumPy/Python; buffer internal OpenCV
+tidak terhitung). Dengan --baseline, hasil dibandingkan dengan file JSON
+sebelumnya dan exit code 1 jika ada yang lebih lambat dari --threshold.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import synthetic_chest_xray
+from services import image_processing as ip
+from services.encoding import ENCODING_PROFILES, encode_output
+
+DEFAULT_SIZES = (512, 1024, 2048, 4096)
+
+
+def measure(func, repeat: int) -> dict:
+    """Jalankan func() `repeat` kali; satu putaran tambahan untuk peak memori."""
+    func()  # warm-up
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min_ms": min(times) * 1000.0,
+        "median_ms": statistics.median(times) * 1000.0,
+        "mean_ms": statistics.fmean(times) * 1000.0,
+        "peak_mem_bytes": peak,
+    }
+
+
+def function_cases(img: np.ndarray):
+    """(nama, parameter, callable) untuk setiap fungsi publik yang di-benchmark."""
+    mask = ip.apply_otsu(img)
+    cases = [("normalize_gray_uint8", {}, lambda: ip.normalize_gray_uint8(img))]
+    for ksize in (3, 5, 9):
+        cases.append(("apply_gaussian", {"ksize": ksize, "sigma": 1.0}, lambda k=ksize: ip.apply_gaussian(img, k, 1.0)))
+    for ksize in (3, 5, 9, 15):
+        cases.append(("apply_median", {"ksize": ksize}, lambda k=ksize: ip.apply_median(img, k)))
+    for grid in (4, 8, 16):
+        cases.append(("apply_clahe", {"clip_limit": 2.0, "tile_grid_size": grid}, lambda g=grid: ip.apply_clahe(img, 2.0, g)))
+    cases += [
+        ("apply_histogram_equalization", {}, lambda: ip.apply_histogram_equalization(img)),
+        ("apply_otsu", {}, lambda: ip.apply_otsu(img)),
+        ("apply_adaptive_threshold", {"block_size": 51, "c": 5.0}, lambda: ip.apply_adaptive_threshold(img, 51, 5.0)),
+        ("apply_multi_otsu", {"classes": 3}, lambda: ip.apply_multi_otsu(img, 3)),
+        ("apply_lung_segmentation", {"close_ksize": 15}, lambda: ip.apply_lung_segmentation(img, 15)),
+        ("apply_image_masking", {}, lambda: ip.apply_image_masking("", mask, pre_gray=img)),
+        ("render_histogram_image", {}, lambda: ip.render_histogram_image(img)),
+        ("encode_png", {}, lambda: ip.encode_png(img)),
+    ]
+    for profile in ENCODING_PROFILES:
+        cases.append(("encode_output", {"encoding": profile}, lambda p=profile: encode_output(img, p)))
+    cases.append(("encode_output", {"encoding": "png", "bilevel": True}, lambda: encode_output(mask, "png", True)))
+    # stack (N, H, W) citra berukuran sama: satu panggilan untuk semua citra
+    stack = np.stack([img] * 4)
+    mask_stack = np.stack([mask] * 4)
+    cases += [
+        ("normalize_gray_uint8", {"stack": 4}, lambda: ip.normalize_gray_uint8(stack)),
+        ("apply_histogram_equalization", {"stack": 4}, lambda: ip.apply_histogram_equalization(stack)),
+        ("apply_otsu", {"stack": 4}, lambda: ip.apply_otsu(stack)),
+        ("apply_image_masking", {"stack": 4}, lambda: ip.apply_image_masking("", mask_stack, pre_gray=stack)),
+    ]
+    cases += [
+        (
+            "run_pipeline",
+            {"stages": "median,clahe,masking"},
+            lambda: ip.run_pipeline("", ["median", "clahe", "masking"], pre_gray=img),
+        ),
+    ]
+    return cases
+
+
+def endpoint_cases(img: np.ndarray, workdir: str):
+    """
+    Endpoint /process/* via Flask test client (stage cache dikosongkan tiap panggilan).
+    response=image supaya output selalu dihitung ulang (bukan diambil dari output yang sudah ada).
+    """
+    from app import create_app
+    from services.storage import UploadStore
+
+    app = create_app()
+    app.config["TESTING"] = True
+    app.config["UPLOAD_FOLDER"] = workdir
+    app.extensions["upload_store"] = UploadStore(workdir, os.path.join(workdir, "uploads.json"))
+    client = app.test_client()
+    cache = app.extensions["stage_cache"]
+
+    filename = "bench.png"
+    cv2.imwrite(os.path.join(workdir, filename), img)
+
+    requests_ = [
+        ("/process/noise-removal", {"filename": filename, "method": "median"}),
+        ("/process/contrast-enhancement", {"filename": filename, "method": "clahe", "noise_method": "gaussian"}),
+        ("/process/segmentation", {"filename": filename, "method": "otsu", "contrast_method": "clahe"}),
+        ("/process/segmentation", {"filename": filename, "method": "lung", "contrast_method": "clahe"}),
+        ("/process/image-masking", {"filename": filename, "noise_method": "median", "contrast_method": "clahe"}),
+    ]
+
+    def call(path, data):
+        cache.clear()
+        response = client.post(path, data={**data, "response": "image"})
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} → {response.status_code}")
+
+    upload_bytes = cv2.imencode(".png", img)[1].tobytes()
+
+    def upload():
+        # upload ulang film yang sama: baca + cek header + hash, gray dari working copy; file asli tidak ditulis
+        cache.clear()
+        response = client.post(
+            "/upload",
+            data={"image": (io.BytesIO(upload_bytes), filename), "persist_upload": "0"},
+            content_type="multipart/form-data",
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"/upload → {response.status_code}")
+
+    cases = [(f"POST {path}", data, lambda p=path, d=data: call(p, d)) for path, data in requests_]
+    cases.append(("POST /upload", {"persist_upload": 0}, upload))
+    return cases
+
+
+def run_benchmarks(sizes, repeat: int, include_endpoints: bool = True, log=print) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            img = synthetic_chest_xray(size)
+            megapixels = img.size / 1e6
+            cases = function_cases(img)
+            if include_endpoints:
+                cases += endpoint_cases(img, workdir)
+
+            for name, params, func in cases:
+                stats = measure(func, repeat)
+                processed = megapixels * params.get("stack", 1)
+                stats["mp_per_s"] = processed / (stats["median_ms"] / 1000.0) if stats["median_ms"] else 0.0
+                entry = {"name": name, "size": size, "params": params, **stats}
+                results.append(entry)
+                log(
+                    f"{name:<34} {size:>5}² {json.dumps(params):<42} "
+                    f"{stats['median_ms']:9.2f} ms {stats['mp_per_s']:9.1f} MP/s "
+                    f"{stats['peak_mem_bytes'] / 1e6:8.1f} MB"
+                )
+
+    return {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+            "cv2_threads": cv2.getNumThreads(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _result_key(entry: dict) -> str:
+    return f"{entry['name']}|{entry['size']}|{json.dumps(entry['params'], sort_keys=True)}"
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    """Bandingkan median_ms dengan baseline; return daftar regresi (> threshold)."""
+    base = {_result_key(e): e for e in baseline.get("results", [])}
+    regressions = []
+    for entry in current["results"]:
+        old = base.get(_result_key(entry))
+        if old is None or not old["median_ms"]:
+            continue
+        ratio = entry["median_ms"] / old["median_ms"]
+        entry["baseline_median_ms"] = old["median_ms"]
+        entry["ratio"] = ratio
+        if ratio > 1.0 + threshold:
+            regressions.append(entry)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark image_processing dan endpoint Flask.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="sisi citra (piksel)")
+    parser.add_argument("--repeat", type=int, default=5, help="jumlah pengulangan per kasus")
+    parser.add_argument("--no-endpoints", action="store_true", help="lewati benchmark endpoint Flask")
+    parser.add_argument("--output", help="simpan hasil ke file JSON")
+    parser.add_argument("--baseline", help="file JSON hasil sebelumnya untuk perbandingan")
+    parser.add_argument("--threshold", type=float, default=0.10, help="batas regresi relatif (default 0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        args.sizes,
+        args.repeat,
+        include_endpoints=not args.no_endpoints,
+        log=lambda msg: print(msg, flush=True),
+    )
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        report["regressions"] = [_result_key(e) for e in regressions]
+        for entry in regressions:
+            print(
+                f"REGRESI {entry['name']} {entry['size']}² {json.dumps(entry['params'])}: "
+                f"{entry['baseline_median_ms']:.2f} → {entry['median_ms']:.2f} ms (x{entry['ratio']:.2f})"
+            )
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"tidak ada regresi > {args.threshold:.0%} terhadap {args.baseline}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+App untuk benchmarks.load_test dengan folder data sementara: upload, output persist
+dan instance (journal upload, index storage, working copy) tidak menyentuh
+static/ dan instance/ milik repo.
+
+    XRAY_LOAD_TEST_DIR=<folder> gunicorn -c gunicorn.conf.py "benchmarks.isolated_app:wsgi_app()"
+
+Level atas modul hanya memakai stdlib: wsgi_app() harus bisa mengatur env thread
+sebelum numpy/cv2 di-import (sama seperti wsgi.py).
+"""
+import os
+
+
+def create_isolated_app(data_dir: str):
+    """create_app() dengan static/uploads, static/outputs dan instance/ di bawah data_dir."""
+    from app import create_app
+
+    static_dir = os.path.join(data_dir, "static")
+    upload_dir = os.path.join(static_dir, "uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    app = create_app({"UPLOAD_FOLDER": upload_dir}, instance_path=os.path.join(data_dir, "instance"))
+    # output persist ditulis ke <static_folder>/outputs dan dilayani route static
+    app.static_folder = static_dir
+    return app
+
+
+def wsgi_app():
+    """Factory gunicorn: seperti wsgi.py, folder data dari env XRAY_LOAD_TEST_DIR."""
+    from services.runtime import apply_plan, configure_thread_env, prewarm, serving_plan
+
+    plan = serving_plan()
+    configure_thread_env(plan["cv2_threads"])
+    app = create_isolated_app(os.environ["XRAY_LOAD_TEST_DIR"])
+    apply_plan(app, plan)
+    app.config["PREWARM_SECONDS"] = prewarm(app)
+    return app
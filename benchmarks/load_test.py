@@ -0,0 +1,681 @@
+"""
+Load test endpoint Flask dengan request bersamaan pada X-ray sintetis.
+
+Contoh:
+    python -m benchmarks.load_test --concurrency 1 4 16 --duration 30 --output load.json
+    python -m benchmarks.load_test --mix noise=3,segmentation=1 --size 2048 --images 4
+    python -m benchmarks.load_test --server gunicorn --concurrency 8 16 32
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --server-pid <pid gunicorn master>
+
+Tanpa --url, app dijalankan lokal di proses terpisah: --server werkzeug
+(create_app() + server thread-per-request) atau gunicorn (wsgi.py +
+gunicorn.conf.py, env XRAY_* ikut diteruskan). Client berjalan di proses
+ini, sehingga CPU/RSS server diukur tanpa campuran CPU client. Server lokal
+memakai folder data sementara (benchmarks/isolated_app.py) yang dihapus saat
+selesai: static/ dan instance/ repo tidak tersentuh.
+
+Setiap level concurrency adalah closed loop: N client masing-masing
+mengirim request berikutnya segera setelah response sebelumnya, selama
+--duration detik. Endpoint dipilih acak sesuai bobot --mix; parameter
+(ksize, clip limit, metode) diacak dari grid kecil sehingga campuran
+cache hit/miss di stage cache mendekati pemakaian nyata. /process/histogram
+memakai out_url hasil processing terakhir client yang sama (alur UI).
+Upload mengirim ulang film dari pool (jalur dedupe: baca + hash + cache);
+--fresh-uploads membuat film baru setiap upload (jalur decode + ingestion).
+
+Tanpa opsi lain sebagian besar request processing adalah cache hit (output
+yang sama sudah ada). --cache-bust mengupload varian film dari pool sebelum
+setiap request processing (piksel sama, content hash baru, upload tidak ikut
+diukur) sehingga setiap output benar-benar dihitung. Hit dan miss selalu
+dilaporkan terpisah: hit = output lama dipakai ulang (response tanpa
+encode_ms), miss = output dihitung (stage cache masih bisa membantu sebagian
+jika tanpa --cache-bust).
+
+Laporan per level: throughput, latency p50/p95/p99 (total dan per
+endpoint, juga terpisah untuk cache hit / miss), error rate per status, serta time series CPU (% satu core)
+dan RSS server dari /proc (Linux; proses server + semua child-nya).
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+import zlib
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import synthetic_chest_xray
+
+# op → (path endpoint, variasi form yang dipilih acak)
+ENDPOINTS = {
+    "upload": ("/upload", [{}]),
+    "noise": (
+        "/process/noise-removal",
+        [{"method": "median", "median_ksize": str(k)} for k in (3, 5, 7)]
+        + [{"method": "gaussian", "gaussian_ksize": str(k)} for k in (3, 5)],
+    ),
+    "contrast": (
+        "/process/contrast-enhancement",
+        [{"method": "clahe", "noise_method": "median", "clahe_clip_limit": str(c)} for c in (1.5, 2.0, 3.0)]
+        + [{"method": "histogram", "noise_method": "gaussian"}],
+    ),
+    "segmentation": (
+        "/process/segmentation",
+        [
+            {"method": "otsu", "noise_method": "gaussian", "contrast_method": "clahe"},
+            {"method": "adaptive", "noise_method": "median", "adaptive_block_size": "51"},
+            {"method": "lung", "noise_method": "median", "contrast_method": "clahe"},
+        ],
+    ),
+    "masking": (
+        "/process/image-masking",
+        [
+            {"segmentation_method": "otsu", "noise_method": "median", "contrast_method": "clahe"},
+            {"segmentation_method": "lung", "noise_method": "gaussian", "contrast_method": "clahe"},
+        ],
+    ),
+    "histogram": ("/process/histogram", [{}]),
+}
+
+DEFAULT_MIX = "upload=1,noise=4,contrast=4,segmentation=3,masking=2,histogram=2"
+
+
+def parse_mix(text: str) -> dict:
+    """"noise=3,segmentation=1" → {"noise": 3.0, "segmentation": 1.0}; ValueError jika tidak valid."""
+    mix = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"op tidak dikenal: {name} (pilihan: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight) if weight.strip() else 1.0
+        if mix[name] < 0:
+            raise ValueError(f"bobot {name} harus >= 0")
+    if not any(mix.values()):
+        raise ValueError("mix kosong")
+    return mix
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None, "mean_ms": None}
+    arr = np.asarray(values, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(arr.max()), 2),
+        "mean_ms": round(float(arr.mean()), 2),
+    }
+
+
+# --- CPU / RSS server ------------------------------------------------------
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _proc_stat(pid: int) -> tuple[int, float, int] | None:
+    """(ppid, detik CPU user+system, RSS byte) dari /proc/<pid>/stat; None jika proses sudah hilang."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    # field 2 (comm) boleh berisi spasi/kurung → potong setelah ')' terakhir
+    fields = raw[raw.rfind(")") + 2:].split()
+    ppid = int(fields[1])
+    cpu = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    rss = int(fields[21]) * _PAGE_SIZE
+    return ppid, cpu, rss
+
+
+def _process_tree(root: int) -> dict:
+    """{pid: (cpu detik, rss)} untuk root dan semua turunannya (worker gunicorn)."""
+    stats = {}
+    children: dict = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        stat = _proc_stat(int(name))
+        if stat is not None:
+            stats[int(name)] = stat
+            children.setdefault(stat[0], []).append(int(name))
+    tree = {}
+    todo = [root]
+    while todo:
+        pid = todo.pop()
+        if pid in stats and pid not in tree:
+            tree[pid] = stats[pid][1:]
+            todo.extend(children.get(pid, []))
+    return tree
+
+
+class ProcessSampler:
+    """Thread yang mencatat CPU (% satu core) dan RSS pohon proses server setiap `interval` detik."""
+
+    def __init__(self, pid: int | None, interval: float = 1.0):
+        self.pid = pid
+        self.interval = interval
+        self.available = pid is not None and os.path.exists(f"/proc/{pid}/stat")
+        self.samples: list[dict] = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = 0.0
+        # cpu per pid sampel sebelumnya; proses yang keluar tidak menurunkan total
+        self._last_cpu: dict = {}
+        self._last_time = 0.0
+
+    def _sample(self, record: bool = True) -> None:
+        now = time.perf_counter()
+        tree = _process_tree(self.pid)
+        cpu_delta = sum(max(0.0, cpu - self._last_cpu.get(pid, cpu)) for pid, (cpu, _) in tree.items())
+        elapsed = now - self._last_time
+        if record and elapsed > 0:
+            self.samples.append({
+                "t": round(now - self._start, 2),
+                "cpu_percent": round(100.0 * cpu_delta / elapsed, 1),
+                "rss_bytes": sum(rss for _, rss in tree.values()),
+                "processes": len(tree),
+            })
+        self._last_cpu = {pid: cpu for pid, (cpu, _) in tree.items()}
+        self._last_time = now
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        if not self.available:
+            return
+        self.samples = []
+        self._stop.clear()
+        self._start = time.perf_counter()
+        self._sample(record=False)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> list[dict]:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+            self._thread = None
+        return self.samples
+
+
+def summarize_samples(samples: list[dict]) -> dict:
+    if not samples:
+        return {"available": False}
+    cpu = [s["cpu_percent"] for s in samples]
+    rss = [s["rss_bytes"] for s in samples]
+    return {
+        "available": True,
+        "cpu_percent_mean": round(float(np.mean(cpu)), 1),
+        "cpu_percent_max": round(float(max(cpu)), 1),
+        "rss_bytes_start": rss[0],
+        "rss_bytes_max": max(rss),
+        "rss_bytes_end": rss[-1],
+    }
+
+
+# --- server lokal -------------------------------------------------------------
+
+def serve(host: str, port: int, data_dir: str) -> None:
+    """Jalankan app (folder data di data_dir) dengan server werkzeug thread-per-request (lewat --serve)."""
+    from werkzeug.serving import make_server
+
+    from benchmarks.isolated_app import create_isolated_app
+
+    app = create_isolated_app(data_dir)
+    make_server(host, port, app, threaded=True).serve_forever()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind: str, port: int, log_file, data_dir: str) -> subprocess.Popen:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    if kind == "gunicorn":
+        env["XRAY_BIND"] = f"127.0.0.1:{port}"
+        env["XRAY_LOAD_TEST_DIR"] = data_dir
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "benchmarks.isolated_app:wsgi_app()"]
+    else:
+        cmd = [
+            sys.executable, "-m", "benchmarks.load_test", "--serve", "--port", str(port), "--data-dir", data_dir,
+        ]
+    return subprocess.Popen(cmd, cwd=root, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def wait_ready(host: str, port: int, proc: subprocess.Popen | None, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"server berhenti (exit {proc.returncode})")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=5)
+            conn.request("GET", "/metrics")
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server tidak siap dalam {timeout:.0f} detik")
+
+
+# --- client --------------------------------------------------------------------
+
+def _multipart(fields: dict, files: dict) -> tuple[bytes, str]:
+    """Body multipart/form-data; files: {field: (nama file, bytes)}."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+        )
+    for name, (filename, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n".encode("utf-8")
+        )
+        parts.append(data)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Client:
+    """Satu koneksi keep-alive per client; koneksi dibuka ulang setelah error."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host, self.port, self.timeout = host, port, timeout
+        self._conn = None
+
+    def post(self, path: str, body: bytes, content_type: str) -> tuple[int, bytes]:
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self._conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+            response = self._conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+        if response.will_close:
+            self.close()
+        return response.status, data
+
+    def post_form(self, path: str, fields: dict) -> tuple[int, bytes]:
+        return self.post(path, urllib.parse.urlencode(fields).encode("ascii"), "application/x-www-form-urlencoded")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def make_film(size: int, seed: int) -> tuple[str, bytes]:
+    """(nama upload, PNG) X-ray sintetis; nama unik per seed → alias upload per film."""
+    ok, buf = cv2.imencode(".png", synthetic_chest_xray(size, seed))
+    if not ok:
+        raise RuntimeError("Gagal encode film sintetis.")
+    return f"loadtest_{size}_{seed}.png", buf.tobytes()
+
+
+def with_nonce(png: bytes, nonce: str) -> bytes:
+    """PNG yang sama + chunk tEXt berisi nonce sebelum IEND: piksel identik, content hash baru."""
+    text = b"loadtest\0" + nonce.encode("ascii")
+    chunk = struct.pack(">I", len(text)) + b"tEXt" + text + struct.pack(">I", zlib.crc32(b"tEXt" + text))
+    # IEND selalu 12 byte terakhir
+    return png[:-12] + chunk + png[-12:]
+
+
+def cache_hit(op: str, data: bytes) -> bool | None:
+    """True: output lama dipakai ulang; False: output dihitung; None: tidak berlaku (upload, histogram)."""
+    if op in ("upload", "histogram"):
+        return None
+    try:
+        report = json.loads(data).get("encoding")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(report, dict):
+        return None
+    # encode_ms hanya ada jika output baru saja di-encode
+    return "encode_ms" not in report
+
+
+def _static_path(out_url: str) -> str:
+    """out_url response ('/static/outputs/x.png' atau '/blobs/<id>') → image_path untuk /process/histogram."""
+    path = urllib.parse.urlparse(out_url).path.lstrip("/")
+    return path[len("static/"):] if path.startswith("static/") else path
+
+
+class LoadWorker:
+    """State satu client: film yang dipakai dan out_url terakhir (sumber histogram)."""
+
+    def __init__(
+        self, client: Client, films: list, rng: random.Random, fresh_uploads, size: int, cache_bust: bool = False
+    ):
+        self.client = client
+        self.films = films
+        self.rng = rng
+        self.fresh_uploads = fresh_uploads
+        self.size = size
+        self.cache_bust = cache_bust
+        self.last_output = None
+
+    def _bust_upload(self, data: bytes) -> str:
+        """Upload varian film dengan content hash baru (tidak diukur); return nama untuk request processing."""
+        nonce = uuid.uuid4().hex
+        name = f"loadtest_bust_{nonce}.png"
+        body, content_type = _multipart({}, {"image": (name, with_nonce(data, nonce))})
+        try:
+            self.client.post("/upload", body, content_type)
+        except (OSError, http.client.HTTPException):
+            # request processing berikutnya akan gagal (404) dan tercatat sebagai error
+            pass
+        return name
+
+    def prepare(self, op: str) -> tuple:
+        """Bangun request (path, body, content type) di luar pengukuran latency."""
+        path, variants = ENDPOINTS[op]
+        name, data = self.rng.choice(self.films)
+        if op == "upload":
+            if self.fresh_uploads is not None:
+                name, data = make_film(self.size, next(self.fresh_uploads))
+            body, content_type = _multipart({}, {"image": (name, data)})
+            return path, body, content_type
+        if op == "histogram":
+            if self.last_output is None:
+                return None
+            fields = {"image_path": self.last_output}
+        else:
+            if self.cache_bust:
+                name = self._bust_upload(data)
+            fields = {"filename": name, **self.rng.choice(variants)}
+        return path, urllib.parse.urlencode(fields).encode("ascii"), "application/x-www-form-urlencoded"
+
+    def remember(self, op: str, data: bytes) -> None:
+        if op in ("upload", "histogram"):
+            return
+        try:
+            out_url = json.loads(data).get("out_url")
+        except ValueError:
+            return
+        if out_url:
+            self.last_output = _static_path(out_url)
+
+
+def _counter(start: int):
+    lock = threading.Lock()
+    value = [start]
+
+    def take():
+        with lock:
+            value[0] += 1
+            return value[0]
+
+    return iter(take, None)
+
+
+def run_level(host, port, concurrency, duration, mix, films, args) -> tuple[list, float]:
+    """Closed loop `concurrency` client selama `duration` detik; return (records, detik)."""
+    ops = list(mix)
+    weights = [mix[op] for op in ops]
+    fresh = _counter(10_000 * (concurrency + 1)) if args.fresh_uploads else None
+    records = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def client_loop(index: int) -> None:
+        rng = random.Random(args.seed * 1000 + index)
+        client = Client(host, port, args.timeout)
+        worker = LoadWorker(client, films, rng, fresh, args.size, args.cache_bust)
+        local = []
+        try:
+            while time.perf_counter() < deadline:
+                op = rng.choices(ops, weights)[0]
+                request = worker.prepare(op)
+                if request is None:
+                    # histogram sebelum ada output → proses dulu
+                    op = "noise"
+                    request = worker.prepare(op)
+                path, body, content_type = request
+                sent = time.perf_counter()
+                try:
+                    status, data = client.post(path, body, content_type)
+                    error = None if status < 400 else f"HTTP {status}"
+                except (OSError, http.client.HTTPException) as exc:
+                    status, data, error = None, b"", type(exc).__name__
+                elapsed = time.perf_counter() - sent
+                hit = None
+                if error is None:
+                    worker.remember(op, data)
+                    hit = cache_hit(op, data)
+                local.append((op, sent - start, elapsed, status, error, hit))
+        finally:
+            client.close()
+            with lock:
+                records.extend(local)
+
+    threads = [threading.Thread(target=client_loop, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records, time.perf_counter() - start
+
+
+def summarize(records: list, elapsed: float) -> dict:
+    """Throughput, error rate dan percentile latency (total + per endpoint)."""
+
+    def block(items) -> dict:
+        errors: dict = {}
+        for _, _, _, _, error, _ in items:
+            if error is not None:
+                errors[error] = errors.get(error, 0) + 1
+        n_errors = sum(errors.values())
+        hits = [r[2] for r in items if r[5] is True]
+        misses = [r[2] for r in items if r[5] is False]
+        return {
+            "requests": len(items),
+            "throughput_rps": round(len(items) / elapsed, 2) if elapsed else 0.0,
+            "errors": errors,
+            "error_rate": round(n_errors / len(items), 4) if items else 0.0,
+            # latency hanya dari response sukses; error cepat (mis. 404) tidak menurunkan percentile
+            **_percentiles([r[2] for r in items if r[4] is None]),
+            # output dipakai ulang vs dihitung; upload/histogram tidak termasuk keduanya
+            "cache_hits": len(hits),
+            "cache_misses": len(misses),
+            "cache_hit_latency": _percentiles(hits),
+            "cache_miss_latency": _percentiles(misses),
+        }
+
+    per_endpoint = {}
+    for op in ENDPOINTS:
+        items = [r for r in records if r[0] == op]
+        if items:
+            per_endpoint[op] = block(items)
+    return {"elapsed_s": round(elapsed, 2), **block(records), "endpoints": per_endpoint}
+
+
+def warm_up(host, port, films, timeout) -> None:
+    """Upload semua film pool + satu processing per film (tidak ikut diukur)."""
+    client = Client(host, port, timeout)
+    try:
+        for name, data in films:
+            body, content_type = _multipart({}, {"image": (name, data)})
+            status, _ = client.post("/upload", body, content_type)
+            if status != 200:
+                raise RuntimeError(f"upload {name} → HTTP {status}")
+            status, _ = client.post_form("/process/noise-removal", {"filename": name, "method": "median"})
+            if status != 200:
+                raise RuntimeError(f"noise-removal {name} → HTTP {status}")
+    finally:
+        client.close()
+
+
+def _print_level(concurrency: int, summary: dict, server: dict) -> None:
+    print(
+        f"\nconcurrency {concurrency}: {summary['requests']} request dalam {summary['elapsed_s']} s, "
+        f"{summary['throughput_rps']} req/s, error {summary['error_rate']:.2%}"
+    )
+    print(
+        f"  {'endpoint':<14}{'req':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'error':>8}"
+        f"{'hit':>7}{'miss':>7}{'hit p50':>10}{'miss p50':>10}"
+    )
+    rows = [("total", summary)] + list(summary["endpoints"].items())
+
+    def ms(value) -> str:
+        return f"{value:10.1f}" if value is not None else f"{'-':>10}"
+
+    for name, stats in rows:
+        p = [ms(stats[k]) for k in ("p50_ms", "p95_ms", "p99_ms")]
+        print(
+            f"  {name:<14}{stats['requests']:>7}{stats['throughput_rps']:>9.1f}{''.join(p)}"
+            f"{stats['error_rate']:>8.1%}{stats['cache_hits']:>7}{stats['cache_misses']:>7}"
+            f"{ms(stats['cache_hit_latency']['p50_ms'])}{ms(stats['cache_miss_latency']['p50_ms'])}"
+        )
+    if server.get("available"):
+        print(
+            f"  server: CPU rata-rata {server['cpu_percent_mean']}% (maks {server['cpu_percent_max']}%), "
+            f"RSS {server['rss_bytes_start'] / 1e6:.0f} → maks {server['rss_bytes_max'] / 1e6:.0f} MB"
+        )
+    else:
+        print("  server: CPU/RSS tidak tersedia (butuh /proc dan pid server)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test endpoint Flask dengan request bersamaan.")
+    parser.add_argument("--url", help="server yang sudah berjalan (default: jalankan app lokal)")
+    parser.add_argument("--server", choices=("werkzeug", "gunicorn"), default="werkzeug", help="server lokal")
+    parser.add_argument("--server-pid", type=int, help="pid server untuk sampling CPU/RSS (bersama --url)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="jumlah client per level")
+    parser.add_argument("--duration", type=float, default=20.0, help="detik per level concurrency")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"bobot op (default {DEFAULT_MIX})")
+    parser.add_argument("--size", type=int, default=1024, help="sisi film sintetis (piksel)")
+    parser.add_argument("--images", type=int, default=8, help="jumlah film berbeda di pool")
+    parser.add_argument("--fresh-uploads", action="store_true", help="setiap upload film baru (bukan dedupe)")
+    parser.add_argument(
+        "--cache-bust",
+        action="store_true",
+        help="upload varian film baru (tidak diukur) sebelum setiap request processing → semua output cache miss",
+    )
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="interval sampling CPU/RSS (detik)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="timeout per request (detik)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="simpan laporan (termasuk time series) ke file JSON")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve("127.0.0.1", args.port, args.data_dir)
+        return 0
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if min(args.concurrency) < 1 or args.images < 1:
+        parser.error("--concurrency dan --images harus >= 1")
+
+    films = [make_film(args.size, args.seed * 1000 + i) for i in range(args.images)]
+
+    proc = None
+    log_file = None
+    data_dir = None
+    if args.url:
+        target = urllib.parse.urlparse(args.url)
+        host, port = target.hostname, target.port or 80
+        server_pid = args.server_pid
+    else:
+        host, port = "127.0.0.1", _free_port()
+        log_file = tempfile.NamedTemporaryFile("w+b", prefix="load_test_server_", suffix=".log", delete=False)
+        # upload, output dan instance server lokal → dihapus setelah server berhenti
+        data_dir = tempfile.TemporaryDirectory(prefix="load_test_data_")
+        proc = start_server(args.server, port, log_file, data_dir.name)
+        server_pid = proc.pid
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+            "platform": platform.platform(),
+            "server": args.url or args.server,
+            "mix": mix,
+            "size": args.size,
+            "images": args.images,
+            "fresh_uploads": args.fresh_uploads,
+            "cache_bust": args.cache_bust,
+            "duration_s": args.duration,
+        },
+        "levels": [],
+    }
+    try:
+        wait_ready(host, port, proc)
+        warm_up(host, port, films, args.timeout)
+        sampler = ProcessSampler(server_pid, args.sample_interval)
+        for concurrency in args.concurrency:
+            sampler.start()
+            records, elapsed = run_level(host, port, concurrency, args.duration, mix, films, args)
+            samples = sampler.stop()
+            summary = summarize(records, elapsed)
+            server = summarize_samples(samples)
+            _print_level(concurrency, summary, server)
+            report["levels"].append({
+                "concurrency": concurrency,
+                **summary,
+                "server": {**server, "samples": samples},
+            })
+    except RuntimeError as exc:
+        print(f"load test gagal: {exc}", file=sys.stderr)
+        if log_file is not None:
+            print(f"log server: {log_file.name}", file=sys.stderr)
+        return 1
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        if log_file is not None:
+            log_file.close()
+        if data_dir is not None:
+            data_dir.cleanup()
+
+    # server berhenti normal → log (akses log gunicorn dsb.) tidak diperlukan lagi
+    if log_file is not None:
+        os.remove(log_file.name)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
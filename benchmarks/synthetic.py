@@ -0,0 +1,45 @@
+"""Generator citra X-ray dada sintetis (deterministik) untuk benchmark & load test."""
+import cv2
+import numpy as np
+
+
+def synthetic_chest_xray(size: int = 1024, seed: int = 0) -> np.ndarray:
+    """
+    Citra grayscale uint8 (size x size) menyerupai foto thorax:
+    latar gelap, tubuh terang, dua lapang paru gelap, tulang belakang,
+    iga melengkung, noise kuantum dan sedikit blur.
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32) / size
+
+    img = np.full((size, size), 20.0, dtype=np.float32)
+
+    # Tubuh (elips besar terang)
+    body = ((xx - 0.5) / 0.42) ** 2 + ((yy - 0.55) / 0.55) ** 2 < 1.0
+    img[body] = 170.0
+
+    # Lapang paru kiri/kanan (lebih gelap)
+    for cx in (0.32, 0.68):
+        lung = ((xx - cx) / 0.14) ** 2 + ((yy - 0.48) / 0.30) ** 2 < 1.0
+        img[lung] = 70.0 + 25.0 * (yy[lung] - 0.18)
+
+    # Tulang belakang (pita vertikal terang)
+    spine = np.abs(xx - 0.5) < 0.035
+    img[spine & body] = 215.0
+
+    # Iga: lengkung sinus terang yang berulang
+    ribs = np.abs(np.sin((yy - 0.15 * np.abs(xx - 0.5) ** 0.5) * np.pi * 18.0)) > 0.93
+    img[ribs & body] += 35.0
+
+    img += rng.normal(0.0, 6.0, size=(size, size)).astype(np.float32)
+    img = np.clip(img, 0, 255).astype(np.uint8)
+
+    ksize = max(3, (size // 256) | 1)
+    return cv2.GaussianBlur(img, (ksize, ksize), 0)
+
+
+def synthetic_png_bytes(size: int = 1024, seed: int = 0) -> bytes:
+    ok, buf = cv2.imencode(".png", synthetic_chest_xray(size, seed))
+    if not ok:
+        raise ValueError("Gagal encode PNG sintetis")
+    return buf.tobytes()
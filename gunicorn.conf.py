@@ -0,0 +1,44 @@
+"""
+Konfigurasi gunicorn untuk mode production:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Knob utama (env):
+- XRAY_SERVING_PROFILE=small (default): banyak request kecil → worker = core, OpenCV 1 thread
+- XRAY_SERVING_PROFILE=large: sedikit film besar → worker = core/4, OpenCV core/worker thread
+- XRAY_CORES: budget core (default semua core; set ke limit CPU container)
+- XRAY_WORKERS / XRAY_CV2_THREADS / XRAY_HTTP_THREADS: override manual
+- XRAY_BIND: alamat listen (default 0.0.0.0:8000)
+
+Dengan lebih dari satu worker, output selalu ditulis ke static/outputs dan
+upload (termasuk file asli, persist_upload=0 diabaikan) ditulis sebelum
+response (state in-memory tidak dibagi antar proses).
+Status /jobs tetap per proses: pakai satu worker (XRAY_WORKERS=1, profil large)
+atau sticky routing jika /jobs dipakai.
+"""
+import os
+
+from services.runtime import serving_plan
+
+_plan = serving_plan()
+
+bind = os.environ.get("XRAY_BIND", "0.0.0.0:8000")
+workers = _plan["workers"]
+worker_class = "gthread"
+threads = _plan["http_threads"]
+# upload film besar + pipeline full resolution bisa lama
+timeout = int(os.environ.get("XRAY_TIMEOUT", "120"))
+# wsgi.py di-import di setiap worker (bukan di master) → env thread dan pre-warm berlaku per proses
+preload_app = False
+accesslog = "-"
+
+
+def on_starting(server):
+    server.log.info(
+        "serving plan: profile=%(profile)s cores=%(cores)s workers=%(workers)s "
+        "http_threads=%(http_threads)s cv2_threads=%(cv2_threads)s pool_workers=%(pool_workers)s",
+        _plan,
+    )
+
+
+def post_worker_init(worker):
+    worker.log.info("worker %s siap (pre-warm %.0f ms)", worker.pid, worker.wsgi.config.get("PREWARM_SECONDS", 0) * 1000)
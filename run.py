@@ -3,4 +3,5 @@ from app import create_app
 app = create_app()
 
 if __name__ == "__main__":
+    # dev server; production: gunicorn -c gunicorn.conf.py wsgi:app (lihat services/runtime.py)
     app.run(debug=True)
@@ -0,0 +1,142 @@
+"""
+Batch banyak gambar dalam satu request HTTP dengan hasil di-stream.
+
+Input dibaca satu per satu (multipart atau anggota zip), diproses di thread
+pool dengan jumlah in-flight terbatas, dan hasil dikembalikan begitu selesai
+(urutan selesai, bukan urutan input) — client bisa mulai memakai hasil
+sebelum seluruh batch rampung.
+"""
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def _allowed(name: str, allowed_extensions: set) -> bool:
+    return "." in name and name.rsplit(".", 1)[1].lower() in allowed_extensions
+
+
+def iter_batch_inputs(files, archive, allowed_extensions: set, max_bytes: int | None = None):
+    """
+    Yield (nama, bytes) untuk setiap gambar; isi baru dibaca saat item diminta.
+    - files: list FileStorage dari multipart
+    - archive: FileStorage berisi zip (opsional); folder dan metadata macOS dilewati
+    - max_bytes: gambar yang lebih besar tidak dibaca/diekstrak utuh, di-yield sebagai (nama, None)
+    """
+    for storage in files:
+        if storage and storage.filename and _allowed(storage.filename, allowed_extensions):
+            if max_bytes is None:
+                yield storage.filename, storage.read()
+                continue
+            data = storage.read(max_bytes + 1)
+            yield storage.filename, (data if len(data) <= max_bytes else None)
+
+    if archive is not None and archive.filename:
+        with zipfile.ZipFile(archive.stream) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                    continue
+                if not _allowed(info.filename, allowed_extensions):
+                    continue
+                if max_bytes is not None and info.file_size > max_bytes:
+                    # ukuran dari central directory; ZipExtFile tidak membaca melebihi file_size
+                    yield info.filename, None
+                    continue
+                yield info.filename, zf.read(info)
+
+
+def count_batch_inputs(files, archive, allowed_extensions: set) -> int:
+    """Jumlah gambar di request (zip: dari central directory, tanpa membaca isi)."""
+    total = sum(1 for f in files if f and f.filename and _allowed(f.filename, allowed_extensions))
+    if archive is not None and archive.filename:
+        try:
+            with zipfile.ZipFile(archive.stream) as zf:
+                total += sum(
+                    1
+                    for info in zf.infolist()
+                    if not info.is_dir()
+                    and not info.filename.startswith("__MACOSX/")
+                    and _allowed(info.filename, allowed_extensions)
+                )
+        except zipfile.BadZipFile as exc:
+            raise ValueError("arsip zip tidak valid") from exc
+        archive.stream.seek(0)
+    return total
+
+
+def imap_unordered(func, items, max_workers: int, max_in_flight: int | None = None):
+    """
+    Jalankan func(nama, data) untuk setiap (nama, data) di thread pool.
+    Yield (index, nama, hasil, error) sesuai urutan selesai. Input baru dibaca
+    hanya jika slot in-flight kosong, jadi memori tetap terbatas untuk batch besar.
+    """
+    max_workers = max(int(max_workers), 1)
+    max_in_flight = max(int(max_in_flight or max_workers * 2), 1)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {}
+        items = iter(enumerate(items))
+        exhausted = False
+
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    index, (name, data) = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                future = pool.submit(func, name, data)
+                pending[future] = (index, name)
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, name = pending.pop(future)
+                error = future.exception()
+                yield index, name, (None if error else future.result()), error
+
+
+class _ChunkSink:
+    """File-like (tanpa seek) yang menampung byte zip sampai diambil dengan take()."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """
+    Zip yang ditulis bertahap: add() langsung mengembalikan (nama anggota, byte siap kirim).
+    PNG sudah terkompresi, jadi anggota disimpan tanpa kompresi (ZIP_STORED).
+    """
+
+    def __init__(self):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=zipfile.ZIP_STORED)
+        self._names = set()
+
+    def add(self, name: str, data: bytes) -> tuple[str, bytes]:
+        base, ext = os.path.splitext(name)
+        unique, n = name, 1
+        while unique in self._names:
+            unique = f"{base}_{n}{ext}"
+            n += 1
+        self._names.add(unique)
+        self._zip.writestr(unique, data)
+        return unique, self._sink.take()
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._sink.take()
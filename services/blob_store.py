@@ -0,0 +1,96 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+
+class BlobStore:
+    """
+    Penyimpanan hasil encode (PNG, dst.) di memori proses dengan TTL.
+    Dipakai supaya output tidak perlu ditulis ke static/outputs lalu dibaca ulang.
+    - ttl_seconds: umur maksimum blob
+    - max_bytes: total ukuran maksimum; blob terlama dibuang lebih dulu
+    Array sumber (opsional) ikut disimpan agar histogram bisa dihitung tanpa decode.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_bytes: int = 128 * 1024 * 1024):
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_bytes = int(max_bytes)
+        self.current_bytes = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_size(entry: dict) -> int:
+        size = len(entry["data"])
+        if entry["image"] is not None:
+            size += int(entry["image"].nbytes)
+        return size
+
+    def _drop(self, blob_id: str) -> None:
+        entry = self._entries.pop(blob_id)
+        self.current_bytes -= self._entry_size(entry)
+
+    def _purge_expired(self, now: float) -> None:
+        # entri tersusun berdasarkan waktu masuk, cukup cek dari depan
+        while self._entries:
+            blob_id, entry = next(iter(self._entries.items()))
+            if entry["expires_at"] > now:
+                break
+            self._drop(blob_id)
+
+    def put(
+        self,
+        data: bytes,
+        mimetype: str,
+        filename: str = "",
+        image: np.ndarray | None = None,
+        blob_id: str | None = None,
+    ) -> str:
+        """
+        Simpan blob; return id-nya.
+        blob_id: id deterministik (mis. dari hash input + pipeline); default uuid acak.
+        """
+        blob_id = blob_id or uuid.uuid4().hex
+        entry = {
+            "data": data,
+            "mimetype": mimetype,
+            "filename": filename,
+            "image": image,
+            "expires_at": time.monotonic() + self.ttl_seconds,
+        }
+        size = self._entry_size(entry)
+
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            if blob_id in self._entries:
+                self._drop(blob_id)
+            self._entries[blob_id] = entry
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+        return blob_id
+
+    def get(self, blob_id: str) -> dict | None:
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return self._entries.get(blob_id)
+
+    def remove_input(self, content_hash: str) -> int:
+        """Buang semua blob turunan satu upload (id berisi token <hash16>, lihat output_name)."""
+        token = content_hash[:16]
+        with self._lock:
+            doomed = [blob_id for blob_id in self._entries if token in blob_id.split("_")]
+            for blob_id in doomed:
+                self._drop(blob_id)
+        return len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,105 @@
+"""
+Profil encoding untuk output stage.
+
+- png       : PNG default OpenCV (filter SUB, Z_BEST_SPEED)
+- png-fast  : PNG Huffman-only — lossless, lebih cepat dan biasanya lebih kecil untuk film X-ray
+- webp      : WebP lossless (paling kecil, tapi encode jauh lebih lambat)
+- jpeg      : JPEG kualitas tinggi untuk preview (lossy)
+- npy       : array mentah .npy untuk client mesin (tanpa kompresi)
+Profil dipilih per request (field encoding) atau lewat header Accept.
+"""
+import io
+import os
+import time
+
+import cv2
+import numpy as np
+
+from services.mask_codec import encode_mask_png
+from services.metrics import timed
+
+ENCODING_PROFILES = {
+    "png": {"ext": "png", "mimetype": "image/png", "params": []},
+    # tanpa IMWRITE_PNG_COMPRESSION OpenCV tetap memakai filter SUB + level tercepat;
+    # Huffman-only melewati pencarian match LZ77
+    "png-fast": {
+        "ext": "png",
+        "mimetype": "image/png",
+        "params": [cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_HUFFMAN_ONLY],
+    },
+    # kualitas > 100 → mode lossless
+    "webp": {"ext": "webp", "mimetype": "image/webp", "params": [cv2.IMWRITE_WEBP_QUALITY, 101]},
+    "jpeg": {"ext": "jpg", "mimetype": "image/jpeg", "params": [cv2.IMWRITE_JPEG_QUALITY, 92]},
+    "npy": {"ext": "npy", "mimetype": "application/x-npy", "params": None},
+}
+
+# mimetype di header Accept → profil (image/png → profil default dari config)
+_ACCEPT_PROFILES = {
+    "image/webp": "webp",
+    "image/jpeg": "jpeg",
+    "application/x-npy": "npy",
+}
+
+
+def negotiate_encoding(requested: str | None, accept, default: str = "png") -> str:
+    """
+    Profil untuk request ini: field encoding (jika ada) menang, lalu header Accept yang
+    eksplisit, lalu default. accept: werkzeug MIMEAccept (request.accept_mimetypes). ValueError jika profil tidak dikenal.
+    """
+    requested = (requested or "").lower().strip()
+    if requested:
+        if requested not in ENCODING_PROFILES:
+            raise ValueError(f"encoding harus salah satu dari {', '.join(ENCODING_PROFILES)}")
+        return requested
+
+    if accept:
+        # Accept hanya dipakai jika client eksplisit meminta tipe output: kualitasnya harus
+        # mengalahkan semua entri lain (*/*, text/html, ...). Header navigasi browser
+        # ("text/html,...,image/webp,*/*;q=0.8") dan "*/*" fetch/XHR tetap dapat default.
+        candidates = ["image/png", *_ACCEPT_PROFILES]
+        others = max((q for value, q in accept if value.lower() not in candidates), default=0)
+        best, best_q = None, others
+        for mimetype in candidates:
+            q = max((q for value, q in accept if value.lower() == mimetype), default=0)
+            if q > best_q:
+                best, best_q = mimetype, q
+        if best in _ACCEPT_PROFILES:
+            return _ACCEPT_PROFILES[best]
+    return default
+
+
+def output_file_name(out_name: str, encoding: str) -> str:
+    """Nama output dengan ekstensi profil (png dan png-fast berbagi file .png: pikselnya sama)."""
+    return f"{os.path.splitext(out_name)[0]}.{ENCODING_PROFILES[encoding]['ext']}"
+
+
+def encode_output(img: np.ndarray, encoding: str = "png", bilevel: bool = False) -> tuple[bytes, float]:
+    """
+    Encode img dengan profil tertentu; return (bytes, detik encode).
+    bilevel=True (mask 0/255) pada profil PNG → PNG 1 bit.
+    """
+    profile = ENCODING_PROFILES[encoding]
+    start = time.perf_counter()
+    with timed("encode", img.nbytes):
+        if profile["params"] is None:
+            buf = io.BytesIO()
+            np.save(buf, np.ascontiguousarray(img))
+            data = buf.getvalue()
+        elif bilevel and profile["ext"] == "png":
+            data = encode_mask_png(img)
+        else:
+            ok, encoded = cv2.imencode(f".{profile['ext']}", img, profile["params"])
+            if not ok:
+                raise ValueError(f"Gagal encode {encoding}")
+            data = encoded.tobytes()
+    return data, time.perf_counter() - start
+
+
+def encoding_report(encoding: str, data: bytes, seconds: float) -> dict:
+    """Ringkasan encoder untuk response JSON."""
+    return {
+        "profile": encoding,
+        "mimetype": ENCODING_PROFILES[encoding]["mimetype"],
+        "bytes": len(data),
+        "encode_ms": round(seconds * 1000.0, 2),
+    }
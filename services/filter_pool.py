@@ -0,0 +1,49 @@
+"""
+Pool objek CLAHE yang dipakai ulang antar panggilan.
+
+cv2.CLAHE menyimpan buffer internal saat apply(), jadi satu instance tidak
+boleh dipakai dua thread sekaligus → setiap thread punya LRU sendiri dengan
+key (clip_limit, tile grid) dan ukuran maksimum max_per_thread.
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+
+
+class ClahePool:
+    def __init__(self, max_per_thread: int = 16):
+        self.max_per_thread = max(int(max_per_thread), 1)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def get(self, clip_limit: float, tile_grid_size: tuple[int, int]):
+        """Instance CLAHE milik thread ini untuk (clip_limit, (grid_x, grid_y))."""
+        entries = getattr(self._local, "entries", None)
+        if entries is None:
+            entries = self._local.entries = OrderedDict()
+
+        key = (float(clip_limit), (int(tile_grid_size[0]), int(tile_grid_size[1])))
+        clahe = entries.get(key)
+        if clahe is not None:
+            entries.move_to_end(key)
+            with self._lock:
+                self.hits += 1
+            return clahe
+
+        clahe = cv2.createCLAHE(clipLimit=key[0], tileGridSize=key[1])
+        entries[key] = clahe
+        if len(entries) > self.max_per_thread:
+            entries.popitem(last=False)
+        with self._lock:
+            self.misses += 1
+        return clahe
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "max_per_thread": self.max_per_thread}
+
+
+clahe_pool = ClahePool()
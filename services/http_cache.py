@@ -0,0 +1,46 @@
+"""
+ETag deterministik untuk hasil processing.
+
+ETag = hash dari (content hash input, hash pipeline, opsi output, versi kode).
+Input dan parameter yang sama dengan kode yang sama pasti menghasilkan byte
+yang sama, jadi client yang mengirim If-None-Match dengan ETag itu bisa
+langsung dijawab 304 tanpa menjalankan pipeline.
+"""
+import glob
+import hashlib
+import os
+
+_SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+_code_version: str | None = None
+
+
+def code_version(override: str | None = None) -> str:
+    """
+    Versi kode processing: override (mis. git sha saat deploy, config CODE_VERSION)
+    atau hash isi semua modul services/*.py — berubah otomatis setiap kode berubah.
+    """
+    global _code_version
+    if override:
+        return str(override)
+    if _code_version is None:
+        h = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(_SERVICES_DIR, "*.py"))):
+            h.update(os.path.basename(path).encode("utf-8"))
+            with open(path, "rb") as f:
+                h.update(f.read())
+        _code_version = h.hexdigest()[:16]
+    return _code_version
+
+
+def make_etag(*parts, version: str | None = None) -> str:
+    """ETag (tanpa tanda kutip) dari bagian-bagian yang menentukan isi response."""
+    h = hashlib.sha256()
+    for part in (code_version(version), *parts):
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """If-None-Match (werkzeug ETags) cocok? Perbandingan weak: proxy yang meng-gzip boleh melemahkan ETag."""
+    return bool(if_none_match) and if_none_match.contains_weak(etag)
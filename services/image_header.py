@@ -0,0 +1,50 @@
+"""
+Baca dimensi PNG/JPEG dari header saja (tanpa decode), untuk menolak upload
+yang terlalu besar sebelum cv2.imdecode mengalokasikan buffer penuh.
+"""
+import struct
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# marker SOF (start of frame) JPEG; C4 (DHT), C8 (JPG) dan CC (DAC) bukan SOF
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _png_dimensions(data: bytes) -> tuple[int, int] | None:
+    # signature (8) + panjang chunk (4) + "IHDR" (4) + width (4) + height (4)
+    if len(data) < 24 or data[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", data[16:24])
+    return width, height
+
+
+def _jpeg_dimensions(data: bytes) -> tuple[int, int] | None:
+    pos = 2
+    size = len(data)
+    while pos + 4 <= size:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # padding antar marker
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        (length,) = struct.unpack(">H", data[pos + 2:pos + 4])
+        if marker in _JPEG_SOF:
+            if pos + 9 > size:
+                return None
+            height, width = struct.unpack(">HH", data[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def image_dimensions(data: bytes) -> tuple[int, int] | None:
+    """(width, height) dari header PNG/JPEG, atau None jika format tidak dikenali/rusak."""
+    if data.startswith(_PNG_SIGNATURE):
+        return _png_dimensions(data)
+    if data.startswith(b"\xff\xd8"):
+        return _jpeg_dimensions(data)
+    return None
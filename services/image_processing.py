@@ -1,7 +1,16 @@
+import hashlib
+import json
+
 import cv2
 import numpy as np
 
+from services.filter_pool import clahe_pool
+from services.mask_codec import PackedMask
+from services.metrics import instrument
+from services.stage_cache import StageCache, normalize_params
+
 
+@instrument("decode")
 def read_image(image_abs_path: str) -> np.ndarray:
     img = cv2.imread(image_abs_path)
     if img is None:
@@ -9,13 +18,156 @@ def read_image(image_abs_path: str) -> np.ndarray:
     return img
 
 
+# faktor reduce → flag decode langsung grayscale (dengan downscale di decoder)
+_GRAY_DECODE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+@instrument("decode")
+def read_image_gray(image_abs_path: str, reduce: int = 1) -> np.ndarray:
+    """
+    Decode langsung ke grayscale (tanpa buffer BGR 3 channel).
+    reduce: 1, 2, 4 atau 8 — decoder ikut memperkecil resolusi (JPEG jauh lebih cepat).
+    Catatan: untuk PNG berwarna hasilnya bisa beda ±1 dibanding read_image → to_grayscale.
+    """
+    if reduce not in _GRAY_DECODE_FLAGS:
+        raise ValueError("reduce harus 1, 2, 4 atau 8")
+    img = cv2.imread(image_abs_path, _GRAY_DECODE_FLAGS[reduce])
+    if img is None:
+        raise ValueError(f"Gambar tidak bisa dibaca: {image_abs_path}")
+    return img
+
+
+@instrument("decode")
+def decode_image(data: bytes, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    """Decode bytes gambar (PNG/JPEG) dari memori, tanpa file sementara."""
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if img is None:
+        raise ValueError("Gambar tidak bisa dibaca")
+    return img
+
+
+@instrument("encode")
+def encode_png(img: np.ndarray) -> bytes:
+    """Encode image ke PNG di memori (tanpa menulis file)."""
+    ok, buf = cv2.imencode(".png", img)
+    if not ok:
+        raise ValueError("Gagal encode PNG")
+    return buf.tobytes()
+
+
+@instrument("grayscale")
 def to_grayscale(bgr_img: np.ndarray) -> np.ndarray:
     return cv2.cvtColor(bgr_img, cv2.COLOR_BGR2GRAY)
 
 
-def normalize_gray_uint8(gray: np.ndarray) -> np.ndarray:
+def _stretch_lut(gmin: float, gmax: float, levels: int) -> np.ndarray:
+    """LUT min-max stretch ke 0-255 (rumus sama persis dengan versi float32)."""
+    values = np.arange(levels, dtype=np.float32)
+    norm = (values - gmin) / (gmax - gmin) * 255.0
+    return np.clip(norm, 0, 255).astype(np.uint8)
+
+
+def _stretch_luts(gmin: np.ndarray, gmax: np.ndarray, levels: int) -> np.ndarray:
+    """_stretch_lut untuk banyak citra sekaligus → array (N, levels), hasil identik per baris."""
+    values = np.arange(levels, dtype=np.float32)
+    span = (np.asarray(gmax, dtype=np.float64) - gmin).astype(np.float32)
+    span[span == 0] = 1.0
+    norm = (values[None, :] - np.asarray(gmin, dtype=np.float32)[:, None]) / span[:, None] * np.float32(255.0)
+    return np.clip(norm, 0, 255).astype(np.uint8)
+
+
+def _normalize_stack(stack: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    normalize_gray_uint8 untuk stack (N, H, W); setiap citra di-stretch dengan min/max-nya sendiri.
+    Min/max dan LUT semua citra dihitung dalam satu operasi vektor. Gather LUT tetap lewat
+    cv2.LUT / np.take per citra: gather fancy-index (N, levels) di NumPy terukur 3-5x lebih lambat.
+    Jika semua citra butuh LUT yang sama, cukup satu cv2.LUT atas view (N*H, W).
+    """
+    if stack.dtype not in (np.uint8, np.uint16):
+        stack_f = stack.astype(np.float32)
+        gmin = stack_f.min(axis=(1, 2))
+        gmax = stack_f.max(axis=(1, 2))
+        span64 = gmax.astype(np.float64) - gmin
+        flat = span64 < 1e-6
+        span = np.where(flat, 1.0, span64).astype(np.float32)
+        norm = (stack_f - gmin[:, None, None]) / span[:, None, None] * np.float32(255.0)
+        result = np.clip(norm, 0, 255).astype(np.uint8)
+        if flat.any():
+            result[flat] = np.clip(stack_f[flat], 0, 255).astype(np.uint8)
+        return result
+
+    rows = stack.reshape(len(stack), -1)
+    gmin = rows.min(axis=1).astype(np.float64)
+    gmax = rows.max(axis=1).astype(np.float64)
+    flat = gmax - gmin < 1e-6
+    if stack.dtype == np.uint8:
+        keep = flat | ((gmin == 0) & (gmax == 255))
+        if keep.all():
+            # sama dengan jalur 2D: tidak ada yang perlu ditulis, tanpa copy
+            return stack
+        luts = _stretch_luts(gmin, gmax, 256)
+    else:
+        keep = np.zeros(len(stack), dtype=bool)
+        luts = _stretch_luts(gmin, gmax, 65536)
+
+    if out is None:
+        out = np.empty(stack.shape, dtype=np.uint8)
+    if (
+        stack.dtype == np.uint8
+        and not (keep | flat).any()
+        and (gmin == gmin[0]).all()
+        and (gmax == gmax[0]).all()
+        and stack.flags.c_contiguous
+        and out.flags.c_contiguous
+    ):
+        cv2.LUT(stack.reshape(-1, stack.shape[2]), luts[0], dst=out.reshape(-1, stack.shape[2]))
+        return out
+    for i, img in enumerate(stack):
+        if keep[i]:
+            out[i] = img
+        elif flat[i]:
+            np.clip(img, 0, 255, out=out[i], casting="unsafe")
+        elif stack.dtype == np.uint8:
+            cv2.LUT(img, luts[i], dst=out[i])
+        else:
+            np.take(luts[i], img, out=out[i])
+    return out
+
+
+@instrument("normalize")
+def normalize_gray_uint8(gray: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Min-max stretch grayscale ke uint8 0-255.
+    - uint8 yang sudah 0..255 (atau flat) dikembalikan apa adanya, tanpa copy
+    - uint8 lainnya di-stretch lewat cv2.LUT (tanpa array float32)
+    - uint16 lewat LUT 65536 entri; tipe lain pakai jalur float32
+    - out: buffer uint8 opsional untuk hasil (hanya dipakai jika perlu menulis)
+    - stack (N, H, W) citra berukuran sama: setiap citra dinormalisasi sendiri, hasil stack uint8 baru
+    """
+    if gray.ndim == 3:
+        return _normalize_stack(gray, out)
     if gray.ndim != 2:
-        raise ValueError("Input harus citra grayscale (2D array).")
+        raise ValueError("Input harus citra grayscale (2D array) atau stack (N, H, W).")
+
+    if gray.dtype == np.uint8:
+        gmin, gmax, _, _ = cv2.minMaxLoc(gray)
+        if (gmin == 0 and gmax == 255) or gmax - gmin < 1e-6:
+            return gray
+        return cv2.LUT(gray, _stretch_lut(gmin, gmax, 256), dst=out)
+
+    if gray.dtype == np.uint16:
+        gmin, gmax, _, _ = cv2.minMaxLoc(gray)
+        if gmax - gmin < 1e-6:
+            return np.clip(gray, 0, 255).astype(np.uint8)
+        lut = _stretch_lut(gmin, gmax, 65536)
+        if out is None:
+            return lut[gray]
+        return np.take(lut, gray, out=out)
 
     gray_f = gray.astype(np.float32)
     gmin = float(gray_f.min())
@@ -28,6 +180,33 @@ def normalize_gray_uint8(gray: np.ndarray) -> np.ndarray:
     return np.clip(norm, 0, 255).astype(np.uint8)
 
 
+def load_gray(image_abs_path: str, direct: bool = False) -> np.ndarray:
+    """
+    Read → grayscale → normalize (uint8 0-255).
+    - path .npy (working copy hasil ingestion) → np.load memory-mapped, tanpa decode
+    - direct=True: decode langsung grayscale (lihat read_image_gray), hemat satu copy BGR.
+    """
+    if image_abs_path.lower().endswith(".npy"):
+        return normalize_gray_uint8(np.load(image_abs_path, mmap_mode="r"))
+    if direct:
+        return normalize_gray_uint8(read_image_gray(image_abs_path))
+    bgr = read_image(image_abs_path)
+    gray = to_grayscale(bgr)
+    return normalize_gray_uint8(gray)
+
+
+def decode_gray(data: bytes) -> np.ndarray:
+    """
+    Sama dengan load_gray, tetapi dari bytes di memori (hasil identik dengan jalur file).
+    IMREAD_ANYCOLOR: sumber grayscale langsung jadi 1 channel (tanpa buffer BGR);
+    sumber berwarna tetap lewat BGR → gray seperti read_image.
+    """
+    img = decode_image(data, cv2.IMREAD_ANYCOLOR)
+    if img.ndim == 3:
+        img = to_grayscale(img)
+    return normalize_gray_uint8(img)
+
+
 def _make_odd(n: int) -> int:
     n = int(n)
     if n < 3:
@@ -37,43 +216,174 @@ def _make_odd(n: int) -> int:
     return n
 
 
+@instrument("gaussian")
 def apply_gaussian(gray_u8: np.ndarray, ksize: int, sigma: float) -> np.ndarray:
     ksize = _make_odd(ksize)
     sigma = float(sigma)
     return cv2.GaussianBlur(gray_u8, (ksize, ksize), sigmaX=sigma)
 
 
+@instrument("median")
 def apply_median(gray_u8: np.ndarray, ksize: int) -> np.ndarray:
     ksize = _make_odd(ksize)
     return cv2.medianBlur(gray_u8, ksize)
 
 
+@instrument("histogram_equalization")
 def apply_histogram_equalization(gray_u8: np.ndarray) -> np.ndarray:
-    """Contrast enhancement via global histogram equalization."""
-    return cv2.equalizeHist(gray_u8)
+    """
+    Contrast enhancement via global histogram equalization.
+    Stack (N, H, W): equalizeHist per citra langsung ke satu stack hasil
+    (histogram + LUT di OpenCV lebih cepat daripada membangun LUT di NumPy).
+    """
+    if gray_u8.ndim != 3:
+        return cv2.equalizeHist(gray_u8)
 
+    out = np.empty(gray_u8.shape, dtype=np.uint8)
+    for i, img in enumerate(gray_u8):
+        cv2.equalizeHist(img, dst=out[i])
+    return out
 
+
+@instrument("clahe")
 def apply_clahe(gray_u8: np.ndarray, clip_limit: float, tile_grid_size: int) -> np.ndarray:
     """Contrast enhancement via CLAHE (adaptive)."""
-    clip_limit = float(clip_limit)
     grid = _make_odd(tile_grid_size)
-    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(grid, grid))
-    return clahe.apply(gray_u8)
+    # instance dipakai ulang per thread untuk (clip_limit, grid) yang sama
+    return clahe_pool.get(clip_limit, (grid, grid)).apply(gray_u8)
 
 
+@instrument("otsu")
 def apply_otsu(gray_u8: np.ndarray) -> np.ndarray:
-    """Segmentation via Otsu thresholding; returns binary mask (0/255)."""
+    """
+    Segmentation via Otsu thresholding; returns binary mask (0/255).
+    Stack (N, H, W): threshold Otsu per citra, ditulis ke satu stack mask.
+    """
+    if gray_u8.ndim == 3:
+        out = np.empty(gray_u8.shape, dtype=np.uint8)
+        for i, img in enumerate(gray_u8):
+            cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=out[i])
+        return out
     _, mask = cv2.threshold(gray_u8, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     return mask
 
 
-def render_histogram_image(gray_u8: np.ndarray, width: int = 256, height: int = 160) -> np.ndarray:
+@instrument("adaptive")
+def apply_adaptive_threshold(gray_u8: np.ndarray, block_size: int, c: float) -> np.ndarray:
+    """
+    Segmentation via threshold lokal (mean blok block_size × block_size dikurangi c).
+    Mean pakai box filter (integral image) → biaya tidak tergantung block_size.
+    """
+    block_size = _make_odd(block_size)
+    return cv2.adaptiveThreshold(
+        gray_u8, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block_size, float(c)
+    )
+
+
+MULTI_OTSU_MAX_CLASSES = 5
+
+
+def multi_otsu_thresholds(gray_u8: np.ndarray, classes: int) -> list[int]:
+    """
+    Threshold multi-Otsu (classes - 1 buah) dari histogram 256 bin.
+    Memaksimalkan between-class variance = maksimalkan Σ S_k² / W_k per kelas;
+    dicari dengan DP atas matriks 257×257 (tanpa loop per kombinasi threshold).
+    Piksel v masuk kelas k jika thresholds[k-1] <= v < thresholds[k].
+    """
+    counts = cv2.calcHist([gray_u8], [0], None, [256], [0, 256]).ravel().astype(np.float64)
+    w = np.concatenate(([0.0], np.cumsum(counts)))
+    s = np.concatenate(([0.0], np.cumsum(counts * np.arange(256))))
+
+    # score[a, b] = kontribusi kelas dengan intensitas [a, b)
+    dw = w[None, :] - w[:, None]
+    ds = s[None, :] - s[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = np.where(dw > 0, ds * ds / dw, 0.0)
+    score[np.tril_indices(257)] = -np.inf
+
+    # best[b] = skor terbaik untuk membagi [0, b) ke j kelas
+    best = score[0].copy()
+    choices = []
+    for _ in range(classes - 1):
+        total = best[:, None] + score
+        choices.append(np.argmax(total, axis=0))
+        best = total[choices[-1], np.arange(257)]
+
+    thresholds = []
+    end = 256
+    for choice in reversed(choices):
+        end = int(choice[end])
+        thresholds.append(end)
+    return sorted(thresholds)
+
+
+@instrument("multi_otsu")
+def apply_multi_otsu(gray_u8: np.ndarray, classes: int) -> np.ndarray:
+    """
+    Segmentation multi-Otsu: label kelas disebar rata di 0..255
+    (3 kelas → 0/127/255), diterapkan lewat satu cv2.LUT.
+    Untuk masking (threshold > 127) hanya kelas di atas level tengah yang dipakai.
+    """
+    classes = int(classes)
+    thresholds = multi_otsu_thresholds(gray_u8, classes)
+    levels = (np.arange(classes) * 255 // (classes - 1)).astype(np.uint8)
+    lut = levels[np.searchsorted(thresholds, np.arange(256), side="right")]
+    return cv2.LUT(gray_u8, lut)
+
+
+@instrument("lung")
+def apply_lung_segmentation(gray_u8: np.ndarray, close_ksize: int) -> np.ndarray:
+    """
+    Lung field: Otsu terbalik (paru gelap) → buang komponen yang menyentuh tepi
+    (udara di luar badan) → ambil dua komponen terbesar → closing morfologis.
+    Seleksi komponen pakai statistik connectedComponentsWithStats + satu lookup label.
+    """
+    _, dark = cv2.threshold(gray_u8, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(dark, connectivity=8)
+
+    height, width = gray_u8.shape[:2]
+    left, top = stats[1:, cv2.CC_STAT_LEFT], stats[1:, cv2.CC_STAT_TOP]
+    right = left + stats[1:, cv2.CC_STAT_WIDTH]
+    bottom = top + stats[1:, cv2.CC_STAT_HEIGHT]
+    areas = stats[1:, cv2.CC_STAT_AREA].astype(np.int64)
+
+    inner = (left > 0) & (top > 0) & (right < width) & (bottom < height)
+    if inner.any():
+        # komponen yang menyentuh tepi tidak ikut dipilih
+        areas = np.where(inner, areas, 0)
+
+    keep = np.zeros(n, dtype=np.uint8)
+    if n > 1:
+        largest = np.argsort(areas)[::-1][:2]
+        keep[largest[areas[largest] > 0] + 1] = 255
+    mask = keep[labels]
+
+    close_ksize = _make_odd(close_ksize)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (close_ksize, close_ksize))
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+
+
+@instrument("histogram_counts")
+def histogram_counts(gray_u8: np.ndarray) -> np.ndarray:
+    """Jumlah piksel per intensitas (256 bin, int64)."""
+    return cv2.calcHist([gray_u8], [0], None, [256], [0, 256]).flatten().astype(np.int64)
+
+
+@instrument("histogram_render")
+def render_histogram_image(
+    gray_u8: np.ndarray,
+    width: int = 256,
+    height: int = 160,
+    counts: np.ndarray | None = None,
+) -> np.ndarray:
     """
     Render grayscale histogram as an image (uint8 BGR).
     - gray_u8: input grayscale (0-255)
     - width/height: output canvas size
+    - counts: histogram yang sudah dihitung (optional, lewati calcHist)
     """
-    hist = cv2.calcHist([gray_u8], [0], None, [256], [0, 256]).flatten()
+    counts = histogram_counts(gray_u8) if counts is None else np.asarray(counts)
+    hist = counts.astype(np.float32)
     hist_max = hist.max() if hist.max() > 0 else 1.0
     hist = hist / hist_max
 
@@ -88,18 +398,24 @@ def render_histogram_image(gray_u8: np.ndarray, width: int = 256, height: int =
     bar_w = max(bin_w, 3)  # pastikan bar terlihat, terutama untuk citra biner
     base_y = margin_top + plot_h
 
-    for i in range(256):
-        h = int(hist[i] * plot_h)
-        # Pastikan bar terlihat minimal 1px saat ada nilai
-        if hist[i] > 0 and h < 1:
-            h = 2
-        cv2.rectangle(
-            canvas,
-            (margin_left + i * bin_w, base_y - h),
-            (margin_left + i * bin_w + bar_w - 1, base_y),
-            (230, 200, 180),
-            thickness=-1,
-        )
+    heights = (hist.astype(np.float64) * plot_h).astype(np.int32)
+    # Pastikan bar terlihat minimal 1px saat ada nilai
+    heights[(hist > 0) & (heights < 1)] = 2
+
+    # Tinggi bar per kolom canvas (bar yang bertumpuk → ambil yang tertinggi);
+    # -1 berarti kolom tidak tertutup bar sama sekali
+    starts = margin_left + np.arange(256) * bin_w
+    col_h = np.full(width, -1, dtype=np.int32)
+    for offset in range(bar_w):
+        cols = starts + offset
+        valid = cols < width
+        np.maximum.at(col_h, cols[valid], heights[valid])
+
+    rows = np.arange(height)[:, None]
+    bars = (col_h[None, :] >= 0) & (rows >= base_y - col_h[None, :]) & (rows <= base_y)
+    # Warnai piksel bar (230, 200, 180) lewat cv2.add bermask: jauh lebih cepat
+    # daripada boolean indexing NumPy pada array 3 channel
+    cv2.add(canvas, (230 - 25, 200 - 25, 180 - 25, 0), dst=canvas, mask=bars.view(np.uint8))
 
     # Axis
     cv2.line(canvas, (margin_left, margin_top), (margin_left, base_y), (90, 70, 60), 1)
@@ -137,6 +453,7 @@ def noise_removal(
     gaussian_ksize: int = 5,
     gaussian_sigma: float = 1.0,
     median_ksize: int = 5,
+    pre_gray: np.ndarray | None = None,
 ) -> np.ndarray:
     """
     FUNGSI UTAMA NOISE REMOVAL
@@ -145,9 +462,10 @@ def noise_removal(
     """
 
     # 1) Read → grayscale → normalize
-    bgr = read_image(image_abs_path)
-    gray = to_grayscale(bgr)
-    gray_u8 = normalize_gray_uint8(gray)
+    if pre_gray is None:
+        gray_u8 = load_gray(image_abs_path)
+    else:
+        gray_u8 = normalize_gray_uint8(pre_gray)
 
     # 2) Pilih metode
     method = (method or "").lower().strip()
@@ -174,9 +492,7 @@ def contrast_enhancement(
     output: image grayscale uint8 hasil enhancement
     """
     if pre_gray is None:
-        bgr = read_image(image_abs_path)
-        gray = to_grayscale(bgr)
-        gray_u8 = normalize_gray_uint8(gray)
+        gray_u8 = load_gray(image_abs_path)
     else:
         gray_u8 = normalize_gray_uint8(pre_gray)
 
@@ -195,16 +511,18 @@ def image_segmentation(
     image_abs_path: str,
     method: str,
     pre_gray: np.ndarray | None = None,
+    adaptive_block_size: int = 51,
+    adaptive_c: float = 5.0,
+    multi_otsu_classes: int = 3,
+    lung_close_ksize: int = 15,
 ) -> np.ndarray:
     """
     FUNGSI UTAMA SEGMENTASI
-    method: 'otsu'
-    output: binary mask uint8 (0 atau 255)
+    method: 'otsu' | 'adaptive' | 'multi_otsu' | 'lung'
+    output: mask uint8 (0 atau 255; multi_otsu: label kelas 0..255)
     """
     if pre_gray is None:
-        bgr = read_image(image_abs_path)
-        gray = to_grayscale(bgr)
-        gray_u8 = normalize_gray_uint8(gray)
+        gray_u8 = load_gray(image_abs_path)
     else:
         gray_u8 = normalize_gray_uint8(pre_gray)
 
@@ -213,33 +531,295 @@ def image_segmentation(
     if method == "otsu":
         return apply_otsu(gray_u8)
 
-    raise ValueError('method harus "otsu"')
+    if method == "adaptive":
+        return apply_adaptive_threshold(gray_u8, adaptive_block_size, adaptive_c)
+
+    if method == "multi_otsu":
+        if not 2 <= int(multi_otsu_classes) <= MULTI_OTSU_MAX_CLASSES:
+            raise ValueError(f"multi_otsu_classes harus 2..{MULTI_OTSU_MAX_CLASSES}")
+        return apply_multi_otsu(gray_u8, multi_otsu_classes)
+
+    if method == "lung":
+        return apply_lung_segmentation(gray_u8, lung_close_ksize)
 
+    raise ValueError('method harus "otsu", "adaptive", "multi_otsu" atau "lung"')
 
+
+@instrument("masking")
 def apply_image_masking(
     image_abs_path: str,
-    mask: np.ndarray,
+    mask: np.ndarray | PackedMask,
     pre_gray: np.ndarray | None = None,
+    out: np.ndarray | None = None,
 ) -> np.ndarray:
     """
     FUNGSI UTAMA IMAGE MASKING
     Menerapkan mask ke gambar asli atau gambar yang sudah di-enhance.
     - image_abs_path: path ke gambar asli
-    - mask: binary mask (0 atau 255) dari hasil segmentation
-    - pre_gray: gambar grayscale yang sudah di-process (optional)
+    - mask: binary mask (0 atau 255) dari hasil segmentation, atau PackedMask
+      (sudah biner → langsung di-unpack ke 0/255 tanpa threshold ulang)
+    - pre_gray: gambar grayscale yang sudah di-process (optional); boleh stack (N, H, W)
+      dengan mask stack berukuran sama
+    - out: buffer uint8 opsional (shape sama dengan image) untuk hasil
     output: gambar grayscale uint8 hasil masking
     """
     if pre_gray is None:
-        bgr = read_image(image_abs_path)
-        gray = to_grayscale(bgr)
-        gray_u8 = normalize_gray_uint8(gray)
+        gray_u8 = load_gray(image_abs_path)
     else:
         gray_u8 = normalize_gray_uint8(pre_gray)
 
-    # Normalize mask ke 0-1 untuk operasi masking
-    mask_normalized = (mask > 127).astype(np.float32)
-    
-    # Terapkan mask: kalikan gambar dengan mask
-    masked = (gray_u8.astype(np.float32) * mask_normalized).astype(np.uint8)
-    
-    return masked
\ No newline at end of file
+    if mask.shape != gray_u8.shape:
+        raise ValueError("Ukuran mask harus sama dengan gambar.")
+
+    packed = isinstance(mask, PackedMask)
+    if packed:
+        mask = mask.unpack()
+
+    shape = gray_u8.shape
+    if gray_u8.ndim == 3:
+        # stack: operasi per piksel, jadi cukup satu panggilan OpenCV atas view 2D (N*H, W)
+        n, height, width = shape
+        gray_u8 = np.ascontiguousarray(gray_u8).reshape(n * height, width)
+        mask = np.ascontiguousarray(mask).reshape(n * height, width)
+        if out is not None:
+            out = out.reshape(n * height, width)
+
+    # Mask → 0/255 (piksel > 127 dianggap foreground), lalu AND bitwise:
+    # gray & 255 = gray, gray & 0 = 0 — hasil sama dengan perkalian 0/1 tanpa float32
+    if packed:
+        mask_u8 = mask
+    else:
+        _, mask_u8 = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+
+    return cv2.bitwise_and(gray_u8, mask_u8, dst=out).reshape(shape)
+
+
+# ---------------------------------------------------------------------------
+# PIPELINE DEKLARATIF
+# ---------------------------------------------------------------------------
+
+def _stage_gaussian(gray_u8: np.ndarray, ksize: int, sigma: float) -> np.ndarray:
+    return apply_gaussian(gray_u8, ksize, sigma)
+
+
+def _stage_median(gray_u8: np.ndarray, ksize: int) -> np.ndarray:
+    return apply_median(gray_u8, ksize)
+
+
+def _stage_histogram(gray_u8: np.ndarray) -> np.ndarray:
+    return apply_histogram_equalization(gray_u8)
+
+
+def _stage_clahe(gray_u8: np.ndarray, clip_limit: float, tile_grid_size: int) -> np.ndarray:
+    return apply_clahe(gray_u8, clip_limit, tile_grid_size)
+
+
+def _stage_otsu(gray_u8: np.ndarray) -> np.ndarray:
+    return apply_otsu(gray_u8)
+
+
+def _stage_adaptive(gray_u8: np.ndarray, block_size: int, c: float) -> np.ndarray:
+    return apply_adaptive_threshold(gray_u8, block_size, c)
+
+
+def _stage_multi_otsu(gray_u8: np.ndarray, classes: int) -> np.ndarray:
+    return apply_multi_otsu(gray_u8, classes)
+
+
+def _stage_lung(gray_u8: np.ndarray, close_ksize: int) -> np.ndarray:
+    return apply_lung_segmentation(gray_u8, close_ksize)
+
+
+def _stage_masking(gray_u8: np.ndarray, mask: np.ndarray | PackedMask) -> np.ndarray:
+    return apply_image_masking(image_abs_path="", mask=mask, pre_gray=gray_u8)
+
+
+# nama stage -> (fungsi, parameter default)
+PIPELINE_STAGES = {
+    "gaussian": (_stage_gaussian, {"ksize": 5, "sigma": 1.0}),
+    "median": (_stage_median, {"ksize": 5}),
+    "histogram": (_stage_histogram, {}),
+    "clahe": (_stage_clahe, {"clip_limit": 2.0, "tile_grid_size": 8}),
+    "otsu": (_stage_otsu, {}),
+    "adaptive": (_stage_adaptive, {"block_size": 51, "c": 5.0}),
+    "multi_otsu": (_stage_multi_otsu, {"classes": 3}),
+    "lung": (_stage_lung, {"close_ksize": 15}),
+    # masking: segmentasi image saat ini lalu terapkan mask ke image yang sama;
+    # segmentation_scale mengalikan parameter spasial segmentation (preview di level pyramid)
+    "masking": (_stage_masking, {"segmentation_method": "otsu", "segmentation_scale": 1.0}),
+}
+
+# parameter yang bersatuan piksel per stage (diskalakan untuk citra yang diperkecil)
+SPATIAL_PARAMS = {
+    "gaussian": ("ksize", "sigma"),
+    "median": ("ksize",),
+    "adaptive": ("block_size",),
+    "lung": ("close_ksize",),
+}
+
+
+def scale_spatial_params(name: str, params: dict, scale: float) -> dict:
+    """Kalikan parameter spasial stage dengan scale (ukuran kernel/blok tetap ganjil)."""
+    params = dict(params)
+    if scale == 1.0:
+        return params
+    for key in SPATIAL_PARAMS.get(name, ()):
+        if isinstance(params[key], int):
+            params[key] = _make_odd(round(params[key] * scale))
+        else:
+            params[key] = float(params[key]) * scale
+    return params
+
+
+def masking_segmentation(params: dict) -> tuple[str, dict]:
+    """(nama, parameter) segmentation untuk stage masking: default metode, diskalakan segmentation_scale."""
+    seg_name = params["segmentation_method"]
+    _, seg_defaults = PIPELINE_STAGES[seg_name]
+    return seg_name, scale_spatial_params(seg_name, seg_defaults, params["segmentation_scale"])
+
+SEGMENTATION_STAGES = ("otsu", "adaptive", "multi_otsu", "lung")
+# output hanya 0/255 → bisa dikirim sebagai PNG 1 bit / RLE (multi_otsu berisi label kelas)
+BINARY_MASK_STAGES = ("otsu", "adaptive", "lung")
+
+
+def apply_stage(gray_u8: np.ndarray, name: str, params: dict) -> np.ndarray:
+    """Jalankan satu stage (yang sudah dinormalisasi) tanpa cache."""
+    if name == "masking":
+        # segmentation untuk mask dijalankan dengan parameter default-nya
+        seg_name, seg_params = masking_segmentation(params)
+        return _stage_masking(gray_u8, PIPELINE_STAGES[seg_name][0](gray_u8, **seg_params))
+    func, _ = PIPELINE_STAGES[name]
+    return func(gray_u8, **params)
+
+
+def normalize_stage(name: str, params: dict | None = None) -> tuple[str, dict]:
+    """
+    Validasi satu spesifikasi stage dan lengkapi parameternya dengan default.
+    Nilai parameter dikonversi ke tipe default-nya (mis. "5" → 5).
+    """
+    name = (name or "").lower().strip()
+    if name not in PIPELINE_STAGES:
+        raise ValueError(f'stage tidak dikenal: "{name}"')
+
+    _, defaults = PIPELINE_STAGES[name]
+    params = dict(params or {})
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise ValueError(f'parameter tidak dikenal untuk stage "{name}": {sorted(unknown)}')
+
+    merged = dict(defaults)
+    for key, value in params.items():
+        merged[key] = type(defaults[key])(value)
+
+    if name == "masking":
+        merged["segmentation_method"] = merged["segmentation_method"].lower().strip()
+        if merged["segmentation_method"] not in SEGMENTATION_STAGES:
+            raise ValueError(f'segmentation_method harus salah satu dari {SEGMENTATION_STAGES}')
+        if not merged["segmentation_scale"] > 0:
+            raise ValueError("segmentation_scale harus > 0")
+
+    if name == "multi_otsu" and not 2 <= merged["classes"] <= MULTI_OTSU_MAX_CLASSES:
+        raise ValueError(f"classes harus 2..{MULTI_OTSU_MAX_CLASSES}")
+
+    return name, merged
+
+
+def split_stage_spec(spec) -> tuple[str, dict]:
+    """
+    Satu spesifikasi stage mentah → (nama, params) tanpa validasi nilai. Bentuk:
+      - "otsu"
+      - ("median", {"ksize": 5}) / ["median", {"ksize": 5}]
+      - {"name": "median", "params": {"ksize": 5}}
+    ValueError / TypeError jika bentuknya tidak dikenal.
+    """
+    if isinstance(spec, str):
+        name, params = spec, None
+    elif isinstance(spec, dict):
+        name, params = spec.get("name", ""), spec.get("params")
+    elif isinstance(spec, (list, tuple)) and 1 <= len(spec) <= 2:
+        name, params = spec[0], spec[1] if len(spec) > 1 else None
+    else:
+        raise ValueError(f"spesifikasi stage tidak valid: {spec!r}")
+    if not isinstance(name, str) or not isinstance(params, (dict, type(None))):
+        raise TypeError(f"spesifikasi stage tidak valid: {spec!r}")
+    return name, dict(params or {})
+
+
+def parse_stage_specs(stages) -> list[tuple[str, dict]]:
+    """Validasi list stage (bentuk lihat split_stage_spec) → [(nama, params lengkap)]."""
+    return [normalize_stage(*split_stage_spec(spec)) for spec in stages]
+
+
+def pipeline_hash(stages) -> str:
+    """Hash stabil dari spesifikasi pipeline (setelah dinormalisasi)."""
+    specs = parse_stage_specs(stages)
+    payload = json.dumps(specs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def run_pipeline(
+    image_abs_path: str,
+    stages,
+    pre_gray: np.ndarray | None = None,
+    cache: StageCache | None = None,
+    content_hash: str | None = None,
+    on_stage=None,
+    tile_min_pixels: int | None = None,
+    tile_size: int = 1024,
+) -> list[np.ndarray]:
+    """
+    FUNGSI UTAMA PIPELINE
+    Decode image sekali lalu jalankan semua stage secara berurutan di memori.
+    - stages: list spesifikasi stage (lihat parse_stage_specs)
+    - cache/content_hash: opsional, hasil setiap stage disimpan/diambil dari StageCache
+    - on_stage: opsional, dipanggil on_stage(jumlah stage selesai, nama stage)
+    - tile_min_pixels: citra dengan piksel >= nilai ini menjalankan gaussian/median/clahe
+      per tile (services.tiling) — buffer kerja filter sebesar tile, hasil tetap array penuh
+    output: list hasil setiap stage (urutan sama dengan stages)
+    """
+    specs = parse_stage_specs(stages)
+    use_cache = cache is not None and content_hash is not None
+    if tile_min_pixels is not None:
+        # import lokal: services.tiling mengimpor modul ini
+        from services.tiling import TILED_FILTERS, run_tiled
+
+    def run_cached(name: str, params: dict, upstream: tuple, compute) -> np.ndarray:
+        if not use_cache:
+            return compute()
+        key = cache.make_key(content_hash, name, {**params, "upstream": upstream})
+        return cache.get_or_compute(key, compute)
+
+    if pre_gray is None:
+        current = run_cached("gray", {}, (), lambda: load_gray(image_abs_path))
+    else:
+        current = normalize_gray_uint8(pre_gray)
+
+    results = []
+    upstream = ()
+    for name, params in specs:
+        src = current
+        if name == "masking":
+            seg_name, seg_params = masking_segmentation(params)
+            seg_func = PIPELINE_STAGES[seg_name][0]
+            # mask untuk masking disimpan di cache dalam bentuk bit-packed (1/8 memori)
+            mask = run_cached(
+                f"{seg_name}:packed",
+                seg_params,
+                upstream,
+                lambda: PackedMask.from_mask(seg_func(src, **seg_params)),
+            )
+            current = run_cached(name, params, upstream, lambda: _stage_masking(src, mask))
+        elif tile_min_pixels is not None and name in TILED_FILTERS and src.size >= tile_min_pixels:
+            current = run_cached(
+                name, params, upstream, lambda: run_tiled(src, name, params, tile_size=tile_size)
+            )
+        else:
+            func, _ = PIPELINE_STAGES[name]
+            current = run_cached(name, params, upstream, lambda: func(src, **params))
+
+        upstream = upstream + ((name, normalize_params(params)),)
+        results.append(current)
+        if on_stage is not None:
+            on_stage(len(results), name)
+
+    return results
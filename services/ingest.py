@@ -0,0 +1,88 @@
+"""
+Ingestion upload: decode sekali, simpan working copy grayscale uint8
+ternormalisasi sebagai .npy (bisa di-memory-map) + metadata JSON.
+
+Nama file working copy = content hash upload, sehingga request berikutnya
+cukup np.load(mmap_mode="r") tanpa decode / grayscale / normalize ulang.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+def working_copy_paths(work_folder: str, content_hash: str) -> tuple[str, str]:
+    """Path (.npy, .json) untuk content hash tertentu."""
+    return (
+        os.path.join(work_folder, f"{content_hash}.npy"),
+        os.path.join(work_folder, f"{content_hash}.json"),
+    )
+
+
+def find_working_copy(work_folder: str, content_hash: str) -> str | None:
+    npy_path, _ = working_copy_paths(work_folder, content_hash)
+    return npy_path if os.path.exists(npy_path) else None
+
+
+def read_metadata(work_folder: str, content_hash: str) -> dict | None:
+    _, meta_path = working_copy_paths(work_folder, content_hash)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write(path: str, write) -> None:
+    # unik per proses + thread: upload yang sama bisa di-ingest bersamaan
+    tmp_path = f"{path}.tmp{os.getpid()}_{threading.get_ident()}"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _write_working_copy(
+    work_folder: str,
+    content_hash: str,
+    gray: np.ndarray,
+    source_name: str,
+    source_bytes: int,
+) -> dict:
+    npy_path, meta_path = working_copy_paths(work_folder, content_hash)
+    os.makedirs(work_folder, exist_ok=True)
+    gray = np.ascontiguousarray(gray, dtype=np.uint8)
+    # ditulis ke file sementara lalu di-rename supaya pembaca tidak melihat file setengah jadi
+    _atomic_write(npy_path, lambda f: np.save(f, gray))
+
+    metadata = {
+        "content_hash": content_hash,
+        "source_name": source_name,
+        "source_bytes": int(source_bytes),
+        "format": os.path.splitext(source_name)[1].lstrip(".").lower(),
+        "height": int(gray.shape[0]),
+        "width": int(gray.shape[1]),
+        "dtype": "uint8",
+        "working_copy": os.path.basename(npy_path),
+        "ingested_at": time.time(),
+    }
+    _atomic_write(meta_path, lambda f: f.write(json.dumps(metadata, indent=2).encode("utf-8")))
+    return metadata
+
+
+def ingest_gray(
+    gray: np.ndarray,
+    work_folder: str,
+    content_hash: str,
+    source_name: str,
+    source_bytes: int,
+) -> dict:
+    """
+    Simpan working copy dari gray yang sudah di-decode di memori (upload tanpa file di disk).
+    Working copy yang sudah ada tidak ditulis ulang. Return metadata.
+    """
+    npy_path, _ = working_copy_paths(work_folder, content_hash)
+    if os.path.exists(npy_path):
+        return read_metadata(work_folder, content_hash) or {"content_hash": content_hash}
+    return _write_working_copy(work_folder, content_hash, gray, source_name, source_bytes)
@@ -0,0 +1,101 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    """Antrian job penuh (backpressure → HTTP 429)."""
+
+
+class JobQueue:
+    """
+    Antrian job lokal (in-process) dengan worker pool terbatas.
+    - workers: jumlah thread compute (terpisah dari thread HTTP)
+    - max_pending: batas job queued + running; lebih dari itu submit() → QueueFull
+    - max_history: jumlah job selesai yang status-nya masih disimpan
+    Fungsi job dipanggil sebagai func(progress) dengan progress(completed, stage_name).
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, max_history: int = 256):
+        self.max_pending = int(max_pending)
+        self.max_history = int(max_history)
+        self._executor = ThreadPoolExecutor(max_workers=int(workers), thread_name_prefix="job")
+        self._jobs: OrderedDict = OrderedDict()
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, func, total_stages: int = 0, on_done=None) -> str:
+        """
+        Masukkan job ke antrian; return job id.
+        on_done(result) dipanggil di thread worker dan return dict hasil untuk status job.
+        """
+        with self._lock:
+            if self._active >= self.max_pending:
+                raise QueueFull()
+            self._active += 1
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "state": "queued",
+                "progress": {"completed": 0, "total": int(total_stages), "stage": None},
+                "result": None,
+                "error": None,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self._trim_history()
+
+        self._executor.submit(self._run, job_id, func, on_done)
+        return job_id
+
+    def _trim_history(self) -> None:
+        # buang job selesai paling lama jika riwayat melebihi batas
+        if len(self._jobs) <= self.max_history:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_history:
+                break
+            if self._jobs[job_id]["state"] in ("done", "failed"):
+                del self._jobs[job_id]
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _run(self, job_id: str, func, on_done) -> None:
+        self._update(job_id, state="running", started_at=time.time())
+
+        def progress(completed: int, stage_name: str) -> None:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job["progress"] = {**job["progress"], "completed": completed, "stage": stage_name}
+
+        try:
+            result = func(progress)
+            if on_done is not None:
+                result = on_done(result)
+            self._update(job_id, state="done", result=result)
+        except Exception as exc:  # error job dilaporkan lewat status, bukan crash worker
+            self._update(job_id, state="failed", error=str(exc))
+        finally:
+            self._update(job_id, finished_at=time.time())
+            with self._lock:
+                self._active -= 1
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {**job, "progress": dict(job["progress"])}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active": self._active, "max_pending": self.max_pending, "tracked": len(self._jobs)}
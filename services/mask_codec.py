@@ -0,0 +1,165 @@
+"""
+Representasi ringkas untuk mask biner hasil segmentation.
+
+- Di memori: PackedMask (np.packbits, 1 bit per piksel → 8× lebih kecil dari 0/255 uint8)
+- Di wire: RLE gaya COCO (column-major, counts diawali run piksel 0) atau PNG 1 bit
+Piksel foreground = nilai > 127, sama dengan aturan apply_image_masking.
+"""
+import cv2
+import numpy as np
+
+MASK_THRESHOLD = 127
+
+# jumlah bit 1 untuk setiap nilai byte (popcount lewat lookup)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+class PackedMask:
+    """Mask biner bit-packed (urutan C) + shape aslinya; boleh 2D atau stack (N, H, W)."""
+
+    __slots__ = ("bits", "shape")
+
+    def __init__(self, bits: np.ndarray, shape: tuple):
+        self.bits = bits
+        self.shape = tuple(int(s) for s in shape)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray, threshold: int = MASK_THRESHOLD) -> "PackedMask":
+        mask = np.asarray(mask)
+        return cls(np.packbits(mask > threshold), mask.shape)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.bits.nbytes)
+
+    def setflags(self, write: bool) -> None:
+        # dipanggil StageCache.put (hasil di cache dibuat read-only)
+        self.bits.setflags(write=write)
+
+    @property
+    def area(self) -> int:
+        """Jumlah piksel foreground."""
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    def unpack(self) -> np.ndarray:
+        """Mask uint8 0/255 dengan shape asli."""
+        mask = np.unpackbits(self.bits, count=int(np.prod(self.shape))).reshape(self.shape)
+        mask *= 255
+        return mask
+
+
+def _foreground(mask) -> np.ndarray:
+    if isinstance(mask, PackedMask):
+        mask = mask.unpack()
+    mask = np.asarray(mask)
+    if mask.ndim != 2:
+        raise ValueError("Mask harus 2D (H, W).")
+    return mask > MASK_THRESHOLD
+
+
+def rle_counts(mask) -> np.ndarray:
+    """Panjang run bergantian 0/1 dalam urutan column-major (run pertama = piksel 0, boleh 0)."""
+    flat = np.ravel(_foreground(mask), order="F")
+    if flat.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], changes, [flat.size])))
+    if flat[0]:
+        counts = np.concatenate(([0], counts))
+    return counts.astype(np.int64)
+
+
+def _counts_to_string(counts) -> str:
+    # format string terkompresi pycocotools (rleToString): selisih dengan run i-2, 5 bit per karakter
+    out = bytearray()
+    for i, x in enumerate(counts):
+        x = int(x)
+        if i > 2:
+            x -= int(counts[i - 2])
+        more = True
+        while more:
+            c = x & 0x1F
+            x >>= 5
+            more = (x != -1) if (c & 0x10) else (x != 0)
+            if more:
+                c |= 0x20
+            out.append(c + 48)
+    return out.decode("ascii")
+
+
+def _counts_from_string(text: str) -> list[int]:
+    counts = []
+    pos = 0
+    while pos < len(text):
+        x, k, more = 0, 0, True
+        while more:
+            c = ord(text[pos]) - 48
+            x |= (c & 0x1F) << (5 * k)
+            more = bool(c & 0x20)
+            pos += 1
+            k += 1
+            if not more and (c & 0x10):
+                x |= -1 << (5 * k)
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
+
+
+def _rle_from_counts(shape: tuple, counts: np.ndarray, compressed: bool) -> dict:
+    return {
+        "size": [int(shape[0]), int(shape[1])],
+        "counts": _counts_to_string(counts) if compressed else [int(c) for c in counts],
+    }
+
+
+def encode_rle(mask, compressed: bool = True) -> dict:
+    """RLE gaya COCO: {"size": [h, w], "counts": str (terkompresi) atau list[int]}."""
+    return _rle_from_counts(mask.shape, rle_counts(mask), compressed)
+
+
+def decode_rle(rle: dict) -> np.ndarray:
+    """Kebalikan encode_rle → mask uint8 0/255 (H, W)."""
+    height, width = (int(s) for s in rle["size"])
+    counts = rle["counts"]
+    if isinstance(counts, str):
+        counts = _counts_from_string(counts)
+    counts = np.asarray(counts, dtype=np.int64)
+    if counts.sum() != height * width:
+        raise ValueError("RLE tidak cocok dengan ukuran mask.")
+    values = (np.arange(counts.size) % 2).astype(np.uint8) * 255
+    return np.repeat(values, counts).reshape(width, height).T.copy()
+
+
+def mask_bbox(mask) -> list[int]:
+    """Bounding box foreground [x, y, w, h] (format COCO); [0, 0, 0, 0] jika mask kosong."""
+    fg = _foreground(mask)
+    rows = np.flatnonzero(fg.any(axis=1))
+    if rows.size == 0:
+        return [0, 0, 0, 0]
+    cols = np.flatnonzero(fg.any(axis=0))
+    return [int(cols[0]), int(rows[0]), int(cols[-1] - cols[0] + 1), int(rows[-1] - rows[0] + 1)]
+
+
+def encode_mask_png(mask) -> bytes:
+    """PNG 1 bit per piksel (bilevel); decode kembali menjadi 0/255."""
+    if isinstance(mask, PackedMask):
+        mask = mask.unpack()
+    else:
+        # bilevel OpenCV menganggap semua nilai != 0 foreground → samakan dulu dengan aturan > 127
+        _, mask = cv2.threshold(np.asarray(mask), MASK_THRESHOLD, 255, cv2.THRESH_BINARY)
+    ok, buf = cv2.imencode(".png", mask, [cv2.IMWRITE_PNG_BILEVEL, 1])
+    if not ok:
+        raise ValueError("Gagal encode mask PNG.")
+    return buf.tobytes()
+
+
+def describe_mask(mask, compressed: bool = True) -> dict:
+    """RLE + bounding box + area (jumlah piksel foreground) dalam satu dict siap JSON."""
+    counts = rle_counts(mask)
+    return {
+        "rle": _rle_from_counts(mask.shape, counts, compressed),
+        "bbox": mask_bbox(mask),
+        # run ganjil = run foreground
+        "area": int(counts[1::2].sum()),
+    }
@@ -0,0 +1,186 @@
+"""
+Instrumentasi ringan: latency per stage (histogram), byte yang diproses,
+dan export format teks Prometheus. Overhead per panggilan hanya dua
+perf_counter() + satu lock, aman dibiarkan aktif di production.
+
+Timing juga dikumpulkan per request (contextvar) untuk header Server-Timing.
+"""
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# batas bucket histogram (detik)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# list (stage, detik) milik request yang sedang berjalan; None = tidak dikumpulkan
+_request_timings: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)  # bucket terakhir = +Inf
+        self.total = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms: dict = {}
+        self._counters: dict = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, label: str, seconds: float) -> None:
+        idx = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            hist = self._histograms.get((name, label))
+            if hist is None:
+                hist = self._histograms[(name, label)] = _Histogram(len(self.buckets))
+            hist.counts[idx] += 1
+            hist.total += seconds
+            hist.count += 1
+
+    def inc(self, name: str, label: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[(name, label)] = self._counters.get((name, label), 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Isi registry dengan key "nama{label}" (sama seperti di /metrics):
+        histograms → count, total detik, rata-rata ms; counters → nilai.
+        """
+        with self._lock:
+            return {
+                "histograms": {
+                    f"{name}{{{label}}}": {
+                        "count": h.count,
+                        "total_s": h.total,
+                        "mean_ms": (h.total / h.count * 1000.0) if h.count else 0.0,
+                    }
+                    for (name, label), h in self._histograms.items()
+                },
+                "counters": {f"{name}{{{label}}}": value for (name, label), value in self._counters.items()},
+            }
+
+    def render_prometheus(self, gauges: dict | None = None, counters: dict | None = None) -> str:
+        """
+        Format teks Prometheus (version 0.0.4).
+        gauges/counters: {nama_metric: nilai} tambahan dari luar registry (mis. statistik cache).
+        """
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            own_counters = sorted(self._counters.items())
+
+        seen = set()
+        for (name, label), hist in histograms:
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), hist.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{label}}} {hist.total!r}")
+            lines.append(f"{name}_count{{{label}}} {hist.count}")
+
+        for (name, label), value in own_counters:
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{{{label}}} {value}")
+
+        for name, value in sorted((counters or {}).items()):
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def record_stage(stage: str, seconds: float, nbytes: int = 0) -> None:
+    label = f'stage="{stage}"'
+    registry.observe("xray_stage_duration_seconds", label, seconds)
+    if nbytes:
+        registry.inc("xray_stage_bytes_total", label, nbytes)
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str, nbytes: int = 0):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start, nbytes)
+
+
+def instrument(stage: str):
+    """
+    Decorator: catat durasi fungsi sebagai stage.
+    Byte yang diproses = nbytes argumen ndarray pertama (atau hasil jika tidak ada).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            nbytes = 0
+            for arg in args:
+                if isinstance(arg, np.ndarray):
+                    nbytes = arg.nbytes
+                    break
+            else:
+                if isinstance(result, np.ndarray):
+                    nbytes = result.nbytes
+            record_stage(stage, elapsed, nbytes)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def start_request_timings() -> contextvars.Token:
+    return _request_timings.set([])
+
+
+def finish_request_timings(token: contextvars.Token) -> list:
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    return timings
+
+
+def server_timing_header(timings: list, total_seconds: float | None = None) -> str:
+    """Gabungkan timing per stage (dijumlah per nama) jadi nilai header Server-Timing."""
+    totals: dict = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    parts = [f"{stage};dur={seconds * 1000.0:.2f}" for stage, seconds in totals.items()]
+    if total_seconds is not None:
+        parts.append(f"total;dur={total_seconds * 1000.0:.2f}")
+    return ", ".join(parts)
@@ -0,0 +1,58 @@
+"""
+Preview cepat dari image pyramid.
+
+Pyramid (cv2.pyrDown berulang) dibuat sekali per upload dan disimpan di
+StageCache. Pipeline preview dijalankan di level yang cukup kecil, dengan
+ukuran kernel spasial diskalakan mengikuti level agar tampilannya sebanding
+dengan hasil full resolution.
+"""
+import cv2
+import numpy as np
+
+from services.image_processing import scale_spatial_params
+from services.stage_cache import StageCache
+
+
+def pyramid_level(
+    gray_u8: np.ndarray,
+    level: int,
+    cache: StageCache | None = None,
+    content_hash: str | None = None,
+) -> np.ndarray:
+    """Level ke-n pyramid (0 = full resolution); level antara ikut di-cache."""
+    if level <= 0:
+        return gray_u8
+
+    def build() -> np.ndarray:
+        parent = pyramid_level(gray_u8, level - 1, cache, content_hash)
+        return cv2.pyrDown(parent)
+
+    if cache is None or content_hash is None:
+        return build()
+    return cache.get_or_compute(cache.make_key(content_hash, "pyramid", {"level": level}), build)
+
+
+def choose_level(shape: tuple[int, int], max_side: int) -> int:
+    """Level terkecil yang sisi terpanjangnya masih ≥ max_side (minimal level 0)."""
+    longest = max(shape)
+    level = 0
+    while (longest + 1) // 2 >= max_side and longest > 1:
+        longest = (longest + 1) // 2
+        level += 1
+    return level
+
+
+def scale_stages(specs: list[tuple[str, dict]], level: int) -> list[tuple[str, dict]]:
+    """
+    Skala ukuran kernel/blok dan sigma untuk level pyramid (faktor 2**level).
+    Masking: segmentation di dalamnya ikut diskalakan lewat segmentation_scale.
+    """
+    scale = 1.0 / (2 ** level)
+    scaled = []
+    for name, params in specs:
+        if name == "masking":
+            params = {**params, "segmentation_scale": params["segmentation_scale"] * scale}
+        else:
+            params = scale_spatial_params(name, params, scale)
+        scaled.append((name, params))
+    return scaled
@@ -0,0 +1,132 @@
+"""
+Model worker/thread untuk mode production (gunicorn, lihat gunicorn.conf.py dan wsgi.py).
+
+Masalah: setiap proses worker WSGI membawa thread pool OpenCV sendiri
+(GaussianBlur, medianBlur, CLAHE ...) seukuran jumlah core, jadi
+workers × thread OpenCV jauh melebihi core yang ada. Di sini budget core
+dibagi ke proses dan thread sesuai profil:
+
+- "small" (default): banyak request kecil/sedang → banyak proses, OpenCV 1 thread.
+  Paralelisme datang dari request yang berjalan bersamaan.
+- "large": sedikit film besar per waktu → sedikit proses, OpenCV multi-thread
+  per proses supaya satu request besar selesai lebih cepat.
+
+Modul ini hanya memakai stdlib di level atas: configure_thread_env() harus
+dipanggil sebelum numpy/cv2 di-import agar batas thread BLAS/OpenMP berlaku.
+"""
+import os
+
+# env yang dibaca library thread native saat numpy / OpenCV di-import
+_THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+SERVING_PROFILES = ("small", "large")
+
+
+def _env_int(name: str, default: int | None = None) -> int | None:
+    raw = os.environ.get(name, "")
+    if not raw.strip():
+        return default
+    value = int(raw)
+    if value < 1:
+        raise ValueError(f"{name} harus >= 1")
+    return value
+
+
+def serving_plan(
+    cores: int | None = None,
+    profile: str | None = None,
+    workers: int | None = None,
+    cv2_threads: int | None = None,
+) -> dict:
+    """
+    Bagi budget core ke proses worker dan thread. Nilai None diambil dari env:
+      XRAY_CORES (default os.cpu_count()), XRAY_SERVING_PROFILE (small|large),
+      XRAY_WORKERS, XRAY_CV2_THREADS, XRAY_HTTP_THREADS.
+    Return dict: profile, cores, workers, http_threads, cv2_threads, pool_workers.
+    """
+    cores = cores or _env_int("XRAY_CORES") or os.cpu_count() or 1
+    profile = (profile or os.environ.get("XRAY_SERVING_PROFILE", "") or "small").lower().strip()
+    if profile not in SERVING_PROFILES:
+        raise ValueError(f"XRAY_SERVING_PROFILE harus salah satu dari {', '.join(SERVING_PROFILES)}")
+
+    workers = workers or _env_int("XRAY_WORKERS")
+    cv2_threads = cv2_threads or _env_int("XRAY_CV2_THREADS")
+
+    if profile == "small":
+        workers = workers or cores
+        cv2_threads = cv2_threads or 1
+        # thread HTTP menutupi waktu I/O (upload, tulis disk); komputasi tetap dibatasi core
+        http_threads = _env_int("XRAY_HTTP_THREADS", 2)
+    else:
+        # satu proses per ~4 core, sisanya untuk thread OpenCV di dalam request
+        workers = workers or max(1, cores // 4)
+        cv2_threads = cv2_threads or max(1, cores // workers)
+        http_threads = _env_int("XRAY_HTTP_THREADS", 1)
+
+    return {
+        "profile": profile,
+        "cores": cores,
+        "workers": workers,
+        "http_threads": http_threads,
+        "cv2_threads": cv2_threads,
+        # thread pool di dalam proses (sweep, /batch): sisa budget setelah thread OpenCV
+        "pool_workers": max(1, cores // (workers * cv2_threads)),
+    }
+
+
+def configure_thread_env(threads: int) -> None:
+    """Batasi thread BLAS/OpenMP; harus sebelum numpy di-import (nilai env yang sudah ada dihormati)."""
+    for name in _THREAD_ENV_VARS:
+        os.environ.setdefault(name, str(threads))
+
+
+def apply_plan(app, plan: dict) -> None:
+    """Terapkan plan di proses worker: thread OpenCV + ukuran thread pool internal app."""
+    import cv2
+
+    cv2.setNumThreads(plan["cv2_threads"])
+    app.config["SWEEP_WORKERS"] = plan["pool_workers"]
+    app.config["BATCH_WORKERS"] = plan["pool_workers"]
+    if plan["workers"] > 1:
+        # BlobStore dan writer upload ada per proses, padahal request berikutnya
+        # (GET /blobs/..., /process/...) bisa dilayani proses lain → pakai disk bersama.
+        # Termasuk file asli: persist_upload=0 hanya menyimpannya di BlobStore proses ini.
+        app.config["PERSIST_OUTPUTS"] = True
+        app.config["UPLOAD_ASYNC_WRITES"] = False
+        app.config["UPLOAD_PERSIST_ORIGINAL"] = True
+        app.config["UPLOAD_FORCE_PERSIST"] = True
+    app.config["SERVING_PLAN"] = dict(plan)
+
+
+def prewarm(app) -> float:
+    """
+    Jalankan semua stage + encoder sekali pada citra sintetis kecil supaya
+    inisialisasi malas OpenCV (thread pool, kernel, codec) dan kompilasi
+    template tidak dibayar request pertama. Return detik yang dipakai.
+    """
+    import time
+
+    import numpy as np
+
+    from services.encoding import ENCODING_PROFILES, encode_output
+    from services.image_processing import PIPELINE_STAGES, run_pipeline
+    from services.metrics import registry
+
+    start = time.perf_counter()
+    yy, xx = np.mgrid[0:256, 0:256]
+    img = ((np.sin(xx / 17.0) + np.cos(yy / 23.0) + 2.0) * 60.0).astype(np.uint8)
+
+    for name in PIPELINE_STAGES:
+        out = run_pipeline("", [name], pre_gray=img)[-1]
+    for profile in ENCODING_PROFILES:
+        encode_output(out, profile)
+    app.jinja_env.get_template("index.html")
+    # latency pre-warm tidak ikut histogram /metrics
+    registry.reset()
+    return time.perf_counter() - start
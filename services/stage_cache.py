@@ -0,0 +1,154 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def file_content_hash(image_abs_path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 dari isi file upload (bukan nama file)."""
+    h = hashlib.sha256()
+    with open(image_abs_path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def normalize_params(params: dict | None) -> tuple:
+    """
+    Ubah dict parameter menjadi tuple yang stabil untuk dipakai sebagai key.
+    - key diurutkan
+    - float yang sebenarnya bulat (mis. 5.0) disamakan dengan int (5)
+    """
+    if not params:
+        return ()
+    items = []
+    for key in sorted(params):
+        value = params[key]
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        items.append((key, value))
+    return tuple(items)
+
+
+class StageCache:
+    """
+    Cache LRU untuk hasil intermediate (np.ndarray) setiap stage pipeline.
+    Key: (content hash upload, nama stage, parameter ternormalisasi).
+    Ukuran dibatasi oleh max_bytes (jumlah nbytes semua array yang disimpan).
+    Memo hash file juga LRU, dibatasi max_hash_entries.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_hash_entries: int = 4096):
+        self.max_bytes = int(max_bytes)
+        self.max_hash_entries = max(int(max_hash_entries), 1)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # memo (path, mtime, size) -> hash supaya file tidak di-hash ulang tiap request
+        self._hash_memo: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def make_key(content_hash: str, stage: str, params: dict | None = None) -> tuple:
+        return (content_hash, stage, normalize_params(params))
+
+    def content_hash(self, image_abs_path: str) -> str:
+        st = os.stat(image_abs_path)
+        memo_key = (os.path.abspath(image_abs_path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._hash_memo.get(memo_key)
+            if cached is not None:
+                self._hash_memo.move_to_end(memo_key)
+                return cached
+
+        digest = file_content_hash(image_abs_path)
+        self._remember(memo_key, digest)
+        return digest
+
+    def _remember(self, memo_key: tuple, content_hash: str) -> None:
+        with self._lock:
+            self._hash_memo[memo_key] = content_hash
+            self._hash_memo.move_to_end(memo_key)
+            # satu entri per (path, mtime, size): tanpa batas memo tumbuh terus di server long-running
+            while len(self._hash_memo) > self.max_hash_entries:
+                self._hash_memo.popitem(last=False)
+
+    def remember_hash(self, image_abs_path: str, content_hash: str) -> None:
+        """Catat hash yang sudah diketahui (mis. dihitung saat upload) agar tidak di-hash ulang."""
+        st = os.stat(image_abs_path)
+        memo_key = (os.path.abspath(image_abs_path), st.st_mtime_ns, st.st_size)
+        self._remember(memo_key, content_hash)
+
+    def get(self, key: tuple) -> np.ndarray | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: tuple, value: np.ndarray) -> None:
+        nbytes = int(value.nbytes)
+        if nbytes > self.max_bytes:
+            # terlalu besar untuk budget, jangan disimpan
+            return
+
+        # hasil di cache dipakai bersama antar request, jadi dibuat read-only
+        value.setflags(write=False)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= int(old.nbytes)
+
+            self._entries[key] = value
+            self.current_bytes += nbytes
+
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= int(evicted.nbytes)
+
+    def get_or_compute(self, key: tuple, compute) -> np.ndarray:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def remove_input(self, content_hash: str) -> int:
+        """Buang semua entri satu upload (termasuk namespace preview "<hash>@L<level>")."""
+        with self._lock:
+            doomed = [
+                key for key in self._entries
+                if key[0] == content_hash or key[0].startswith(f"{content_hash}@")
+            ]
+            for key in doomed:
+                self.current_bytes -= int(self._entries.pop(key).nbytes)
+            for memo_key in [k for k, v in self._hash_memo.items() if v == content_hash]:
+                del self._hash_memo[memo_key]
+        return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hash_memo.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hash_memo_entries": len(self._hash_memo),
+            }
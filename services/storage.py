@@ -0,0 +1,216 @@
+"""
+Penyimpanan upload content-addressed.
+
+File upload disimpan sebagai <sha256>.<ext> sehingga film yang sama (nama
+apa pun) hanya disimpan dan diproses sekali, dan dua film berbeda dengan nama
+sama tidak saling menimpa. Nama asli dicatat sebagai alias → hash di journal
+JSON.
+
+Upload di-decode langsung dari memori; file asli ditulis di background
+(BackgroundWriter) atau tidak ditulis sama sekali jika client hanya butuh hasil.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: hanya dev server satu proses
+    fcntl = None
+
+_HASH_NAME_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def output_name(prefix: str, content_hash: str, pipe_hash: str, ext: str = "png", version: str | None = None) -> str:
+    """
+    Nama output deterministik dari (hash input, hash pipeline).
+    version (code_version) ikut di-hash ke bagian pipeline: output dari kode lama
+    tidak dipakai ulang setelah deploy. Format nama tetap <prefix>_<hash16>_<pipe16>.
+    """
+    if version:
+        pipe_hash = hashlib.sha256(f"{pipe_hash}:{version}".encode("utf-8")).hexdigest()
+    return f"{prefix}_{content_hash[:16]}_{pipe_hash[:16]}.{ext}"
+
+
+class UploadStore:
+    def __init__(self, upload_folder: str, journal_path: str):
+        self.upload_folder = upload_folder
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+        self._aliases: dict = {}  # nama asli → hash
+        self._files: dict = {}  # hash → nama file tersimpan
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._aliases = dict(data.get("aliases", {}))
+        self._files = dict(data.get("files", {}))
+
+    @contextmanager
+    def _journal_lock(self):
+        """Lock antar proses (worker gunicorn) untuk read-modify-write journal."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        with open(f"{self.journal_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        tmp_path = f"{self.journal_path}.tmp{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"aliases": self._aliases, "files": self._files}, f)
+        os.replace(tmp_path, self.journal_path)
+
+    def stored_name_for(self, content_hash: str, original_name: str) -> str:
+        """Nama file tersimpan untuk hash ini (yang sudah tercatat, atau <hash>.<ext> baru)."""
+        with self._lock:
+            stored_name = self._files.get(content_hash)
+        if stored_name is not None:
+            return stored_name
+        ext = original_name.rsplit(".", 1)[-1].lower() if "." in original_name else "bin"
+        return f"{content_hash}.{ext}"
+
+    def register(self, original_name: str, content_hash: str, stored_name: str) -> None:
+        """Catat alias nama asli → hash dan hash → nama tersimpan (file boleh belum/tidak ditulis)."""
+        with self._lock, self._journal_lock():
+            # journal di disk = gabungan semua proses; dibaca ulang supaya entri proses lain tidak tertimpa
+            self._load()
+            self._files[content_hash] = stored_name
+            self._aliases[original_name] = content_hash
+            self._save()
+
+    def has_file(self, stored_name: str) -> bool:
+        return os.path.exists(os.path.join(self.upload_folder, stored_name))
+
+    def write(self, stored_name: str, data: bytes) -> str:
+        """
+        Tulis isi upload (sudah di memori) ke <upload_folder>/<stored_name>.
+        Ditulis ke file sementara lalu di-rename; isi yang sudah ada tidak ditulis ulang.
+        """
+        path = os.path.join(self.upload_folder, stored_name)
+        if os.path.exists(path):
+            return path
+        os.makedirs(self.upload_folder, exist_ok=True)
+        tmp_path = os.path.join(self.upload_folder, f".incoming-{uuid.uuid4().hex}")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def resolve(self, name: str) -> str | None:
+        """
+        Nama tersimpan (<hash>.<ext>) atau alias nama asli → path absolut.
+        File lama (sebelum content-addressing) di folder upload tetap bisa dipakai.
+        None jika file tidak ada di disk (mis. upload tanpa simpan file asli).
+        """
+        if not name:
+            return None
+        with self._lock:
+            if not _HASH_NAME_RE.match(name):
+                if name not in self._aliases:
+                    # mungkin di-upload lewat worker lain
+                    self._load()
+                content_hash = self._aliases.get(name)
+                if content_hash is not None and content_hash in self._files:
+                    name = self._files[content_hash]
+        path = os.path.join(self.upload_folder, name)
+        return path if os.path.exists(path) else None
+
+    def content_hash_of(self, name: str) -> str | None:
+        with self._lock:
+            if _HASH_NAME_RE.match(name):
+                return name.split(".", 1)[0]
+            if name not in self._aliases:
+                self._load()
+            return self._aliases.get(name)
+
+    def release(self, name: str) -> str | None:
+        """
+        Lepas satu referensi: alias nama asli dihapus; konten (file + entri hash) baru
+        dihapus jika tidak ada alias lain yang menunjuk hash yang sama (film yang sama
+        di-upload pihak lain tetap bisa dipakai). Nama tersimpan <hash>.<ext> bukan
+        alias: konten hanya dihapus jika hash-nya sudah tidak punya alias.
+        Return hash yang kontennya dihapus, atau None.
+        """
+        with self._lock, self._journal_lock():
+            self._load()
+            if _HASH_NAME_RE.match(name):
+                content_hash = name.split(".", 1)[0]
+            else:
+                content_hash = self._aliases.pop(name, None)
+            if content_hash is None:
+                return None
+            if any(h == content_hash for h in self._aliases.values()):
+                self._save()
+                return None
+            stored_name = self._files.pop(content_hash, None)
+            self._save()
+        if stored_name is not None:
+            path = os.path.join(self.upload_folder, stored_name)
+            if os.path.exists(path):
+                os.remove(path)
+        return content_hash
+
+
+class BackgroundWriter:
+    """
+    Thread pool kecil untuk penulisan disk yang tidak perlu ditunggu request
+    (file upload asli, working copy). Per key (content hash) bisa di-wait() oleh
+    request berikutnya yang butuh file-nya.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self._pool = ThreadPoolExecutor(max_workers=max(int(max_workers), 1), thread_name_prefix="upload-writer")
+        self._pending: dict = {}
+        self._lock = threading.Lock()
+        self.failures = 0
+
+    def submit(self, key: str, func) -> None:
+        def run():
+            try:
+                func()
+            except (OSError, ValueError):
+                # disk penuh / gagal tulis: request berikutnya jatuh ke jalur "file not found"
+                with self._lock:
+                    self.failures += 1
+            finally:
+                with self._lock:
+                    if self._pending.get(key) is future:
+                        del self._pending[key]
+
+        with self._lock:
+            future = self._pool.submit(run)
+            self._pending[key] = future
+
+    def wait(self, key: str, timeout: float | None = None) -> None:
+        """Tunggu penulisan untuk key ini selesai (langsung return jika tidak ada)."""
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except TimeoutError:
+                pass
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
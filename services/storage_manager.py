@@ -0,0 +1,173 @@
+"""
+Storage manager untuk file di disk (upload, working copy, output persist).
+
+Setiap file yang ditulis aplikasi dicatat di index SQLite beserta ukuran,
+waktu akses terakhir dan input_key (16 hex pertama content hash upload
+asalnya). Thread background menegakkan TTL dan budget byte total dengan
+membuang file yang paling lama tidak diakses (LRU). /clear cukup query index
+berdasarkan input_key — tanpa os.listdir folder output.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# <hash 64>.<ext>, <prefix>_<hash16>_<pipe16>.<ext>, hist_<hash 64>.png, dst.
+_INPUT_KEY_RE = re.compile(r"(?:^|_)([0-9a-f]{16})(?:[0-9a-f]{48})?(?:_[0-9a-f]{16})?\.[a-z0-9]+$")
+
+
+def input_key(name: str) -> str | None:
+    """input_key (content hash[:16]) dari nama file upload/working copy/output."""
+    match = _INPUT_KEY_RE.search(os.path.basename(name))
+    return match.group(1) if match else None
+
+
+class StorageManager:
+    """
+    Index SQLite: files(path, kind, input_key, size, last_access).
+    - max_bytes: budget total semua file yang dicatat
+    - ttl_seconds: file yang tidak diakses selama ini dibuang
+    """
+
+    def __init__(self, db_path: str, max_bytes: int, ttl_seconds: float):
+        self.db_path = db_path
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # satu koneksi dipakai bersama semua thread, diserialisasi oleh _lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, kind TEXT NOT NULL, input_key TEXT,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_input_key ON files (input_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_last_access ON files (last_access)")
+
+    def track(self, path: str, kind: str) -> None:
+        """Catat (atau perbarui) file yang baru ditulis."""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, kind, input_key, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (os.path.abspath(path), kind, input_key(path), size, time.time()),
+            )
+
+    def adopt(self, folder: str, kind: str) -> int:
+        """Masukkan file lama di folder yang belum tercatat (last_access = mtime). Dipanggil saat start."""
+        if not os.path.isdir(folder):
+            return 0
+        rows = []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith("."):
+                    st = entry.stat()
+                    rows.append((os.path.abspath(entry.path), kind, input_key(entry.name), st.st_size, st.st_mtime))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO files (path, kind, input_key, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self._conn.total_changes - before
+
+    def touch(self, path: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE files SET last_access = ? WHERE path = ?", (time.time(), os.path.abspath(path))
+            )
+
+    def touch_input(self, content_hash: str, kinds: tuple = ("upload", "work")) -> None:
+        """Perbarui akses upload + working copy sekaligus (dipakai setiap kali upload di-resolve)."""
+        placeholders = ",".join("?" * len(kinds))
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE files SET last_access = ? WHERE input_key = ? AND kind IN ({placeholders})",
+                (time.time(), content_hash[:16], *kinds),
+            )
+
+    def _delete(self, paths: list[str]) -> None:
+        # dipanggil dengan _lock dipegang
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in paths])
+
+    def remove_input(self, content_hash: str) -> int:
+        """Hapus semua file turunan satu upload (lookup index, bukan scan folder)."""
+        with self._lock:
+            paths = [
+                row[0]
+                for row in self._conn.execute("SELECT path FROM files WHERE input_key = ?", (content_hash[:16],))
+            ]
+            self._delete(paths)
+        return len(paths)
+
+    def evict(self, now: float | None = None) -> int:
+        """Buang file kedaluwarsa (TTL), lalu LRU sampai total <= max_bytes. Return jumlah file dibuang."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT path FROM files WHERE last_access < ?", (now - self.ttl_seconds,)
+                )
+            ]
+            self._delete(expired)
+
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+            victims = []
+            if total > self.max_bytes:
+                for path, size in self._conn.execute("SELECT path, size FROM files ORDER BY last_access"):
+                    victims.append(path)
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+                self._delete(victims)
+
+            removed = len(expired) + len(victims)
+            self.evictions += removed
+        return removed
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.evict()
+            except (OSError, sqlite3.Error):
+                # coba lagi di putaran berikutnya
+                continue
+
+    def start(self, interval: float) -> None:
+        """Jalankan eviction periodik di thread daemon."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(float(interval),), name="storage-evict", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            files, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+            return {
+                "files": files,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
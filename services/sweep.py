@@ -0,0 +1,159 @@
+"""
+Parameter sweep: evaluasi banyak varian pipeline dalam satu pass.
+
+Grid ditulis sebagai spesifikasi stage biasa dengan list pada nilai yang
+di-sweep, mis.
+    [["gaussian", {"ksize": [3, 5, 7]}], ["clahe", {"clip_limit": [1.0, 2.0, 3.0]}]]
+→ 9 varian. Varian dievaluasi per level stage sebagai pohon prefix, sehingga
+prefix yang sama (mis. gaussian ksize=5) hanya dihitung sekali, dan node
+dalam satu level diproses paralel di thread pool (OpenCV melepas GIL).
+Prefix dilepas setelah anak-anaknya selesai, dan hasil varian bisa diringkas
+(thumbnail, statistik) begitu varian itu selesai lewat on_leaf.
+"""
+import itertools
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from services.image_processing import apply_stage, normalize_stage, split_stage_spec
+
+
+def expand_grid(stages) -> list[list[tuple[str, dict]]]:
+    """
+    Cartesian product dari semua nilai list di parameter stage.
+    Bentuk stage sama dengan /process/pipeline (lihat split_stage_spec).
+    ValueError untuk list nilai kosong atau grid tanpa varian.
+    """
+    per_stage = []
+    for spec in stages:
+        name, params = split_stage_spec(spec)
+        keys = list(params)
+        values = [v if isinstance(v, list) else [v] for v in params.values()]
+        for key, options in zip(keys, values):
+            if not options:
+                raise ValueError(f'nilai sweep "{key}" kosong')
+        options = [normalize_stage(name, dict(zip(keys, combo))) for combo in itertools.product(*values)]
+        per_stage.append(options)
+    variants = [list(variant) for variant in itertools.product(*per_stage)]
+    if not variants:
+        raise ValueError("grid sweep tidak menghasilkan varian")
+    return variants
+
+
+def _freeze(spec: tuple[str, dict]) -> tuple:
+    name, params = spec
+    return (name, tuple(sorted(params.items())))
+
+
+def run_sweep(gray_u8: np.ndarray, variants: list, max_workers: int = 4, on_leaf=None) -> list:
+    """
+    Jalankan semua varian mulai dari gray_u8 yang sama.
+    Return hasil akhir setiap varian (urutan sama dengan variants).
+    - on_leaf(img): opsional, dipanggil di thread worker begitu sebuah varian selesai
+      (mis. statistik + thumbnail); nilai return-nya yang dikembalikan untuk varian itu
+      dan array full resolution-nya tidak ditahan sampai akhir sweep.
+    Prefix level sebelumnya dilepas setelah semua anaknya selesai: memori puncak
+    sebanding jumlah node dalam dua level berurutan, bukan seluruh pohon.
+    """
+    finish = on_leaf or (lambda img: img)
+    keys = [tuple(_freeze(s) for s in variant) for variant in variants]
+    leaves: dict = {}
+    for i, key in enumerate(keys):
+        leaves.setdefault(key, []).append(i)
+    # prefix yang masih punya anak → hasilnya dibutuhkan level berikutnya
+    inner = {key[:n] for key in keys for n in range(len(key))}
+    outputs = [None] * len(variants)
+    for i in leaves.get((), []):
+        outputs[i] = finish(gray_u8)
+
+    def compute(parent: np.ndarray, spec: tuple[str, dict], prefix: tuple):
+        img = apply_stage(parent, spec[0], spec[1])
+        leaf = finish(img) if prefix in leaves else None
+        return (img if prefix in inner else None), leaf
+
+    parents = {(): gray_u8}
+    depth = max((len(key) for key in keys), default=0)
+    with ThreadPoolExecutor(max_workers=max(int(max_workers), 1)) as pool:
+        for level in range(depth):
+            # prefix unik di level ini → dihitung sekali dari parent-nya
+            todo = {}
+            for variant, key in zip(variants, keys):
+                if len(key) > level:
+                    todo.setdefault(key[: level + 1], variant[level])
+
+            futures = {
+                prefix: pool.submit(compute, parents[prefix[:-1]], spec, prefix)
+                for prefix, spec in todo.items()
+            }
+            children = {}
+            for prefix, future in futures.items():
+                img, leaf = future.result()
+                if img is not None:
+                    children[prefix] = img
+                for i in leaves.get(prefix, []):
+                    outputs[i] = leaf
+            # parent level ini tidak dipakai lagi
+            del futures
+            parents = children
+
+    return outputs
+
+
+def variant_stats(img: np.ndarray) -> dict:
+    """Statistik ringkas untuk membandingkan varian."""
+    mean, std = cv2.meanStdDev(img)
+    vmin, vmax, _, _ = cv2.minMaxLoc(img)
+    return {
+        "mean": round(float(mean[0, 0]), 3),
+        "std": round(float(std[0, 0]), 3),
+        "min": int(vmin),
+        "max": int(vmax),
+        "nonzero_ratio": round(cv2.countNonZero(img) / img.size, 5),
+    }
+
+
+def make_thumbnail(img: np.ndarray, max_side: int = 256) -> np.ndarray:
+    height, width = img.shape[:2]
+    scale = min(max_side / max(height, width), 1.0)
+    if scale >= 1.0:
+        return img
+    size = (max(int(round(width * scale)), 1), max(int(round(height * scale)), 1))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def variant_label(variant: list) -> str:
+    parts = []
+    for name, params in variant:
+        values = ",".join(f"{v}" for v in params.values())
+        parts.append(f"{name}({values})" if values else name)
+    return " > ".join(parts)
+
+
+def contact_sheet(thumbs: list, labels: list, columns: int | None = None) -> np.ndarray:
+    """Susun thumbnail dalam grid dengan label kecil di bawah setiap sel."""
+    if not thumbs:
+        raise ValueError("tidak ada thumbnail")
+    columns = columns or math.ceil(math.sqrt(len(thumbs)))
+    rows = math.ceil(len(thumbs) / columns)
+    cell_h = max(t.shape[0] for t in thumbs)
+    cell_w = max(t.shape[1] for t in thumbs)
+    label_h = 16
+
+    sheet = np.full((rows * (cell_h + label_h), columns * cell_w), 25, dtype=np.uint8)
+    for i, (thumb, label) in enumerate(zip(thumbs, labels)):
+        r, c = divmod(i, columns)
+        y0, x0 = r * (cell_h + label_h), c * cell_w
+        sheet[y0:y0 + thumb.shape[0], x0:x0 + thumb.shape[1]] = thumb
+        cv2.putText(
+            sheet,
+            label[: max(cell_w // 6, 1)],
+            (x0 + 2, y0 + cell_h + 12),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.32,
+            200,
+            1,
+            cv2.LINE_AA,
+        )
+    return sheet
@@ -0,0 +1,182 @@
+"""
+Mode tiled untuk radiograf sangat besar.
+
+Filter dijalankan per tile dengan halo (border overlap) dan jumlah tile
+in-flight terbatas: buffer kerja OpenCV (padding border, histogram CLAHE)
+sebesar tile, bukan sebesar image. Input dan output tetap array penuh di RAM
+(run_pipeline menyimpan hasil setiap stage), jadi peak memori tetap
+sebanding ukuran image.
+
+- Gaussian / median: hasil identik dengan versi full image (halo = ksize // 2,
+  border image tetap ditangani OpenCV karena tile di tepi tidak dipotong).
+- CLAHE: tile disejajarkan dengan grid sel CLAHE global + halo satu sel,
+  sehingga LUT setiap sel sama dengan versi full image; perbedaan maksimal
+  ±1 level akibat pembulatan interpolasi float.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from services.filter_pool import clahe_pool
+from services.image_processing import _make_odd
+
+
+def _run_bounded(jobs, max_in_flight: int) -> None:
+    """Jalankan job (callable) paralel dengan jumlah tile in-flight terbatas."""
+    max_in_flight = max(int(max_in_flight), 1)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        pending = deque()
+        for job in jobs:
+            if len(pending) >= max_in_flight:
+                pending.popleft().result()
+            pending.append(pool.submit(job))
+        while pending:
+            pending.popleft().result()
+
+
+def apply_tiled(
+    src: np.ndarray,
+    func,
+    halo: int,
+    tile_size: int = 1024,
+    max_in_flight: int = 4,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Jalankan func(tile) -> tile (ukuran sama) per tile dengan halo.
+    - src: array 2D
+    - halo: jumlah piksel overlap di setiap sisi (≥ radius filter)
+    - out: array tujuan; default array baru
+    """
+    height, width = src.shape
+    tile_size = max(int(tile_size), 1)
+    halo = max(int(halo), 0)
+    if out is None:
+        out = np.empty((height, width), dtype=np.uint8)
+
+    def make_job(y0, x0):
+        y1, x1 = min(y0 + tile_size, height), min(x0 + tile_size, width)
+        ya, xa = max(y0 - halo, 0), max(x0 - halo, 0)
+        yb, xb = min(y1 + halo, height), min(x1 + halo, width)
+
+        def job():
+            # copy contiguous tile + halo untuk OpenCV
+            tile = np.ascontiguousarray(src[ya:yb, xa:xb])
+            result = func(tile)
+            out[y0:y1, x0:x1] = result[y0 - ya:y1 - ya, x0 - xa:x1 - xa]
+
+        return job
+
+    jobs = (
+        make_job(y0, x0)
+        for y0 in range(0, height, tile_size)
+        for x0 in range(0, width, tile_size)
+    )
+    _run_bounded(jobs, max_in_flight)
+    return out
+
+
+def gaussian_tiled(src: np.ndarray, ksize: int, sigma: float, **kwargs) -> np.ndarray:
+    ksize = _make_odd(ksize)
+    sigma = float(sigma)
+    # sigma=0 → OpenCV menurunkan sigma dari ksize; radius kernel tetap ksize // 2
+    return apply_tiled(
+        src,
+        lambda tile: cv2.GaussianBlur(tile, (ksize, ksize), sigmaX=sigma),
+        halo=ksize // 2,
+        **kwargs,
+    )
+
+
+def median_tiled(src: np.ndarray, ksize: int, **kwargs) -> np.ndarray:
+    ksize = _make_odd(ksize)
+    return apply_tiled(src, lambda tile: cv2.medianBlur(tile, ksize), halo=ksize // 2, **kwargs)
+
+
+def _reflect_101(idx: np.ndarray, n: int) -> np.ndarray:
+    """Index BORDER_REFLECT_101 (sama seperti padding internal CLAHE OpenCV)."""
+    idx = np.abs(idx)
+    return np.where(idx >= n, 2 * (n - 1) - idx, idx)
+
+
+def clahe_tiled(
+    src: np.ndarray,
+    clip_limit: float,
+    tile_grid_size: int,
+    tile_size: int = 1024,
+    max_in_flight: int = 4,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """CLAHE per tile; tile disejajarkan dengan sel grid CLAHE global (lihat docstring modul)."""
+    clip_limit = float(clip_limit)
+    grid = _make_odd(tile_grid_size)
+    height, width = src.shape
+    if out is None:
+        out = np.empty((height, width), dtype=np.uint8)
+
+    # Ukuran setelah padding internal OpenCV (createCLAHE().apply)
+    if height % grid == 0 and width % grid == 0:
+        pad_h, pad_w = height, width
+    else:
+        pad_h = height + grid - height % grid
+        pad_w = width + grid - width % grid
+    cell_h, cell_w = pad_h // grid, pad_w // grid
+
+    # Tile proses dalam satuan sel; halo satu sel di setiap sisi
+    cells_y = max(tile_size // cell_h, 1)
+    cells_x = max(tile_size // cell_w, 1)
+
+    def make_job(gy0, gx0):
+        gy1, gx1 = min(gy0 + cells_y, grid), min(gx0 + cells_x, grid)
+        hy0, hx0 = max(gy0 - 1, 0), max(gx0 - 1, 0)
+        hy1, hx1 = min(gy1 + 1, grid), min(gx1 + 1, grid)
+
+        def job():
+            rows = _reflect_101(np.arange(hy0 * cell_h, hy1 * cell_h), height)
+            cols = _reflect_101(np.arange(hx0 * cell_w, hx1 * cell_w), width)
+            slab = np.ascontiguousarray(src[np.ix_(rows, cols)])
+
+            result = clahe_pool.get(clip_limit, (hx1 - hx0, hy1 - hy0)).apply(slab)
+
+            y0, x0 = gy0 * cell_h, gx0 * cell_w
+            y1, x1 = min(gy1 * cell_h, height), min(gx1 * cell_w, width)
+            oy, ox = y0 - hy0 * cell_h, x0 - hx0 * cell_w
+            out[y0:y1, x0:x1] = result[oy:oy + (y1 - y0), ox:ox + (x1 - x0)]
+
+        return job
+
+    jobs = (
+        make_job(gy0, gx0)
+        for gy0 in range(0, grid, cells_y)
+        for gx0 in range(0, grid, cells_x)
+    )
+    _run_bounded(jobs, max_in_flight)
+    return out
+
+
+TILED_FILTERS = {
+    "gaussian": lambda src, params, **kw: gaussian_tiled(src, params.get("ksize", 5), params.get("sigma", 1.0), **kw),
+    "median": lambda src, params, **kw: median_tiled(src, params.get("ksize", 5), **kw),
+    "clahe": lambda src, params, **kw: clahe_tiled(
+        src, params.get("clip_limit", 2.0), params.get("tile_grid_size", 8), **kw
+    ),
+}
+
+
+def run_tiled(
+    src: np.ndarray,
+    method: str,
+    params: dict | None = None,
+    tile_size: int = 1024,
+    max_in_flight: int = 4,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """Jalankan satu filter (gaussian/median/clahe) dalam mode tiled."""
+    method = (method or "").lower().strip()
+    if method not in TILED_FILTERS:
+        raise ValueError(f'method tiled harus salah satu dari {tuple(TILED_FILTERS)}')
+    return TILED_FILTERS[method](
+        src, params or {}, tile_size=tile_size, max_in_flight=max_in_flight, out=out
+    )
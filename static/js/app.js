@@ -248,238 +248,130 @@ document.addEventListener("DOMContentLoaded", () => {
     return "";
   };
 
-  const runNoiseRemoval = async (method, noiseParams = {}) => {
-    const filename = currentFilenameInput?.value;
-    if (!filename || !method) {
-      resetProcessedImage();
-      updateProcessedHistogram(filename ? `${window.location.origin}/static/uploads/${filename}` : "");
-      return;
+  const buildStages = (noiseMethod, contrastMethod, segmentationMethod, maskingMethod, noiseParams = {}) => {
+    const stages = [];
+    if (noiseMethod === "gaussian") {
+      const params = {};
+      if (Number.isFinite(noiseParams.gaussian_ksize)) params.ksize = noiseParams.gaussian_ksize;
+      if (Number.isFinite(noiseParams.gaussian_sigma)) params.sigma = noiseParams.gaussian_sigma;
+      stages.push(["gaussian", params]);
     }
-
-    const formData = new FormData();
-    formData.append("filename", filename);
-    formData.append("method", method);
-    if (method === "gaussian") {
-      if (Number.isFinite(noiseParams.gaussian_ksize)) {
-        formData.append("gaussian_ksize", String(noiseParams.gaussian_ksize));
-      }
-      if (Number.isFinite(noiseParams.gaussian_sigma)) {
-        formData.append("gaussian_sigma", String(noiseParams.gaussian_sigma));
-      }
+    if (noiseMethod === "median") {
+      const params = {};
+      if (Number.isFinite(noiseParams.median_ksize)) params.ksize = noiseParams.median_ksize;
+      stages.push(["median", params]);
     }
-    if (method === "median") {
-      if (Number.isFinite(noiseParams.median_ksize)) {
-        formData.append("median_ksize", String(noiseParams.median_ksize));
-      }
+    if (contrastMethod) {
+      // CLAHE parameters bisa ditambahkan jika diperlukan
+      stages.push([contrastMethod, {}]);
     }
-
-    try {
-      const response = await fetch("/process/noise-removal", {
-        method: "POST",
-        body: formData,
-      });
-      if (!response.ok) {
-        resetProcessedImage();
-        return;
-      }
-      const data = await response.json();
-      if (data?.out_url) {
-        const url = data.out_url;
-        setProcessedImageSrc(`${url}?t=${Date.now()}`);
-        updateProcessedHistogram(url);
-      } else {
-        resetProcessedImage();
-      }
-    } catch (err) {
-      console.error("Noise removal failed:", err);
-      resetProcessedImage();
+    if (maskingMethod) {
+      stages.push(["masking", { segmentation_method: "otsu" }]); // default menggunakan otsu untuk mask
+    } else if (segmentationMethod) {
+      stages.push([segmentationMethod, {}]);
     }
+    return stages;
   };
 
-  const runContrastEnhancement = async (method, noiseMethod, noiseParams = {}) => {
+  // Satu request untuk seluruh chain + histogram hasil akhir
+  const runPipeline = async (stages) => {
     const filename = currentFilenameInput?.value;
-    if (!filename || !method) {
+    if (!filename || !stages.length) {
       resetProcessedImage();
       updateProcessedHistogram(filename ? `${window.location.origin}/static/uploads/${filename}` : "");
       return;
     }
 
-    const formData = new FormData();
-    formData.append("filename", filename);
-    formData.append("method", method);
-    if (noiseMethod) {
-      formData.append("noise_method", noiseMethod);
-      if (noiseMethod === "gaussian") {
-        if (Number.isFinite(noiseParams.gaussian_ksize)) {
-          formData.append("gaussian_ksize", String(noiseParams.gaussian_ksize));
-        }
-        if (Number.isFinite(noiseParams.gaussian_sigma)) {
-          formData.append("gaussian_sigma", String(noiseParams.gaussian_sigma));
-        }
-      }
-      if (noiseMethod === "median") {
-        if (Number.isFinite(noiseParams.median_ksize)) {
-          formData.append("median_ksize", String(noiseParams.median_ksize));
-        }
-      }
-    }
-
     try {
-      const response = await fetch("/process/contrast-enhancement", {
+      const response = await fetch("/process/pipeline", {
         method: "POST",
-        body: formData,
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ filename, stages, histogram: true }),
       });
       if (!response.ok) {
         resetProcessedImage();
         return;
       }
       const data = await response.json();
-      if (data?.out_url) {
-        const url = data.out_url;
-        setProcessedImageSrc(`${url}?t=${Date.now()}`);
-        updateProcessedHistogram(url);
+      const result = data?.outputs?.[data.outputs.length - 1];
+      if (result?.out_url) {
+        const stamp = Date.now();
+        setProcessedImageSrc(`${result.out_url}?t=${stamp}`);
+        if (processedHistogramImg && result.hist_url) {
+          processedHistogramImg.src = `${result.hist_url}?t=${stamp}`;
+        } else {
+          updateProcessedHistogram(result.out_url);
+        }
       } else {
         resetProcessedImage();
       }
     } catch (err) {
-      console.error("Contrast enhancement failed:", err);
+      console.error("Pipeline failed:", err);
       resetProcessedImage();
     }
   };
 
-  const runSegmentation = async (method, noiseMethod, contrastMethod, noiseParams = {}) => {
+  const getCurrentStages = () =>
+    buildStages(
+      getActiveNoiseMethod(),
+      getActiveContrastMethod(),
+      getActiveSegmentationMethod(),
+      getActiveMaskingMethod(),
+      getNoiseParams()
+    );
+
+  // Preview cepat (level pyramid kecil) selama slider digeser.
+  // Hanya satu request in-flight; perubahan selama menunggu digabung jadi satu request berikutnya.
+  let previewInFlight = false;
+  let previewPending = false;
+  let previewGeneration = 0; // naik setiap processImage → preview lama tidak menimpa hasil full
+  const runPreview = async () => {
     const filename = currentFilenameInput?.value;
-    if (!filename || !method) {
-      resetProcessedImage();
-      updateProcessedHistogram(filename ? `${window.location.origin}/static/uploads/${filename}` : "");
+    const stages = getCurrentStages();
+    if (!filename || !stages.length) return;
+    if (previewInFlight) {
+      previewPending = true;
       return;
     }
 
-    const formData = new FormData();
-    formData.append("filename", filename);
-    formData.append("method", method);
-    if (noiseMethod) formData.append("noise_method", noiseMethod);
-    if (contrastMethod) formData.append("contrast_method", contrastMethod);
-    if (noiseMethod === "gaussian") {
-      if (Number.isFinite(noiseParams.gaussian_ksize)) {
-        formData.append("gaussian_ksize", String(noiseParams.gaussian_ksize));
-      }
-      if (Number.isFinite(noiseParams.gaussian_sigma)) {
-        formData.append("gaussian_sigma", String(noiseParams.gaussian_sigma));
-      }
-    }
-    if (noiseMethod === "median") {
-      if (Number.isFinite(noiseParams.median_ksize)) {
-        formData.append("median_ksize", String(noiseParams.median_ksize));
-      }
-    }
-
+    previewInFlight = true;
+    const generation = previewGeneration;
     try {
-      const response = await fetch("/process/segmentation", {
+      const response = await fetch("/process/preview", {
         method: "POST",
-        body: formData,
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ filename, stages }),
       });
-      if (!response.ok) {
-        resetProcessedImage();
-        return;
-      }
-      const data = await response.json();
-      if (data?.out_url) {
-        const url = data.out_url;
-        setProcessedImageSrc(`${url}?t=${Date.now()}`);
-        updateProcessedHistogram(url);
-      } else {
-        resetProcessedImage();
+      if (response.ok) {
+        const data = await response.json();
+        if (data?.out_url && generation === previewGeneration) {
+          setProcessedImageSrc(data.out_url);
+        }
       }
     } catch (err) {
-      console.error("Segmentation failed:", err);
-      resetProcessedImage();
-    }
-  };
-
-  const runImageMasking = async (noiseMethod, contrastMethod, noiseParams = {}) => {
-    const filename = currentFilenameInput?.value;
-    if (!filename) {
-      resetProcessedImage();
-      updateProcessedHistogram(filename ? `${window.location.origin}/static/uploads/${filename}` : "");
-      return;
-    }
-
-    const formData = new FormData();
-    formData.append("filename", filename);
-    formData.append("segmentation_method", "otsu"); // default menggunakan otsu untuk mask
-    if (noiseMethod) formData.append("noise_method", noiseMethod);
-    if (contrastMethod) formData.append("contrast_method", contrastMethod);
-    if (noiseMethod === "gaussian") {
-      if (Number.isFinite(noiseParams.gaussian_ksize)) {
-        formData.append("gaussian_ksize", String(noiseParams.gaussian_ksize));
-      }
-      if (Number.isFinite(noiseParams.gaussian_sigma)) {
-        formData.append("gaussian_sigma", String(noiseParams.gaussian_sigma));
-      }
-    }
-    if (noiseMethod === "median") {
-      if (Number.isFinite(noiseParams.median_ksize)) {
-        formData.append("median_ksize", String(noiseParams.median_ksize));
+      console.error("Preview failed:", err);
+    } finally {
+      previewInFlight = false;
+      if (previewPending) {
+        previewPending = false;
+        runPreview();
       }
     }
-    if (contrastMethod === "clahe") {
-      // CLAHE parameters bisa ditambahkan jika diperlukan
-    }
-
-    try {
-      const response = await fetch("/process/image-masking", {
-        method: "POST",
-        body: formData,
-      });
-      if (!response.ok) {
-        resetProcessedImage();
-        return;
-      }
-      const data = await response.json();
-      if (data?.out_url) {
-        const url = data.out_url;
-        setProcessedImageSrc(`${url}?t=${Date.now()}`);
-        updateProcessedHistogram(url);
-      } else {
-        resetProcessedImage();
-      }
-    } catch (err) {
-      console.error("Image masking failed:", err);
-      resetProcessedImage();
-    }
   };
 
   const processImage = () => {
-    const contrastMethod = getActiveContrastMethod();
-    const noiseMethod = getActiveNoiseMethod();
-    const noiseParams = getNoiseParams();
-    const segmentationMethod = getActiveSegmentationMethod();
+    previewGeneration += 1;
+    previewPending = false;
     const maskingMethod = getActiveMaskingMethod();
 
     setSegmentationLock(Boolean(maskingMethod));
 
-    if (maskingMethod) {
-      runImageMasking(noiseMethod, contrastMethod, noiseParams);
-      return;
-    }
-
-    if (segmentationMethod) {
-      runSegmentation(segmentationMethod, noiseMethod, contrastMethod, noiseParams);
-      return;
-    }
-
-    if (contrastMethod) {
-      runContrastEnhancement(contrastMethod, noiseMethod, noiseParams);
-      return;
-    }
-
-    if (noiseMethod) {
-      runNoiseRemoval(noiseMethod, noiseParams);
+    const stages = getCurrentStages();
+    if (!stages.length) {
+      resetProcessedImage();
       return;
     }
-
-    resetProcessedImage();
+    runPipeline(stages);
   };
 
   ["gaussian", "median", "histogram", "clahe", "otsu", "masking"].forEach((id) => {
@@ -493,13 +385,18 @@ document.addEventListener("DOMContentLoaded", () => {
     if (!el) return;
     el.addEventListener("input", () => {
       updateGaussianDisplay();
+      runPreview();
     });
+    // slider dilepas → hasil full resolution
+    el.addEventListener("change", processImage);
   });
 
   if (medianKernel) {
     medianKernel.addEventListener("input", () => {
       updateMedianDisplay();
+      runPreview();
     });
+    medianKernel.addEventListener("change", processImage);
   }
 
   if (brightness) {
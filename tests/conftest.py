@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# modul app/, services/ dan batch.py diimpor dari root repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app
+
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    app = create_app(
+        {"TESTING": True, "UPLOAD_FOLDER": str(upload_dir), "UPLOAD_ASYNC_WRITES": False},
+        instance_path=str(tmp_path / "instance"),
+    )
+    yield app
+    app.extensions["storage"].stop()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,44 @@
+import json
+import os
+
+import cv2
+
+import batch
+from benchmarks.synthetic import synthetic_chest_xray
+
+
+def _write(path, seed):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cv2.imwrite(path, synthetic_chest_xray(64, seed))
+
+
+def test_same_named_inputs_get_separate_outputs(tmp_path):
+    src = tmp_path / "src"
+    _write(str(src / "a" / "img.png"), 1)
+    _write(str(src / "b" / "img.png"), 2)
+    _write(str(src / "x.png"), 3)
+    _write(str(src / "x.jpg"), 4)
+    out = str(tmp_path / "out")
+    stages = batch.parse_pipeline_arg("median:ksize=3,otsu")
+
+    inputs = batch.collect_inputs(str(src), recursive=True)
+    root = batch.input_root(str(src))
+    summary = batch.run_batch(inputs, stages, out, workers=1, root=root, log=lambda msg: None)
+    assert summary["done"] == 4
+
+    manifests = {}
+    for rel in ("a/img", "b/img", "x", "x_jpg"):
+        assert os.path.exists(os.path.join(out, f"{rel}.png"))
+        with open(os.path.join(out, f"{rel}.json"), encoding="utf-8") as f:
+            manifests[rel] = json.load(f)["source"]
+    assert len(set(manifests.values())) == 4
+
+    # run kedua: semua output cocok dengan inputnya → tidak ada yang diproses ulang
+    summary = batch.run_batch(inputs, stages, out, workers=1, root=root, log=lambda msg: None)
+    assert summary["skipped"] == 4
+
+
+def test_input_root_from_glob(tmp_path):
+    assert batch.input_root(os.path.join("data", "**", "*.png")) == "data"
+    assert batch.input_root("*.png") == "."
+    assert batch.input_root(str(tmp_path)) == str(tmp_path)
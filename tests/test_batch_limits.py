@@ -0,0 +1,42 @@
+import io
+import json
+import zipfile
+
+import cv2
+import numpy as np
+
+
+def _png(side: int) -> bytes:
+    return cv2.imencode(".png", np.full((side, side), 90, np.uint8))[1].tobytes()
+
+
+def _post_batch(client, archive: bytes):
+    return client.post(
+        "/batch",
+        data={"stages": json.dumps(["otsu"]), "archive": (io.BytesIO(archive), "films.zip")},
+        content_type="multipart/form-data",
+    )
+
+
+def test_batch_rejects_oversized_members_per_item(app, client):
+    small, large = _png(16), _png(64)
+    app.config["UPLOAD_MAX_PIXELS"] = 32 * 32
+    app.config["UPLOAD_MAX_BYTES"] = max(len(small), len(large)) + 16
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("ok.png", small)
+        zf.writestr("wide.png", large)
+        zf.writestr("heavy.png", b"\x89PNG" + b"\0" * (app.config["UPLOAD_MAX_BYTES"] + 1))
+        zf.writestr("broken.png", b"not an image")
+
+    response = _post_batch(client, buf.getvalue())
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    items = {line["name"]: line for line in lines if "name" in line}
+
+    assert "out_url" in items["ok.png"]
+    assert items["wide.png"]["error"] == "Dimensi gambar terlalu besar."
+    assert items["heavy.png"]["error"] == "File terlalu besar."
+    assert items["broken.png"]["error"] == "Gambar tidak bisa dibaca."
+    assert lines[-1]["failed"] == 3
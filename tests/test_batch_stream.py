@@ -0,0 +1,23 @@
+import io
+import json
+
+import cv2
+import numpy as np
+
+
+def test_batch_streams_multipart_files_past_first_window(app, client):
+    # lebih banyak gambar dari jendela in-flight (BATCH_WORKERS * 2): sisanya baru
+    # dibaca saat response di-stream, setelah view function selesai
+    app.config["BATCH_WORKERS"] = 2
+    png = cv2.imencode(".png", np.random.default_rng(0).integers(0, 256, (64, 64), dtype=np.uint8))[1].tobytes()
+    images = [(io.BytesIO(png), f"film{i}.png") for i in range(10)]
+
+    response = client.post(
+        "/batch",
+        data={"stages": json.dumps(["otsu"]), "images": images},
+        content_type="multipart/form-data",
+    )
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert [line for line in lines if "error" in line] == []
+    assert lines[-1]["done"] and lines[-1]["failed"] == 0
@@ -0,0 +1,56 @@
+import io
+import os
+import re
+
+import cv2
+
+from benchmarks.synthetic import synthetic_chest_xray
+
+
+def _upload(client, name, data):
+    response = client.post("/upload", data={"image": (io.BytesIO(data), name)}, content_type="multipart/form-data")
+    assert response.status_code == 200
+
+
+def test_clear_keeps_content_until_last_alias(app, client):
+    data = cv2.imencode(".png", synthetic_chest_xray(96))[1].tobytes()
+    _upload(client, "a.png", data)
+    _upload(client, "b.png", data)
+    store = app.extensions["upload_store"]
+    content_hash = store.content_hash_of("a.png")
+    stored = store.resolve("a.png")
+    assert client.post("/process/noise-removal", data={"filename": "a.png", "method": "median"}).status_code == 200
+
+    client.post("/clear", data={"filename": "a.png"})
+    # b.png menunjuk film yang sama → file, blob dan cache tetap ada
+    assert os.path.exists(stored)
+    assert client.post("/process/noise-removal", data={"filename": "b.png", "method": "median"}).status_code == 200
+    assert client.post("/process/noise-removal", data={"filename": "a.png", "method": "median"}).status_code == 404
+
+    client.post("/clear", data={"filename": "b.png"})
+    assert not os.path.exists(stored)
+    assert app.extensions["blob_store"].remove_input(content_hash) == 0
+    assert app.extensions["stage_cache"].remove_input(content_hash) == 0
+    assert client.post("/process/noise-removal", data={"filename": "b.png", "method": "median"}).status_code == 404
+
+
+def _hidden(html: str, name: str) -> str:
+    match = re.search(rf'name="{name}"\s+value="([^"]*)"', html)
+    assert match is not None
+    return match.group(1)
+
+
+def test_clear_from_ui_form_removes_upload(app, client):
+    data = cv2.imencode(".png", synthetic_chest_xray(96))[1].tobytes()
+    response = client.post("/upload", data={"image": (io.BytesIO(data), "film.png")}, content_type="multipart/form-data")
+    html = response.get_data(as_text=True)
+    # form Clear di UI: nama tersimpan <hash>.<ext> + alias upload
+    stored_name, alias = _hidden(html, "filename"), _hidden(html, "alias")
+    assert stored_name != alias == "film.png"
+
+    assert client.post("/process/noise-removal", data={"filename": stored_name, "method": "median"}).status_code == 200
+    stored = app.extensions["upload_store"].resolve(stored_name)
+
+    client.post("/clear", data={"filename": stored_name, "alias": alias})
+    assert not os.path.exists(stored)
+    assert client.post("/process/noise-removal", data={"filename": stored_name, "method": "median"}).status_code == 404
@@ -0,0 +1,28 @@
+import io
+
+import cv2
+
+from benchmarks.synthetic import synthetic_chest_xray
+
+
+def _denoise(client):
+    response = client.post("/process/noise-removal", data={"filename": "a.png", "method": "median"})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_code_version_change_forces_recompute(app, client):
+    data = cv2.imencode(".png", synthetic_chest_xray(64))[1].tobytes()
+    client.post("/upload", data={"image": (io.BytesIO(data), "a.png")}, content_type="multipart/form-data")
+    app.config["CODE_VERSION"] = "v1"
+
+    first = _denoise(client)
+    reused = _denoise(client)
+    # output yang sudah ada dikirim tanpa encode ulang (tanpa encode_ms)
+    assert reused["out_url"] == first["out_url"]
+    assert "encode_ms" not in reused["encoding"]
+
+    app.config["CODE_VERSION"] = "v2"
+    fresh = _denoise(client)
+    assert fresh["out_url"] != first["out_url"]
+    assert "encode_ms" in fresh["encoding"]
@@ -0,0 +1,63 @@
+import io
+
+import cv2
+import pytest
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from app import routes
+from benchmarks.synthetic import synthetic_chest_xray
+from services.encoding import negotiate_encoding
+
+CHROME_NAVIGATION = (
+    "text/html,application/xhtml+xml,application/xml;q=0.9,"
+    "image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7"
+)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("", "png"),
+        ("*/*", "png"),
+        (CHROME_NAVIGATION, "png"),
+        ("image/webp", "webp"),
+        ("image/webp, */*;q=0.5", "webp"),
+        ("image/webp;q=0.5, */*", "png"),
+        ("image/png, image/webp", "png"),
+        ("application/x-npy", "npy"),
+    ],
+)
+def test_negotiate_uses_only_explicit_accept(header, expected):
+    accept = parse_accept_header(header, MIMEAccept)
+    assert negotiate_encoding("", accept, "png") == expected
+    assert negotiate_encoding("jpeg", accept, "png") == "jpeg"
+
+
+def test_vary_accept_only_when_negotiated(app, client):
+    data = cv2.imencode(".png", synthetic_chest_xray(64))[1].tobytes()
+    client.post("/upload", data={"image": (io.BytesIO(data), "a.png")}, content_type="multipart/form-data")
+
+    negotiated = client.post("/process/noise-removal", data={"filename": "a.png", "method": "median"})
+    assert negotiated.status_code == 200
+    assert "Accept" in negotiated.vary
+
+    revalidated = client.post(
+        "/process/noise-removal",
+        data={"filename": "a.png", "method": "median"},
+        headers={"If-None-Match": negotiated.headers["ETag"]},
+    )
+    assert revalidated.status_code == 304
+    assert "Accept" in revalidated.vary
+
+    explicit = client.post("/process/noise-removal", data={"filename": "a.png", "method": "median", "encoding": "png"})
+    assert "Accept" not in explicit.vary
+
+
+def test_write_output_removes_tmp_on_failure(tmp_path, monkeypatch):
+    def fail(src, dst):
+        raise OSError("disk penuh")
+
+    monkeypatch.setattr(routes.os, "replace", fail)
+    assert routes._write_output(synthetic_chest_xray(32), "pl_x.png", True, str(tmp_path), blob_store=None) is None
+    assert list((tmp_path / "outputs").iterdir()) == []
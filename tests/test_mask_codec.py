@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+import pytest
+
+from services.mask_codec import (
+    PackedMask,
+    decode_rle,
+    describe_mask,
+    encode_mask_png,
+    encode_rle,
+    mask_bbox,
+    rle_counts,
+)
+
+
+def _mask(rows: list[str]) -> np.ndarray:
+    return np.array([[255 if c == "#" else 0 for c in row] for row in rows], dtype=np.uint8)
+
+
+# 3 x 3, column-major: kolom 0 = 0 0 0, kolom 1 = 0 1 1, kolom 2 = 0 1 1
+SQUARE = _mask(["...", ".##", ".##"])
+
+
+def test_rle_counts_are_column_major_starting_with_background():
+    assert rle_counts(SQUARE).tolist() == [4, 2, 1, 2]
+    # foreground di piksel pertama → run 0 pertama panjangnya 0
+    assert rle_counts(_mask(["#.", ".."])).tolist() == [0, 1, 3]
+    assert encode_rle(SQUARE, compressed=False) == {"size": [3, 3], "counts": [4, 2, 1, 2]}
+
+
+@pytest.mark.parametrize(
+    "counts, text",
+    [
+        # vektor dihitung manual dari algoritma rleToString pycocotools
+        ([0, 5, 3], "053"),
+        ([2, 3, 1, 4], "2311"),  # run ke-4 disimpan sebagai selisih 4 - 3 = 1
+        ([1, 5, 1, 2], "151M"),  # selisih negatif 2 - 5 = -3
+        ([100], "T3"),  # > 5 bit: dua karakter
+    ],
+)
+def test_compressed_counts_known_vectors(counts, text):
+    height = sum(counts)
+    values = (np.arange(len(counts)) % 2).astype(np.uint8) * 255
+    mask = np.repeat(values, counts).reshape(1, height).T  # satu kolom → urutan F = urutan counts
+    assert encode_rle(mask)["counts"] == text
+    assert decode_rle({"size": [height, 1], "counts": text}).ravel().tolist() == mask.ravel().tolist()
+
+
+@pytest.mark.parametrize("compressed", [True, False])
+def test_rle_round_trip(compressed):
+    rng = np.random.default_rng(5)
+    for mask in (
+        (rng.random((37, 53)) > 0.6).astype(np.uint8) * 255,
+        np.zeros((8, 5), np.uint8),
+        np.full((4, 9), 255, np.uint8),
+        cv2.circle(np.zeros((64, 48), np.uint8), (20, 30), 15, 255, -1),
+    ):
+        assert np.array_equal(decode_rle(encode_rle(mask, compressed)), mask)
+
+
+def test_decode_rle_rejects_wrong_size():
+    with pytest.raises(ValueError):
+        decode_rle({"size": [3, 3], "counts": [4, 2]})
+
+
+def test_bbox_and_area():
+    mask = np.zeros((10, 12), np.uint8)
+    mask[2:5, 3:9] = 200  # > 127 → foreground
+    mask[7, 10] = 255
+    mask[0, 0] = 127  # tepat ambang → background
+
+    assert mask_bbox(mask) == [3, 2, 8, 6]
+    described = describe_mask(mask)
+    assert described["bbox"] == [3, 2, 8, 6]
+    assert described["area"] == 3 * 6 + 1
+    assert mask_bbox(np.zeros((4, 4), np.uint8)) == [0, 0, 0, 0]
+    assert describe_mask(np.zeros((4, 4), np.uint8))["area"] == 0
+
+
+def test_packed_mask_matches_unpacked():
+    rng = np.random.default_rng(9)
+    mask = rng.integers(0, 256, (3, 17, 23), dtype=np.uint8)  # stack, ukuran bukan kelipatan 8
+    packed = PackedMask.from_mask(mask)
+
+    expected = np.where(mask > 127, 255, 0).astype(np.uint8)
+    assert np.array_equal(packed.unpack(), expected)
+    assert packed.area == int((mask > 127).sum())
+    assert packed.nbytes == -(-mask.size // 8)
+    assert describe_mask(PackedMask.from_mask(SQUARE))["area"] == 4
+
+
+def test_bilevel_png_round_trip():
+    mask = np.array([[0, 100, 128, 255]] * 3, dtype=np.uint8)
+    expected = np.where(mask > 127, 255, 0).astype(np.uint8)
+    for source in (mask, PackedMask.from_mask(mask)):
+        data = encode_mask_png(source)
+        assert cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED).tolist() == expected.tolist()
@@ -0,0 +1,28 @@
+import io
+
+import cv2
+
+from benchmarks.synthetic import synthetic_chest_xray
+from services.metrics import registry
+
+MEDIAN = 'xray_stage_duration_seconds{stage="median"}'
+DENOISE_OK = 'xray_http_requests_total{endpoint="main.process_noise_removal",status="200"}'
+
+
+def test_metrics_exposes_stage_histograms_and_request_counters(client):
+    before = registry.snapshot()
+    data = cv2.imencode(".png", synthetic_chest_xray(64))[1].tobytes()
+    client.post("/upload", data={"image": (io.BytesIO(data), "a.png")}, content_type="multipart/form-data")
+    assert client.post("/process/noise-removal", data={"filename": "a.png", "method": "median"}).status_code == 200
+
+    text = client.get("/metrics").get_data(as_text=True)
+    after = registry.snapshot()
+
+    median = after["histograms"][MEDIAN]
+    assert median["count"] == before["histograms"].get(MEDIAN, {"count": 0})["count"] + 1
+    assert f'xray_stage_duration_seconds_count{{stage="median"}} {median["count"]}' in text
+    assert 'xray_stage_duration_seconds_bucket{stage="median",le="+Inf"}' in text
+
+    served = after["counters"][DENOISE_OK]
+    assert served == before["counters"].get(DENOISE_OK, 0) + 1
+    assert f"{DENOISE_OK} {served}" in text
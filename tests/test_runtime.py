@@ -0,0 +1,25 @@
+import io
+import os
+
+import cv2
+
+from benchmarks.synthetic import synthetic_chest_xray
+from services.runtime import apply_plan, serving_plan
+
+
+def test_multi_worker_plan_persists_uploads(app, client):
+    threads = cv2.getNumThreads()
+    try:
+        apply_plan(app, serving_plan(cores=4, profile="small", workers=2, cv2_threads=1))
+    finally:
+        cv2.setNumThreads(threads)
+
+    data = cv2.imencode(".png", synthetic_chest_xray(64))[1].tobytes()
+    response = client.post(
+        "/upload",
+        data={"image": (io.BytesIO(data), "a.png"), "persist_upload": "0"},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    # proses worker lain hanya bisa membaca file asli dari disk bersama
+    assert os.path.exists(app.extensions["upload_store"].resolve("a.png"))
@@ -0,0 +1,61 @@
+import itertools
+
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import synthetic_chest_xray
+from services.image_processing import apply_lung_segmentation, multi_otsu_thresholds
+
+
+def _between_class_score(counts: np.ndarray, thresholds) -> float:
+    """Σ S_k² / W_k per kelas [t_(k-1), t_k) — setara between-class variance untuk total tetap."""
+    values = np.arange(256)
+    score = 0.0
+    for lo, hi in zip((0, *thresholds), (*thresholds, 256)):
+        w = counts[lo:hi].sum()
+        if w > 0:
+            s = (counts[lo:hi] * values[lo:hi]).sum()
+            score += s * s / w
+    return score
+
+
+def _brute_force_score(counts: np.ndarray, classes: int) -> float:
+    # skor hanya berubah di batas nilai yang ada → cukup coba potongan di nilai-nilai itu
+    cuts = np.flatnonzero(counts).tolist()
+    return max(
+        _between_class_score(counts, combo)
+        for combo in itertools.combinations_with_replacement(cuts, classes - 1)
+    )
+
+
+@pytest.mark.parametrize("classes", [2, 3, 4])
+@pytest.mark.parametrize("seed", range(5))
+def test_multi_otsu_matches_brute_force(classes, seed):
+    rng = np.random.default_rng(seed)
+    levels = np.sort(rng.choice(256, size=rng.integers(classes + 1, 9), replace=False))
+    img = rng.choice(levels, size=(24, 32), p=rng.dirichlet(np.ones(levels.size))).astype(np.uint8)
+    counts = np.bincount(img.ravel(), minlength=256).astype(np.float64)
+
+    thresholds = multi_otsu_thresholds(img, classes)
+
+    assert len(thresholds) == classes - 1
+    assert all(0 < a < b for a, b in zip(thresholds, [*thresholds[1:], 256]))
+    assert _between_class_score(counts, thresholds) == pytest.approx(_brute_force_score(counts, classes), rel=1e-12)
+
+
+def test_lung_segmentation_finds_both_lung_fields():
+    size = 256
+    img = synthetic_chest_xray(size, seed=1)
+    mask = apply_lung_segmentation(img, 15)
+
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    n, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    # latar gelap di luar badan menyentuh tepi → tidak ikut; tersisa dua paru
+    assert n == 3
+    assert sorted(round(x / size, 2) for x, _ in centroids[1:]) == pytest.approx([0.32, 0.68], abs=0.03)
+    for cx in (0.32, 0.68):
+        truth = ((xx - cx) / 0.14) ** 2 + ((yy - 0.48) / 0.30) ** 2 < 1.0
+        found = (mask > 0) & (np.abs(xx - cx) < 0.18)
+        iou = (truth & found).sum() / (truth | found).sum()
+        assert iou > 0.8
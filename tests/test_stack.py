@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from services.image_processing import (
+    apply_histogram_equalization,
+    apply_otsu,
+    normalize_gray_uint8,
+)
+
+
+def _stacks():
+    rng = np.random.default_rng(7)
+    shared = rng.integers(10, 200, (3, 48, 64), dtype=np.uint8)
+    shared[:, 0, 0], shared[:, 0, 1] = 10, 200
+    mixed = np.stack([
+        np.full((48, 64), 7, np.uint8),
+        rng.integers(0, 256, (48, 64), dtype=np.uint8),
+        rng.integers(5, 100, (48, 64), dtype=np.uint8),
+    ])
+    return [
+        shared,
+        mixed,
+        rng.integers(100, 4000, (3, 48, 64), dtype=np.uint16),
+        rng.random((2, 48, 64)).astype(np.float32),
+    ]
+
+
+@pytest.mark.parametrize("stack", _stacks(), ids=["uint8-shared", "uint8-mixed", "uint16", "float32"])
+def test_stack_matches_per_image(stack):
+    normalized = normalize_gray_uint8(stack)
+    for i, img in enumerate(stack):
+        assert np.array_equal(normalized[i], normalize_gray_uint8(img))
+
+    equalized = apply_histogram_equalization(normalized)
+    masks = apply_otsu(normalized)
+    for i, img in enumerate(normalized):
+        assert np.array_equal(equalized[i], apply_histogram_equalization(img))
+        assert np.array_equal(masks[i], apply_otsu(img))
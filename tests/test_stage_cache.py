@@ -0,0 +1,61 @@
+import numpy as np
+
+from services.stage_cache import StageCache
+
+
+def _array(nbytes: int, fill: int = 0) -> np.ndarray:
+    return np.full(nbytes, fill, dtype=np.uint8)
+
+
+def test_lru_order_and_byte_budget():
+    cache = StageCache(max_bytes=300)
+    for name in ("a", "b", "c"):
+        cache.put(cache.make_key("h", name), _array(100))
+    # akses "a" → "b" jadi yang paling lama tidak dipakai
+    assert cache.get(cache.make_key("h", "a")) is not None
+
+    cache.put(cache.make_key("h", "d"), _array(100))
+    assert cache.get(cache.make_key("h", "b")) is None
+    assert all(cache.get(cache.make_key("h", n)) is not None for n in ("a", "c", "d"))
+    assert cache.stats()["bytes"] == 300
+
+    # satu entri besar menggusur beberapa entri lama sekaligus
+    cache.put(cache.make_key("h", "e"), _array(250))
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["bytes"] == 250
+
+
+def test_oversized_value_is_not_stored_and_values_are_read_only():
+    cache = StageCache(max_bytes=100)
+    cache.put(cache.make_key("h", "big"), _array(101))
+    assert cache.get(cache.make_key("h", "big")) is None
+
+    value = _array(10)
+    cache.put(cache.make_key("h", "small"), value)
+    assert not cache.get(cache.make_key("h", "small")).flags.writeable
+
+
+def test_replacing_key_keeps_byte_count():
+    cache = StageCache(max_bytes=1000)
+    key = cache.make_key("h", "gaussian", {"ksize": 5.0})
+    cache.put(key, _array(100))
+    cache.put(cache.make_key("h", "gaussian", {"ksize": 5}), _array(40, fill=1))
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["bytes"] == 40
+
+
+def test_hash_memo_is_bounded_lru(tmp_path):
+    cache = StageCache(max_hash_entries=2)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.bin"
+        path.write_bytes(bytes([i]))
+        paths.append(str(path))
+
+    first = cache.content_hash(paths[0])
+    cache.content_hash(paths[1])
+    cache.content_hash(paths[0])  # path 0 dipakai lagi → path 1 yang dibuang
+    cache.remember_hash(paths[2], "f" * 64)
+
+    assert cache.stats()["hash_memo_entries"] == 2
+    assert list(cache._hash_memo.values()) == [first, "f" * 64]
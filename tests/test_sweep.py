@@ -0,0 +1,85 @@
+import gc
+import io
+import weakref
+
+import cv2
+import pytest
+
+from benchmarks.synthetic import synthetic_chest_xray
+
+from services import sweep
+from services.sweep import expand_grid, run_sweep
+
+
+def test_expand_grid_accepts_pipeline_spec_forms():
+    variants = expand_grid([
+        "otsu",
+        {"name": "median", "params": {"ksize": [3, 5]}},
+        ["clahe", {"clip_limit": [1.0, 2.0]}],
+    ])
+    assert len(variants) == 4
+    assert {v[1][1]["ksize"] for v in variants} == {3, 5}
+
+
+@pytest.mark.parametrize("stages", [
+    [["median", {"ksize": []}]],
+    [{"name": "median"}, ["clahe", {"clip_limit": []}]],
+])
+def test_expand_grid_rejects_empty_values(stages):
+    with pytest.raises(ValueError):
+        expand_grid(stages)
+
+
+@pytest.mark.parametrize("stages", [
+    [{"params": {"ksize": 3}}],
+    [["median", {"ksize": []}]],
+    [{"name": "median"}, ["clahe", {"clip_limit": []}]],
+    [[]],
+    [5],
+])
+def test_sweep_endpoint_rejects_invalid_grids(client, stages):
+    response = client.post("/process/sweep", json={"filename": "film.png", "stages": stages})
+    assert response.status_code == 400
+
+
+def test_sweep_endpoint_accepts_dict_specs(client):
+    data = cv2.imencode(".png", synthetic_chest_xray(96))[1].tobytes()
+    client.post("/upload", data={"image": (io.BytesIO(data), "film.png")}, content_type="multipart/form-data")
+
+    response = client.post("/process/sweep", json={
+        "filename": "film.png",
+        "stages": [{"name": "median"}, {"name": "clahe", "params": {"clip_limit": [1.0, 2.0]}}],
+        "contact_sheet": False,
+    })
+    assert response.status_code == 200
+    assert len(response.get_json()["variants"]) == 2
+
+
+def test_run_sweep_releases_finished_levels(monkeypatch):
+    gray = synthetic_chest_xray(64, seed=2)
+    variants = expand_grid([["gaussian", {"ksize": [3, 5]}], ["median", {"ksize": [3, 5]}], "otsu"])
+    expected = run_sweep(gray, variants, max_workers=2)
+
+    produced = []
+    original = sweep.apply_stage
+
+    def tracked(img, name, params):
+        out = original(img, name, params)
+        produced.append((name, weakref.ref(out)))
+        return out
+
+    monkeypatch.setattr(sweep, "apply_stage", tracked)
+    alive_at_leaf = []
+
+    def on_leaf(img):
+        gc.collect()
+        # saat varian terakhir (otsu) selesai, hasil gaussian level pertama sudah dilepas
+        alive_at_leaf.append(sum(ref() is not None for name, ref in produced if name == "gaussian"))
+        return img.copy()
+
+    results = run_sweep(gray, variants, max_workers=2, on_leaf=on_leaf)
+
+    assert all((a == b).all() for a, b in zip(results, expected))
+    assert alive_at_leaf == [0] * len(variants)
+    gc.collect()
+    assert all(ref() is None for _, ref in produced)
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+
+import batch
+from benchmarks.synthetic import synthetic_chest_xray
+from services import tiling
+from services.image_processing import run_pipeline
+
+
+@pytest.fixture
+def tiled_calls(monkeypatch):
+    calls = []
+    original = tiling.run_tiled
+
+    def spy(src, method, params=None, **kwargs):
+        calls.append(method)
+        return original(src, method, params, **kwargs)
+
+    monkeypatch.setattr(tiling, "run_tiled", spy)
+    return calls
+
+
+def test_run_pipeline_tiles_large_images(tiled_calls):
+    img = synthetic_chest_xray(300, seed=3)
+    stages = [["median", {"ksize": 5}], ["gaussian", {"ksize": 7}], ["clahe", {}], ["otsu", {}]]
+
+    full = run_pipeline("", stages, pre_gray=img)
+    tiled = run_pipeline("", stages, pre_gray=img, tile_min_pixels=img.size, tile_size=64)
+
+    assert tiled_calls == ["median", "gaussian", "clahe"]
+    assert np.array_equal(tiled[0], full[0])
+    assert np.array_equal(tiled[1], full[1])
+    # CLAHE per tile: selisih pembulatan interpolasi maksimal ±1
+    assert np.abs(tiled[2].astype(int) - full[2].astype(int)).max() <= 1
+
+
+def test_run_pipeline_small_images_stay_full(tiled_calls):
+    img = synthetic_chest_xray(128, seed=1)
+    run_pipeline("", ["median"], pre_gray=img, tile_min_pixels=img.size + 1)
+    assert tiled_calls == []
+
+
+def test_batch_process_file_uses_tiled_path(tmp_path, tiled_calls):
+    src = tmp_path / "in" / "film.png"
+    src.parent.mkdir()
+    cv2.imwrite(str(src), synthetic_chest_xray(200, seed=2))
+    stages = batch.parse_pipeline_arg("gaussian:ksize=5")
+
+    batch.process_file(str(src), stages, str(tmp_path / "out"), str(src.parent), tile_min_pixels=1)
+
+    assert tiled_calls == ["gaussian"]
+    expected = run_pipeline(str(src), stages)[-1]
+    assert np.array_equal(cv2.imread(str(tmp_path / "out" / "film.png"), cv2.IMREAD_GRAYSCALE), expected)
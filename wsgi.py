@@ -0,0 +1,18 @@
+"""
+Entry point production (WSGI), mis.:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Jumlah proses / thread diambil dari services.runtime.serving_plan (env
+XRAY_SERVING_PROFILE, XRAY_CORES, ...). Batas thread BLAS/OpenMP di-set
+sebelum numpy/cv2 di-import, lalu processing di-pre-warm sebelum request pertama.
+"""
+from services.runtime import apply_plan, configure_thread_env, prewarm, serving_plan
+
+plan = serving_plan()
+configure_thread_env(plan["cv2_threads"])
+
+from app import create_app  # noqa: E402  (setelah env thread di-set)
+
+app = create_app()
+apply_plan(app, plan)
+app.config["PREWARM_SECONDS"] = prewarm(app)